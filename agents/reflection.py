@@ -1,27 +1,29 @@
-import os, datetime, numpy as np
+import os, datetime
 from llama_index.llms.ollama import Ollama
 from llama_index.core import Settings
-from sentence_transformers import SentenceTransformer
+from core.models import SharedLlamaIndexEmbedding
+from core.index_store import load_index
 
 AI_NAME = "Ren"
 
-# === Local Embedding Wrapper ===
-class LocalEmbedding:
-    def __init__(self, model_name="all-MiniLM-L6-v2"): self.model = SentenceTransformer(model_name)
-    def get_query_embedding(self,q): return self.model.encode(q).tolist()
-    def get_text_embedding(self,t): return self.model.encode(t).tolist()
-    def get_text_embedding_batch(self,texts, **kwargs): return [self.model.encode(x).tolist() for x in texts]
-    def get_agg_embedding_from_queries(self,queries,**kwargs): return np.mean([self.get_query_embedding(q) for q in queries],axis=0).tolist()
-
-Settings.embed_model = LocalEmbedding()
+# === Local Embedding (shared with rag.py via the model registry, loaded on first use) ===
+Settings.embed_model = SharedLlamaIndexEmbedding("all-MiniLM-L6-v2")
 
 BASE = os.path.expanduser("~/AI_Assistant")
 logpath = os.path.join(BASE,"memory/conversation_log.txt")
 knowledge = os.path.join(BASE,"memory/knowledge")
+index_dir = os.path.join(BASE,"memory/index")
 os.makedirs(knowledge, exist_ok=True)
 
 llm = Ollama(model="llama3")
 
+def related_notes(text, k=3):
+    # binary stores (core.index_store): opening the index no longer parses its JSON
+    index = load_index(index_dir)
+    if index is None or not text.strip(): return ""
+    nodes = index.as_retriever(similarity_top_k=k).retrieve(text[-2000:])
+    return "\n".join("- " + n.node.get_content().strip()[:300] for n in nodes)
+
 def reflect_and_categorize():
     today = datetime.date.today().strftime("%Y%m%d")
     marker = os.path.join(knowledge, f"done_{today}.flag")
@@ -29,6 +31,8 @@ def reflect_and_categorize():
 
     text = open(logpath,"r",encoding="utf-8").read()
     prompt = f"You are {AI_NAME}, reflecting on today’s dialogue. Categorize into Coding, Design, Research, Personal, Productivity, etc."
+    notes = related_notes(text)
+    if notes: prompt += "\n\nRelated notes:\n" + notes
 
     result = str(llm(prompt + "\n\n" + text))
     sections = result.split("\n\n"); category="General"
@@ -2,31 +2,16 @@
 
 from core.memory import Memory
 from core.config import load_config
+from core.brain import SmartBrain as BaseBrain
 from langchain_ollama import OllamaLLM
-from datetime import datetime
-from typing import Optional
 import re
 
 
-class SmartBrain:
+class SmartBrain(BaseBrain):
     """
     Smart brain that automatically detects response style
     """
 
-    def __init__(self, config: dict, memory, llm):
-        self.config = config
-        self.memory = memory
-        self.llm = llm
-        
-        # Load knowledge base
-        try:
-            from rag import build_knowledge_base, query_knowledge_base
-            self.db = build_knowledge_base()
-            self.query_kb = query_knowledge_base
-        except ImportError:
-            self.db = None
-            self.query_kb = lambda db, q: ""
-
     def detect_response_style(self, user_text: str) -> dict:
         """Auto-detect what kind of response the user wants"""
         text_lower = user_text.lower()
@@ -88,36 +73,14 @@ class SmartBrain:
 User: {user_text}
 Assistant:"""
 
-    def think(self, user_text: str, user_id: Optional[str] = "user") -> str:
-        # Auto-detect response style
-        style = self.detect_response_style(user_text)
-        
-        # Get RAG context
-        context = ""
-        if self.db:
-            context = self.query_kb(self.db, user_text)
-        
-        # Build smart prompt
-        prompt = self.build_smart_prompt(user_text, context, style)
-        
-        # Generate response
-        reply = self.llm.invoke(prompt)
-        
-        # Save to memory
-        timestamp = datetime.utcnow().isoformat() + "Z"
-        if self.memory.enabled:
-            self.memory.append_message(role="user", text=user_text, ts=timestamp, user_id=user_id)
-            self.memory.append_message(role="assistant", text=reply, ts=timestamp, user_id="assistant")
-        
-        return reply
-
 
 def main():
     # Load config
     config = load_config()
 
     # Initialize Memory
-    memory = Memory()
+    mem_cfg = config.get("memory", {})
+    memory = Memory(compression=mem_cfg.get("compression", "gzip"), retention=mem_cfg.get("retention"))
 
     # Initialize LLM
     model_name = config.get("api", {}).get("model", "llama3")
@@ -129,6 +92,13 @@ def main():
     print("🤖 Smart AI Assistant is ready!")
     print("💡 I'll automatically adjust my responses based on what you ask")
 
+    if config.get("settings", {}).get("voice_enabled"):
+        from tools.voice.pipeline import run_voice_loop
+
+        run_voice_loop(brain, config)
+        brain.close()
+        return
+
     # Chat loop
     while True:
         try:
@@ -144,6 +114,8 @@ def main():
             print("\n👋 Exiting...")
             break
 
+    brain.close()
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,123 @@
+import gzip
+import json
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+# keeps identifiers, error codes and dotted/dashed names (e.g. load_config, 0x80070005, v1.2-rc) whole
+_TOKEN = re.compile(r"\w+(?:[.\-]\w+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for tok in _TOKEN.findall(text.lower()):
+        tokens.append(tok)
+        if "." in tok or "-" in tok:
+            tokens.extend(p for p in re.split(r"[.\-]", tok) if p)
+    return tokens
+
+
+class BM25Index:
+    """
+    Compact in-memory BM25 (Okapi) inverted index over chunk ids.
+      - postings: term -> {doc_id: term frequency}
+      - persisted as gzipped JSON with doc ids interned to ints
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_len: Dict[str, int] = {}
+        self._total_len = 0
+
+    def __len__(self):
+        return len(self.doc_len)
+
+    @property
+    def avgdl(self) -> float:
+        return self._total_len / len(self.doc_len) if self.doc_len else 0.0
+
+    # -------------- Updates --------------
+    def add(self, doc_id: str, text: str):
+        if doc_id in self.doc_len:
+            self.remove([doc_id])
+        counts = Counter(tokenize(text))
+        for term, tf in counts.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+        length = sum(counts.values())
+        self.doc_len[doc_id] = length
+        self._total_len += length
+
+    def remove(self, doc_ids: Iterable[str]):
+        doc_ids = {d for d in doc_ids if d in self.doc_len}
+        if not doc_ids:
+            return
+        for term in list(self.postings):
+            plist = self.postings[term]
+            for d in doc_ids.intersection(plist):
+                del plist[d]
+            if not plist:
+                del self.postings[term]
+        for d in doc_ids:
+            self._total_len -= self.doc_len.pop(d)
+
+    # -------------- Scoring --------------
+    def idf(self, term: str) -> float:
+        n = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.doc_len) - n + 0.5) / (n + 0.5))
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """Top-k (doc_id, score), best first."""
+        if not self.doc_len:
+            return []
+        avgdl = self.avgdl or 1.0
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            plist = self.postings.get(term)
+            if not plist:
+                continue
+            idf = self.idf(term)
+            for doc_id, tf in plist.items():
+                norm = tf + self.k1 * (1 - self.b + self.b * self.doc_len[doc_id] / avgdl)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+        return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:k]
+
+    def vocabulary(self) -> Iterable[str]:
+        return self.postings.keys()
+
+    # -------------- Persistence --------------
+    def save(self, path: str):
+        ids = list(self.doc_len)
+        index = {d: i for i, d in enumerate(ids)}
+        data = {
+            "k1": self.k1,
+            "b": self.b,
+            "ids": ids,
+            "lens": [self.doc_len[d] for d in ids],
+            "postings": {t: [x for d, tf in pl.items() for x in (index[d], tf)] for t, pl in self.postings.items()},
+        }
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        idx = cls(k1=data["k1"], b=data["b"])
+        ids = data["ids"]
+        idx.doc_len = dict(zip(ids, data["lens"]))
+        idx._total_len = sum(data["lens"])
+        for term, flat in data["postings"].items():
+            idx.postings[term] = {ids[flat[i]]: flat[i + 1] for i in range(0, len(flat), 2)}
+        return idx
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[str]:
+    """Fuse several best-first id rankings: score(d) = sum 1 / (k + rank)."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
@@ -1,7 +1,9 @@
 # smart_brain.py
 
 from datetime import datetime
-from typing import Optional
+from typing import Iterator, List, Optional, Tuple
+
+from core.cancel import DEFAULT_DEADLINES, CancelToken, Cancelled, DeadlineExceeded, call_with_deadline, guarded, marker
 import re
 
 
@@ -15,14 +17,90 @@ class SmartBrain:
         self.memory = memory
         self.llm = llm
         
+        self.watcher = None
+
+        # Embedding models are shared process-wide and unloaded when idle
+        from core.models import configure as configure_models
+
+        configure_models(config.get("models", {}))
+
+        # Per-stage deadlines (seconds, null = none) and cancellation counters
+        self.deadlines = {**DEFAULT_DEADLINES, **config.get("deadlines", {})}
+        self.cancel_stats = {"completed": 0, "cancelled": 0, "timed_out": 0, "retrieval_timeouts": 0}
+
+        # Identical prompts in flight at the same time share one generation
+        self.singleflight = None
+        if config.get("singleflight", {}).get("enabled", True):
+            from core.singleflight import SingleFlight
+
+            self.singleflight = SingleFlight()
+
+        # Optional tiered model routing by detected style
+        self.router = None
+        router_cfg = config.get("router", {})
+        if router_cfg.get("enabled"):
+            from core.router import ModelRouter
+
+            self.router = ModelRouter.from_config(router_cfg, llm, config.get("api", {}).get("model", "llama3"))
+
+        # Semantic long-term memory: relevant past exchanges of the same user
+        from core.recall import recall_config, recall_from_config
+
+        self.recall_cfg = recall_config(config)
+        self.recall = recall_from_config(memory, config)
+
         # Load knowledge base if you want RAG
+        rag_cfg = config.get("rag", {})
+        self.context_k = rag_cfg.get("context", {}).get("max_k", 3)
+        from core.gate import gate_from_config
+
+        self.gate = gate_from_config(rag_cfg.get("gate", {}))
+        watch_dirs = rag_cfg.get("watch_dirs", [])
+        self.db = None
+        self.query_kb = lambda db, q, **kwargs: ""
+        if not rag_cfg.get("enabled", True):
+            return
         try:
-            from rag import build_knowledge_base, query_knowledge_base
-            self.db = build_knowledge_base()
+            from rag import build_knowledge_base, query_knowledge_base, watch_documents, make_assembler, kb_options
+            self.db = build_knowledge_base(doc_dirs=watch_dirs, **kb_options(rag_cfg))
             self.query_kb = query_knowledge_base
+            if self.db and rag_cfg.get("context"):
+                self.db.assembler = make_assembler(self.db, rag_cfg["context"])
+            if self.db and watch_dirs:
+                self.watcher = watch_documents(
+                    self.db,
+                    watch_dirs,
+                    debounce=rag_cfg.get("watch_debounce_seconds", 2.0),
+                    poll_interval=rag_cfg.get("watch_poll_seconds", 1.0),
+                )
         except ImportError:
             self.db = None
-            self.query_kb = lambda db, q: ""
+
+    def close(self):
+        """Stop background workers (document watcher) and flush memory."""
+        if self.watcher:
+            self.watcher.stop()
+            self.watcher = None
+        if self.recall:
+            self.recall.close()
+        if self.router:
+            print("📊 Model routes:\n" + self.router.report())
+        if self.cancel_stats["cancelled"] or self.cancel_stats["timed_out"]:
+            print(f"📊 Requests cancelled: {self.cancel_stats['cancelled']}, timed out: {self.cancel_stats['timed_out']}")
+        assembler = getattr(self.db, "assembler", None)
+        if assembler and assembler.stats["requests"]:
+            saved = assembler.stats["baseline_tokens"] - assembler.stats["context_tokens"]
+            print(
+                f"📊 RAG context: {assembler.stats['context_tokens']} prompt tokens over {assembler.stats['requests']} requests "
+                f"({saved} saved vs. the top-k chunks)"
+            )
+        if self.singleflight and self.singleflight.stats["coalesced"]:
+            print(f"📊 Generations saved by coalescing identical prompts: {self.singleflight.stats['coalesced']}")
+        from core.models import registry
+
+        for m in registry().memory_report():
+            print(f"📊 Embedding model {m['model']}: {m['param_mb']} MB parameters, {m['uses']} uses")
+        self.memory.flush()
 
     def detect_response_style(self, user_text: str) -> dict:
         """
@@ -108,25 +186,155 @@ class SmartBrain:
 User: {user_text}
 Assistant:"""
 
-    def think(self, user_text: str, user_id: Optional[str] = "user") -> str:
+    def prepare_prompt(self, user_text: str, token: Optional[CancelToken] = None, user_id: Optional[str] = None) -> Tuple[str, dict]:
         # Auto-detect what kind of response they want
         style = self.detect_response_style(user_text)
         
         # Get context from knowledge base
         context = ""
         if self.db:
-            context = self.query_kb(self.db, user_text)
+            # skip the KB entirely for small talk and queries it has no words for
+            decision = self.gate.decide(user_text, style, self.db) if self.gate else None
+            if decision is None or decision.retrieve or self.gate.shadow:
+                try:
+                    context = call_with_deadline(
+                        lambda: self.query_kb(self.db, user_text, k=self.context_k, style=style),
+                        self.deadlines.get("retrieval_s"),
+                        token,
+                        "retrieval",
+                    )
+                except DeadlineExceeded:
+                    # answer without context rather than not at all
+                    self.cancel_stats["retrieval_timeouts"] += 1
+                    print(f"⚠️ RAG query exceeded {self.deadlines['retrieval_s']}s, continuing without context")
+                except Cancelled:
+                    raise
+                except Exception as e:
+                    print(f"⚠️ RAG query error: {e}")
+            if decision is not None:
+                self.gate.log(user_text, style, decision, context)
+
+        # Add what this user told us before
+        if self.recall is not None:
+            past = ""
+            try:
+                past = call_with_deadline(
+                    lambda: self.recall.context(
+                        user_text,
+                        user_id,
+                        k=self.recall_cfg["k"],
+                        min_score=self.recall_cfg["min_score"],
+                        budget_tokens=self.recall_cfg["budget_tokens"],
+                    ),
+                    self.deadlines.get("retrieval_s"),
+                    token,
+                    "memory recall",
+                )
+            except DeadlineExceeded:
+                print(f"⚠️ Memory recall exceeded {self.deadlines['retrieval_s']}s, continuing without it")
+            except Cancelled:
+                raise
+            except Exception as e:
+                print(f"⚠️ Memory recall error: {e}")
+            if past:
+                context = f"Earlier conversation with this user:\n{past}" + (f"\n\n{context}" if context else "")
         
         # Build smart prompt
-        prompt = self.build_smart_prompt(user_text, context, style)
-        
-        # Generate response
-        reply = self.llm.invoke(prompt)
-        
-        # Save to memory
+        return self.build_smart_prompt(user_text, context, style), style
+
+    def record_exchange(self, user_text: str, reply: str, user_id: Optional[str] = "user", cancelled: Optional[str] = None):
+        """cancelled: reason the reply was cut short; the partial reply is saved with a marker."""
+        if cancelled:
+            reply = f"{reply}\n{marker(cancelled)}" if reply else marker(cancelled)
         timestamp = datetime.utcnow().isoformat() + "Z"
         if self.memory.enabled:
             self.memory.append_message(role="user", text=user_text, ts=timestamp, user_id=user_id)
-            self.memory.append_message(role="assistant", text=reply, ts=timestamp, user_id="assistant")
+            self.memory.append_message(role="assistant", text=reply, ts=timestamp, user_id=user_id)
+
+    def _flight_key(self, prompt: str, style: dict):
+        # identical prompts only share a generation if they would go to the same model
+        return (self.router.route(style) if self.router else None, prompt)
+
+    def _stream(self, prompt: str, style: dict, token: Optional[CancelToken] = None) -> Iterator[str]:
+        def source():
+            if self.router or hasattr(self.llm, "stream"):
+                chunks = self.router.stream(prompt, style) if self.router else self.llm.stream(prompt)
+                for chunk in chunks:
+                    text = chunk if isinstance(chunk, str) else getattr(chunk, "content", str(chunk))
+                    if text:
+                        yield text
+            else:
+                yield self.llm.invoke(prompt)
+
+        pieces = source() if self.singleflight is None else self.singleflight.run(self._flight_key(prompt, style), source)
+        return guarded(pieces, token, self.deadlines.get("first_token_s"), self.deadlines.get("total_s"))
+
+    def _count_cancel(self, reason: str):
+        self.cancel_stats["timed_out" if reason.startswith("timed out") else "cancelled"] += 1
+
+    def think(self, user_text: str, user_id: Optional[str] = "user", token: Optional[CancelToken] = None) -> str:
+        """
+        Generate a reply. The LLM output is streamed internally so that cancelling
+        token, or a deadline from config["deadlines"], aborts the generation; the
+        partial reply is then returned and saved with a marker.
+        """
+        parts = []
+        cancelled = None
+        try:
+            prompt, style = self.prepare_prompt(user_text, token, user_id)
+            
+            # Generate response
+            for text in self._stream(prompt, style, token):
+                parts.append(text)
+            self.cancel_stats["completed"] += 1
+        except Cancelled as e:
+            cancelled = e.reason
+            self._count_cancel(cancelled)
+        except Exception as e:
+            parts = [f"Sorry, I encountered an error: {str(e)}"]
         
-        return reply
\ No newline at end of file
+        # Save to memory
+        self.record_exchange(user_text, "".join(parts), user_id, cancelled)
+        reply = "".join(parts)
+        return f"{reply}\n{marker(cancelled)}" if cancelled else reply
+
+    def think_stream(self, user_text: str, user_id: Optional[str] = "user", token: Optional[CancelToken] = None) -> Iterator[str]:
+        """
+        Like think(), but yields the reply piece by piece as the LLM produces it
+        (llm.stream; LLMs without it yield the whole reply once). The exchange is
+        saved to memory when the stream ends. Cancelling token, a deadline, or
+        closing this generator (client went away) stops the LLM and saves the
+        partial reply with a marker.
+        """
+        parts = []
+        cancelled = None
+        try:
+            prompt, style = self.prepare_prompt(user_text, token, user_id)
+            for text in self._stream(prompt, style, token):
+                parts.append(text)
+                yield text
+            self.cancel_stats["completed"] += 1
+        except Cancelled as e:
+            cancelled = e.reason
+            self._count_cancel(cancelled)
+            yield f"\n{marker(cancelled)}"
+        except GeneratorExit:
+            cancelled = "client gone"
+            self._count_cancel(cancelled)
+            raise
+        except Exception as e:
+            error = f"Sorry, I encountered an error: {str(e)}"
+            parts.append(error)
+            yield error
+        finally:
+            self.record_exchange(user_text, "".join(parts), user_id, cancelled)
+
+    def retrieve(self, query: str, k: Optional[int] = None) -> List[dict]:
+        """Knowledge base hits only (no LLM): [{"text", "source", "score"}], best first."""
+        if not self.db:
+            return []
+        hits = self.db.search(query, k=k or self.context_k)
+        return [
+            {"text": doc.page_content, "source": doc.metadata.get("source", ""), "score": round(float(score), 4)}
+            for doc, score in hits
+        ]
@@ -0,0 +1,152 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Callable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+DEFAULT_DEADLINES = {"retrieval_s": 5.0, "first_token_s": 60.0, "total_s": 300.0}
+
+_retrieval_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="deadline")
+
+
+class Cancelled(Exception):
+    """The request was cancelled (new message, stop button, client gone)."""
+
+    def __init__(self, reason: str = "cancelled"):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class DeadlineExceeded(Cancelled):
+    def __init__(self, stage: str):
+        super().__init__(f"timed out: {stage}")
+        self.stage = stage
+
+
+class CancelToken:
+    """Shared between whoever may cancel a request and the code running it."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.reason: Optional[str] = None
+
+    def cancel(self, reason: str = "cancelled"):
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self):
+        if self._event.is_set():
+            raise Cancelled(self.reason or "cancelled")
+
+    def wait(self, timeout: float) -> bool:
+        return self._event.wait(timeout)
+
+
+def marker(reason: str) -> str:
+    """Appended to partial replies saved in Memory."""
+    return f"[{reason}]" if reason.startswith("timed out") else f"[cancelled: {reason}]"
+
+
+def call_with_deadline(fn: Callable[[], T], timeout: Optional[float], token: Optional[CancelToken], stage: str) -> T:
+    """
+    Run a blocking call (e.g. retrieval) but stop waiting for it after timeout
+    seconds or on cancellation. The call itself cannot be interrupted and finishes
+    in the background; its result is discarded.
+    """
+    if timeout is None and token is None:
+        return fn()
+    future = _retrieval_pool.submit(fn)
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    while True:
+        if token is not None:
+            token.check()
+        wait = 0.05 if deadline is None else min(0.05, deadline - time.monotonic())
+        if wait <= 0:
+            raise DeadlineExceeded(stage)
+        try:
+            return future.result(timeout=wait)
+        except FutureTimeout:
+            continue
+
+
+def guarded(
+    pieces: Iterator[str],
+    token: Optional[CancelToken] = None,
+    first_timeout: Optional[float] = None,
+    total_timeout: Optional[float] = None,
+    poll: float = 0.05,
+) -> Iterator[str]:
+    """
+    Iterate a (blocking) stream with cancellation and deadlines for the first
+    piece and for the whole stream. A pump thread reads the stream; when the
+    consumer gives up, the stream is closed right away if it is between pieces,
+    which aborts the underlying Ollama request (the HTTP response is closed).
+    A stream blocked inside the model call cannot be interrupted from another
+    thread: the pump closes it as soon as that call returns its next piece (or
+    ends), so an abandoned request outlives its consumer by at most one piece
+    and never reads further.
+    """
+    if token is None and first_timeout is None and total_timeout is None:
+        yield from pieces
+        return
+
+    items: "queue.Queue[tuple]" = queue.Queue()
+    stop = threading.Event()
+    closing = threading.Lock()
+
+    def close():
+        with closing:
+            try:
+                getattr(pieces, "close", lambda: None)()
+            except ValueError:
+                pass  # generator is running in the pump, which closes it when that piece arrives
+
+    def pump():
+        try:
+            for piece in pieces:
+                if stop.is_set():
+                    break
+                items.put(("piece", piece))
+        except BaseException as e:
+            items.put(("error", e))
+        finally:
+            close()
+            items.put(("end", None))
+
+    threading.Thread(target=pump, daemon=True).start()
+    started = time.monotonic()
+    got_first = False
+    try:
+        while True:
+            now = time.monotonic()
+            limits = []
+            if total_timeout is not None:
+                limits.append((started + total_timeout, "total"))
+            if first_timeout is not None and not got_first:
+                limits.append((started + first_timeout, "first_token"))
+            deadline, stage = min(limits) if limits else (None, None)
+            if token is not None:
+                token.check()
+            if deadline is not None and now >= deadline:
+                raise DeadlineExceeded(stage)
+            try:
+                kind, value = items.get(timeout=poll if deadline is None else min(poll, deadline - now))
+            except queue.Empty:
+                continue
+            if kind == "end":
+                return
+            if kind == "error":
+                raise value
+            got_first = True
+            yield value
+    finally:
+        stop.set()
+        close()
@@ -1,12 +1,16 @@
-import json
-import os
+import copy
+
+from core.settings import get_store
+
+DEFAULT_CONFIG = {
+    "persona": {"name": "Ren", "style": "casual", "mood": "friendly", "remember_prefs": True},
+    "settings": {"voice_enabled": False, "memory_enabled": True}
+}
+
 
 def load_config(path="config.json") -> dict:
-    """Load configuration from config.json (or return defaults)."""
-    if not os.path.exists(path):
-        return {
-            "persona": {"name": "Ren", "style": "casual", "mood": "friendly", "remember_prefs": True},
-            "settings": {"voice_enabled": False, "memory_enabled": True}
-        }
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    """Load configuration from config.json (or return defaults); read once, then served from memory."""
+    store = get_store(path)
+    if not store.exists:
+        return copy.deepcopy(DEFAULT_CONFIG)
+    return store.data
@@ -0,0 +1,127 @@
+import math
+import re
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from core.bm25 import tokenize
+
+_SENTENCE = re.compile(r"(?<=[.!?])\s+|\n+")
+
+DEFAULT_BUDGETS = {"short": 250, "medium": 600, "detailed": 1200}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English with llama-style tokenizers)."""
+    return (len(text) + 3) // 4 if text else 0
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE.split(text) if s and s.strip()]
+
+
+class ContextAssembler:
+    """
+    Turns scored retrieval hits into a prompt context that fits a token budget.
+      - drops hits below min_score, and hits far below the best one (adaptive k)
+      - trims each chunk to its sentences most similar to the query
+      - budget per response length style (short answers get less context)
+    stats holds per-request ("last") and cumulative prompt-token savings against
+    the old behaviour of joining the top baseline_k raw chunks.
+    """
+
+    def __init__(
+        self,
+        budgets: Optional[Dict[str, int]] = None,
+        min_score: float = 0.2,
+        relative_cutoff: float = 0.6,
+        max_sentences: int = 4,
+        baseline_k: int = 3,
+        idf: Optional[Callable[[str], float]] = None,
+        embed: Optional[Callable[[List[str]], List[List[float]]]] = None,
+    ):
+        self.budgets = {**DEFAULT_BUDGETS, **(budgets or {})}
+        self.min_score = min_score
+        self.relative_cutoff = relative_cutoff
+        self.max_sentences = max_sentences
+        self.baseline_k = baseline_k
+        self.idf = idf
+        self.embed = embed
+        self.stats = {"requests": 0, "baseline_tokens": 0, "context_tokens": 0, "last": None}
+
+    def budget_for(self, style: Optional[dict]) -> int:
+        length = (style or {}).get("length", "medium")
+        return self.budgets.get(length, self.budgets["medium"])
+
+    # -------------- Sentence scoring --------------
+    def _score_sentences(self, query: str, sentences: List[str]) -> List[float]:
+        if self.embed is not None:
+            vectors = self.embed([query] + sentences)
+            q = vectors[0]
+            return [_cosine(q, v) for v in vectors[1:]]
+        q_terms = set(tokenize(query))
+        idf = self.idf or (lambda term: 1.0)
+        scores = []
+        for s in sentences:
+            terms = set(tokenize(s))
+            overlap = sum(idf(t) for t in q_terms & terms)
+            scores.append(overlap / math.sqrt(len(terms) or 1))
+        return scores
+
+    def _trim(self, query: str, text: str) -> List[str]:
+        sentences = list(dict.fromkeys(split_sentences(text)))
+        if len(sentences) <= 1:
+            return sentences
+        scores = self._score_sentences(query, sentences)
+        ranked = sorted(range(len(sentences)), key=lambda i: (-scores[i], i))
+        keep = [i for i in ranked[: self.max_sentences] if scores[i] > 0] or [0]
+        return [sentences[i] for i in sorted(keep)]
+
+    # -------------- Assembly --------------
+    def select(self, hits: Sequence[Tuple[object, float]]) -> List[Tuple[object, float]]:
+        """Score threshold + adaptive k."""
+        hits = [(doc, score) for doc, score in hits if score >= self.min_score]
+        if not hits:
+            return []
+        top = max(score for _, score in hits)
+        return [(doc, score) for doc, score in hits if score >= top * self.relative_cutoff]
+
+    def assemble(self, query: str, hits: Sequence[Tuple[object, float]], style: Optional[dict] = None) -> str:
+        budget = self.budget_for(style)
+        baseline = estimate_tokens("\n".join(doc.page_content for doc, _ in hits[: self.baseline_k]))
+
+        parts: List[str] = []
+        used = 0
+        for doc, _ in self.select(hits):
+            sentences = self._trim(query, doc.page_content)
+            while sentences:
+                piece = " ".join(sentences)
+                cost = estimate_tokens(piece) + (1 if parts else 0)
+                if used + cost <= budget:
+                    parts.append(piece)
+                    used += cost
+                    break
+                sentences = sentences[:-1]
+            if used >= budget:
+                break
+
+        context = "\n".join(parts)
+        tokens = estimate_tokens(context)
+        last = {
+            "budget": budget,
+            "hits": len(hits),
+            "chunks_used": len(parts),
+            "baseline_tokens": baseline,
+            "context_tokens": tokens,
+            "saved_tokens": baseline - tokens,
+        }
+        self.stats["requests"] += 1
+        self.stats["baseline_tokens"] += baseline
+        self.stats["context_tokens"] += tokens
+        self.stats["last"] = last
+        return context
+
+
+def _cosine(a: Sequence[float], b: Sequence[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    na = math.sqrt(sum(x * x for x in a))
+    nb = math.sqrt(sum(y * y for y in b))
+    return dot / (na * nb) if na and nb else 0.0
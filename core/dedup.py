@@ -0,0 +1,180 @@
+import hashlib
+import os
+import random
+import re
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+_MERSENNE = (1 << 61) - 1
+_WORD = re.compile(r"\w+")
+
+
+def shingles(text: str, size: int = 5) -> Set[int]:
+    """Hashed word n-grams of a text (lowercased)."""
+    words = _WORD.findall(text.lower())
+    if len(words) < size:
+        return {_hash(" ".join(words))} if words else set()
+    return {_hash(" ".join(words[i:i + size])) for i in range(len(words) - size + 1)}
+
+
+def _hash(s: str) -> int:
+    return int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def jaccard(a: Set[int], b: Set[int]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class MinHashLSH:
+    """
+    MinHash signatures + LSH banding for near-duplicate detection.
+      - threshold: estimated Jaccard similarity above which two texts are duplicates
+      - num_perm / bands: signature length and LSH bands (num_perm must divide evenly)
+    """
+
+    def __init__(self, threshold: float = 0.85, num_perm: int = 64, bands: int = 16, shingle_size: int = 5, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = random.Random(seed)
+        self._perms = [(rng.randrange(1, _MERSENNE), rng.randrange(0, _MERSENNE)) for _ in range(num_perm)]
+        self._buckets: List[Dict[Tuple[int, ...], List[str]]] = [{} for _ in range(bands)]
+        self._signatures: Dict[str, Tuple[int, ...]] = {}
+
+    def signature(self, text: str) -> Tuple[int, ...]:
+        sh = shingles(text, self.shingle_size)
+        if not sh:
+            return tuple([0] * self.num_perm)
+        return tuple(min((a * x + b) % _MERSENNE for x in sh) for a, b in self._perms)
+
+    @staticmethod
+    def similarity(sig_a: Sequence[int], sig_b: Sequence[int]) -> float:
+        return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+    def _bands(self, sig: Tuple[int, ...]):
+        for i in range(self.bands):
+            yield i, sig[i * self.rows:(i + 1) * self.rows]
+
+    def query(self, sig: Tuple[int, ...]) -> Optional[str]:
+        """Key of an indexed near-duplicate of sig, if any."""
+        seen = set()
+        for i, band in self._bands(sig):
+            for key in self._buckets[i].get(band, ()):
+                if key in seen:
+                    continue
+                seen.add(key)
+                if self.similarity(sig, self._signatures[key]) >= self.threshold:
+                    return key
+        return None
+
+    def insert(self, key: str, sig: Tuple[int, ...]):
+        self._signatures[key] = sig
+        for i, band in self._bands(sig):
+            self._buckets[i].setdefault(band, []).append(key)
+
+    def remove(self, key: str):
+        sig = self._signatures.pop(key, None)
+        if sig is None:
+            return
+        for i, band in self._bands(sig):
+            keys = self._buckets[i].get(band)
+            if keys is not None:
+                keys.remove(key)
+                if not keys:
+                    del self._buckets[i][band]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._signatures
+
+    def __len__(self):
+        return len(self._signatures)
+
+    # -------------- Persistence --------------
+    def save(self, path: str):
+        """Keys and signatures as a compressed .npz (written to path as-is; callers rename)."""
+        keys = list(self._signatures)
+        sigs = np.array([self._signatures[k] for k in keys], dtype=np.uint64).reshape(len(keys), self.num_perm)
+        with open(path, "wb") as f:
+            np.savez_compressed(f, keys=np.array(keys, dtype=str), signatures=sigs)
+
+    @classmethod
+    def load(cls, path: str, threshold: float = 0.85) -> "MinHashLSH":
+        """Index saved by save(); FileNotFoundError/ValueError when missing or unreadable."""
+        lsh = cls(threshold=threshold)
+        with np.load(path) as data:
+            keys, sigs = data["keys"], data["signatures"]
+            if sigs.shape[1:] != (lsh.num_perm,):
+                raise ValueError(f"{path}: signatures have the wrong length")
+            for key, sig in zip(keys.tolist(), sigs.tolist()):
+                lsh.insert(key, tuple(sig))
+        return lsh
+
+
+def add_source(metadata: dict, source: str) -> dict:
+    """metadata with source appended to its "; "-joined sources and the duplicate count bumped."""
+    sources = metadata.get("sources") or metadata.get("source", "")
+    if source and source not in sources.split("; "):
+        sources = f"{sources}; {source}" if sources else source
+    metadata["sources"] = sources
+    metadata["duplicates"] = metadata.get("duplicates", 0) + 1
+    return metadata
+
+
+def dedup_documents(
+    docs: list, ids: List[str], threshold: float = 0.85, index: Optional[MinHashLSH] = None
+) -> Tuple[list, List[str], Dict[str, str], dict]:
+    """
+    Collapse near-duplicate langchain Documents into one representative each.
+    The representative keeps its vector slot and lists every source in
+    metadata["sources"] ("; "-joined, Chroma metadata must be scalar) and
+    metadata["duplicates"].
+    With index (the signatures of chunks already stored), documents are checked
+    against it too and the kept ones are inserted into it; a match there is
+    reported in merged like any other, and updating that stored chunk's
+    metadata is up to the caller.
+    Returns (kept_docs, kept_ids, merged {dropped_id: kept_id}, stats).
+    """
+    lsh = index if index is not None else MinHashLSH(threshold=threshold)
+    kept, kept_ids, merged = [], [], {}
+    by_id = {}
+    for doc, doc_id in zip(docs, ids):
+        sig = lsh.signature(doc.page_content)
+        match = lsh.query(sig)
+        if match is None:
+            lsh.insert(doc_id, sig)
+            kept.append(doc)
+            kept_ids.append(doc_id)
+            by_id[doc_id] = doc
+            continue
+        merged[doc_id] = match
+        if match in by_id:
+            add_source(by_id[match].metadata, doc.metadata.get("source", ""))
+
+    stats = {
+        "chunks_in": len(docs),
+        "chunks_out": len(kept),
+        "removed": len(docs) - len(kept),
+        "reduction": (len(docs) - len(kept)) / len(docs) if docs else 0.0,
+    }
+    return kept, kept_ids, merged, stats
+
+
+def diverse(items: list, k: int, threshold: float = 0.85, text=lambda doc: doc.page_content) -> list:
+    """First k items, skipping any whose text near-duplicates an already chosen one."""
+    chosen, chosen_sh = [], []
+    for item in items:
+        sh = shingles(text(item))
+        if any(jaccard(sh, other) >= threshold for other in chosen_sh):
+            continue
+        chosen.append(item)
+        chosen_sh.append(sh)
+        if len(chosen) == k:
+            break
+    return chosen
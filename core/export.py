@@ -0,0 +1,191 @@
+import argparse
+import json
+import os
+from datetime import datetime, timezone
+from typing import Callable, Iterator, Optional
+
+FORMATS = {".jsonl": "jsonl", ".parquet": "parquet", ".md": "markdown"}
+EXPORT_DIR = os.path.join("memory", "exports")
+
+
+def _utc_naive(ts: datetime) -> datetime:
+    """Log timestamps are naive UTC; aware datetimes are converted to that."""
+    return ts.astimezone(timezone.utc).replace(tzinfo=None) if ts.tzinfo is not None else ts
+
+
+def _parse_ts(value: str) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return _utc_naive(datetime.fromisoformat(value.rstrip("Z")))
+    except ValueError:
+        return None
+
+
+def _parse_bound(value: str) -> datetime:
+    """--since / --until: ISO date or date/time, naive = UTC (like the log), offsets and Z accepted."""
+    try:
+        ts = datetime.fromisoformat(value[:-1] + "+00:00" if value.endswith("Z") else value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not an ISO date/time: {value!r}")
+    return _utc_naive(ts)
+
+
+def filter_messages(
+    messages: Iterator[dict],
+    user_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> Iterator[dict]:
+    """
+    Keep messages for user_id within [since, until) (naive UTC, or aware). Replies
+    logged under the shared "assistant" id follow the user message they answer.
+    """
+    since = _utc_naive(since) if since else None
+    until = _utc_naive(until) if until else None
+    previous_kept = False
+    for msg in messages:
+        if since or until:
+            ts = _parse_ts(msg["ts"])
+            if ts is None or (since and ts < since) or (until and ts >= until):
+                previous_kept = False
+                continue
+        if user_id is not None:
+            keep = msg["user_id"] == user_id or (
+                previous_kept and msg["role"] == "assistant" and msg["user_id"] in ("assistant", "")
+            )
+            previous_kept = keep and msg["role"] == "user"
+            if not keep:
+                continue
+        yield msg
+
+
+# -------------- Writers --------------
+def _write_jsonl(messages, path, progress, batch_size):
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for msg in messages:
+            f.write(json.dumps(msg, ensure_ascii=False) + "\n")
+            count += 1
+            if progress and count % batch_size == 0:
+                progress(count)
+    return count
+
+
+def _write_markdown(messages, path, progress, batch_size):
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("# 🤖 AI Assistant Conversation\n\n")
+        f.write(f"**Exported:** {datetime.now().strftime('%B %d, %Y at %H:%M:%S')}\n\n")
+        f.write("---\n\n")
+        for msg in messages:
+            stamp = f" · {msg['ts']}" if msg["ts"] else ""
+            if msg["role"] == "user":
+                f.write(f"## 👤 You{stamp}\n\n{msg['text']}\n\n")
+            else:
+                f.write(f"## 🤖 Assistant{stamp}\n\n{msg['text']}\n\n---\n\n")
+            count += 1
+            if progress and count % batch_size == 0:
+                progress(count)
+    return count
+
+
+def _write_parquet(messages, path, progress, batch_size):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+
+    fields = ["ts", "role", "user_id", "text", "source"]
+    schema = pa.schema([(name, pa.string()) for name in fields])
+    count = 0
+    batch = {name: [] for name in fields}
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for msg in messages:
+            for name in fields:
+                batch[name].append(msg.get(name, ""))
+            count += 1
+            if count % batch_size == 0:
+                # one row group per batch keeps memory bounded
+                writer.write_table(pa.table(batch, schema=schema))
+                batch = {name: [] for name in fields}
+                if progress:
+                    progress(count)
+        if batch["ts"]:
+            writer.write_table(pa.table(batch, schema=schema))
+    return count
+
+
+_WRITERS = {"jsonl": _write_jsonl, "markdown": _write_markdown, "parquet": _write_parquet}
+
+
+def default_export_path(fmt: str) -> str:
+    ext = {v: k for k, v in FORMATS.items()}[fmt]
+    return os.path.join(EXPORT_DIR, f"conversation_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}{ext}")
+
+
+def export_history(
+    memory,
+    path: Optional[str] = None,
+    fmt: Optional[str] = None,
+    user_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    batch_size: int = 5000,
+    progress: Optional[Callable[[int], None]] = None,
+) -> dict:
+    """
+    Stream the full history (backups + live log) to JSONL, Parquet or Markdown.
+    Memory use is bounded by batch_size messages regardless of history size.
+    fmt defaults from the path extension; path defaults to memory/exports/.
+    """
+    if fmt is None:
+        fmt = FORMATS.get(os.path.splitext(path or "")[1].lower(), "jsonl")
+    if fmt not in _WRITERS:
+        raise ValueError(f"format must be one of {sorted(_WRITERS)}")
+    path = path or default_export_path(fmt)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    # backups rotated before since are not even opened
+    history = memory.iter_messages(since=_utc_naive(since).isoformat() if since else None)
+    messages = filter_messages(history, user_id=user_id, since=since, until=until)
+    tmp = path + ".part"
+    try:
+        count = _WRITERS[fmt](messages, tmp, progress, batch_size)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    os.replace(tmp, path)
+    return {"path": path, "format": fmt, "messages": count, "bytes": os.path.getsize(path)}
+
+
+def main():
+    from core.config import load_config
+    from core.memory import Memory
+
+    parser = argparse.ArgumentParser(description="Export the full conversation history")
+    parser.add_argument("-o", "--output", help="output file (default: memory/exports/...)")
+    parser.add_argument("-f", "--format", choices=sorted(_WRITERS), help="default: from the output extension, else jsonl")
+    parser.add_argument("--user-id", help="only this user's messages (and the replies to them)")
+    parser.add_argument("--since", type=_parse_bound, help="ISO date/time (UTC unless it has an offset), inclusive")
+    parser.add_argument("--until", type=_parse_bound, help="ISO date/time (UTC unless it has an offset), exclusive")
+    args = parser.parse_args()
+
+    mem_cfg = load_config().get("memory", {})
+    memory = Memory(compression=mem_cfg.get("compression", "gzip"), retention=mem_cfg.get("retention"))
+    stats = export_history(
+        memory,
+        path=args.output,
+        fmt=args.format,
+        user_id=args.user_id,
+        since=args.since,
+        until=args.until,
+        progress=lambda n: print(f"… {n} messages", end="\r"),
+    )
+    print(f"📁 Exported {stats['messages']} messages to {stats['path']} ({stats['bytes'] / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
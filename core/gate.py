@@ -0,0 +1,166 @@
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from core.bm25 import tokenize
+
+SMALL_TALK = {
+    "hi", "hey", "hello", "yo", "sup", "thanks", "thank", "thx", "ty", "ok", "okay", "cool", "nice",
+    "great", "lol", "bye", "goodbye", "yes", "no", "yep", "nope", "sure", "morning", "night", "good",
+    "awesome", "wow", "hmm", "haha", "please", "welcome",
+}
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "to", "of", "in", "on", "for", "and", "or",
+    "it", "this", "that", "i", "you", "me", "my", "your", "we", "do", "does", "did", "can", "could",
+    "would", "should", "what", "how", "why", "when", "where", "who", "which", "about", "with", "there",
+    "at", "as", "so", "just", "tell", "give", "show", "explain", "some", "any", "all", "up", "s",
+}
+# prior evidence that a request wants facts from documents, by detected style
+STYLE_PRIOR = {
+    ("info_type", "definitional"): 0.25,
+    ("info_type", "instructional"): 0.2,
+    ("info_type", "qa"): 0.15,
+    ("info_type", "code"): 0.1,
+    ("info_type", "conversational"): -0.1,
+    ("length", "detailed"): 0.1,
+    ("tone", "casual"): -0.1,
+}
+
+
+def content_words(text: str) -> List[str]:
+    """Distinct words of text that carry meaning: no stopwords, small talk or single letters."""
+    return [w for w in dict.fromkeys(tokenize(text)) if w not in STOPWORDS and w not in SMALL_TALK and len(w) > 1]
+
+
+class GateDecision:
+    def __init__(self, retrieve: bool, confidence: float, reason: str, terms: int, coverage: float):
+        self.retrieve = retrieve
+        self.confidence = confidence
+        self.reason = reason
+        self.terms = terms
+        self.coverage = coverage
+
+    def to_dict(self) -> dict:
+        return {
+            "retrieve": self.retrieve,
+            "confidence": round(self.confidence, 3),
+            "reason": self.reason,
+            "terms": self.terms,
+            "coverage": round(self.coverage, 3),
+        }
+
+
+class RetrievalGate:
+    """
+    Decides per request whether the knowledge base is worth querying, without
+    embedding anything:
+      - small talk / no content words -> skip
+      - confidence = KB vocabulary coverage of the content words (idf-weighted,
+        so a rare term the KB knows counts a lot) + style prior + length bonus
+      - retrieve when confidence >= threshold
+    mode "shadow" logs the decision but always retrieves, so a skip's quality
+    impact can be measured (did a would-be-skipped query get useful context?).
+    Decisions are appended to log_path as JSON lines.
+    """
+
+    def __init__(self, threshold: float = 0.45, mode: str = "on", log_path: Optional[str] = "memory/retrieval_gate.jsonl"):
+        if mode not in ("on", "shadow"):
+            raise ValueError("gate mode must be 'on' or 'shadow'")
+        self.threshold = threshold
+        self.mode = mode
+        self.log_path = log_path
+        self.stats = {"requests": 0, "retrieved": 0, "skipped": 0}
+        self._lock = threading.Lock()
+
+    @property
+    def shadow(self) -> bool:
+        return self.mode == "shadow"
+
+    def decide(self, query: str, style: Optional[dict], kb) -> GateDecision:
+        content = content_words(query)
+        if not content:
+            reason = "small talk" if any(w in SMALL_TALK for w in tokenize(query)) else "no content words"
+            return self._count(GateDecision(False, 0.0, reason, 0, 0.0))
+
+        weights = {w: max(kb.idf(w), 0.1) for w in content}
+        known = [w for w in content if kb.doc_frequency(w) > 0]
+        coverage = sum(weights[w] for w in known) / sum(weights.values())
+
+        prior = sum(STYLE_PRIOR.get((field, value), 0.0) for field, value in (style or {}).items())
+        length_bonus = 0.1 * min(len(content), 5) / 5
+        confidence = max(0.0, min(1.0, 0.7 * coverage + prior + length_bonus))
+        retrieve = confidence >= self.threshold
+        reason = f"coverage {coverage:.2f}, prior {prior:+.2f}"
+        return self._count(GateDecision(retrieve, confidence, reason, len(content), coverage))
+
+    def _count(self, decision: GateDecision) -> GateDecision:
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["retrieved" if decision.retrieve else "skipped"] += 1
+        return decision
+
+    def skip_rate(self) -> float:
+        return self.stats["skipped"] / self.stats["requests"] if self.stats["requests"] else 0.0
+
+    def log(self, query: str, style: Optional[dict], decision: GateDecision, context: str = ""):
+        """One line per request; context_chars shows what retrieval returned (or would have, in shadow mode)."""
+        if not self.log_path:
+            return
+        record = {
+            "ts": datetime.utcnow().isoformat() + "Z",
+            "query": query[:200],
+            "style": style,
+            **decision.to_dict(),
+            "mode": self.mode,
+            "context_chars": len(context),
+        }
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+def summarize_log(path: str) -> Dict[str, float]:
+    """Skip rate and, for shadow-mode lines, how often a would-be skip had context."""
+    total = skipped = shadow_skips = shadow_skips_with_context = 0
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                r = json.loads(line)
+            except ValueError:
+                continue
+            total += 1
+            if not r["retrieve"]:
+                skipped += 1
+                if r.get("mode") == "shadow":
+                    shadow_skips += 1
+                    shadow_skips_with_context += int(r.get("context_chars", 0) > 0)
+    return {
+        "requests": total,
+        "skip_rate": skipped / total if total else 0.0,
+        "shadow_skips": shadow_skips,
+        "shadow_skips_with_context": shadow_skips_with_context,
+    }
+
+
+def gate_from_config(cfg: dict) -> Optional[RetrievalGate]:
+    """RetrievalGate from the "rag.gate" config section (None when disabled)."""
+    if not cfg.get("enabled", False):
+        return None
+    return RetrievalGate(
+        threshold=cfg.get("threshold", 0.45),
+        mode=cfg.get("mode", "on"),
+        log_path=cfg.get("log", "memory/retrieval_gate.jsonl"),
+    )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarize the retrieval gate log")
+    parser.add_argument("log", nargs="?", default="memory/retrieval_gate.jsonl")
+    summary = summarize_log(parser.parse_args().log)
+    print(json.dumps(summary, indent=2))
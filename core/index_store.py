@@ -0,0 +1,360 @@
+"""
+Binary storage for the llama_index index in memory/index (used by agents/reflection.py).
+
+llama_index's default stores are JSON: every embedding float is text and the whole
+docstore is parsed on load. Here instead:
+  - store.sqlite3: docstore and index store as a key/value table indexed by
+    (collection, key), so documents are read on demand; plus one row per vector
+    (node id, row number, ref doc id, metadata)
+  - vectors-<n>.npy: float32 embeddings, memory-mapped (nothing is parsed on load)
+
+open_storage() migrates the JSON files once (they are moved to json_backup/) and
+returns a regular StorageContext, so load_index_from_storage / storage.persist()
+work as before.
+
+    python -m core.index_store [memory/index]    # migrate and print load timings
+"""
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode
+from llama_index.core.storage.kvstore.types import DEFAULT_COLLECTION, BaseKVStore
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    VectorStoreQuery,
+    VectorStoreQueryMode,
+    VectorStoreQueryResult,
+)
+from llama_index.core.vector_stores.utils import node_to_metadata_dict
+
+DB_FILE = "store.sqlite3"
+JSON_FILES = ("docstore.json", "index_store.json", "default__vector_store.json")
+BACKUP_DIR = "json_backup"
+_FORMAT_KEY = "format"
+_FORMAT_COLLECTION = "storage"
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE IF NOT EXISTS kv (collection TEXT, key TEXT, value TEXT, PRIMARY KEY (collection, key))")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS vectors (node_id TEXT PRIMARY KEY, row INTEGER, ref_doc_id TEXT, metadata TEXT)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS vectors_ref ON vectors (ref_doc_id)")
+    return conn
+
+
+class SqliteKVStore(BaseKVStore):
+    """llama_index key/value store in one SQLite table; values are compact JSON."""
+
+    def __init__(self, path: str, conn: Optional[sqlite3.Connection] = None):
+        self.path = path
+        self._conn = conn or _connect(path)
+        self._lock = threading.Lock()
+
+    def put(self, key: str, val: dict, collection: str = DEFAULT_COLLECTION) -> None:
+        self.put_all([(key, val)], collection=collection)
+
+    async def aput(self, key: str, val: dict, collection: str = DEFAULT_COLLECTION) -> None:
+        self.put(key, val, collection)
+
+    def put_all(self, kv_pairs: List[tuple], collection: str = DEFAULT_COLLECTION, batch_size: int = 1) -> None:
+        rows = [(collection, key, json.dumps(val, separators=(",", ":"), ensure_ascii=False)) for key, val in kv_pairs]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO kv VALUES (?, ?, ?)", rows)
+
+    async def aput_all(self, kv_pairs: List[tuple], collection: str = DEFAULT_COLLECTION, batch_size: int = 1) -> None:
+        self.put_all(kv_pairs, collection, batch_size)
+
+    def get(self, key: str, collection: str = DEFAULT_COLLECTION) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM kv WHERE collection = ? AND key = ?", (collection, key)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    async def aget(self, key: str, collection: str = DEFAULT_COLLECTION) -> Optional[dict]:
+        return self.get(key, collection)
+
+    def get_all(self, collection: str = DEFAULT_COLLECTION) -> Dict[str, dict]:
+        with self._lock:
+            rows = self._conn.execute("SELECT key, value FROM kv WHERE collection = ?", (collection,)).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    async def aget_all(self, collection: str = DEFAULT_COLLECTION) -> Dict[str, dict]:
+        return self.get_all(collection)
+
+    def delete(self, key: str, collection: str = DEFAULT_COLLECTION) -> bool:
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM kv WHERE collection = ? AND key = ?", (collection, key))
+        return cursor.rowcount > 0
+
+    async def adelete(self, key: str, collection: str = DEFAULT_COLLECTION) -> bool:
+        return self.delete(key, collection)
+
+
+class MmapVectorStore(BasePydanticVectorStore):
+    """
+    Dense vector store over a memory-mapped float32 .npy file (cosine similarity,
+    like SimpleVectorStore). Additions and deletions are kept in memory until
+    persist(), which writes a new vectors-<n>.npy and switches to it in the same
+    SQLite transaction that rewrites the row table, so a crash leaves the old
+    version intact.
+    """
+
+    stores_text: bool = False
+
+    _dir: str = PrivateAttr()
+    _conn: Any = PrivateAttr()
+    _lock: Any = PrivateAttr()
+    _version: int = PrivateAttr(default=0)
+    _ids: List[str] = PrivateAttr(default_factory=list)
+    _matrix: Any = PrivateAttr(default=None)
+    _norms: Any = PrivateAttr(default=None)
+    _deleted: set = PrivateAttr(default_factory=set)
+    _pending: Dict[str, tuple] = PrivateAttr(default_factory=dict)  # node_id -> (vector, ref_doc_id, metadata)
+    _warned_modes: set = PrivateAttr(default_factory=set)  # non-dense query modes already reported
+
+    def __init__(self, persist_dir: str, conn: Optional[sqlite3.Connection] = None, **kwargs):
+        super().__init__(**kwargs)
+        os.makedirs(persist_dir, exist_ok=True)
+        self._dir = persist_dir
+        self._conn = conn or _connect(os.path.join(persist_dir, DB_FILE))
+        self._lock = threading.Lock()
+        self._load()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "MmapVectorStore"
+
+    @property
+    def client(self) -> None:
+        return None
+
+    def _load(self):
+        row = self._conn.execute("SELECT value FROM kv WHERE collection = ? AND key = ?", (_FORMAT_COLLECTION, _FORMAT_KEY)).fetchone()
+        self._version = json.loads(row[0])["vectors_version"] if row else 0
+        self._ids = [r[0] for r in self._conn.execute("SELECT node_id FROM vectors ORDER BY row")]
+        path = self._vectors_path(self._version)
+        if self._ids and os.path.exists(path):
+            self._matrix = np.load(path, mmap_mode="r")
+            self._norms = None  # computed on first query
+        else:
+            self._ids, self._matrix = [], None
+
+    def _vectors_path(self, version: int) -> str:
+        return os.path.join(self._dir, f"vectors-{version}.npy")
+
+    # -------------- Updates --------------
+    def add(self, nodes: Sequence[BaseNode], **add_kwargs: Any) -> List[str]:
+        with self._lock:
+            for node in nodes:
+                metadata = node_to_metadata_dict(node, remove_text=True, flat_metadata=False)
+                self._pending[node.node_id] = (np.asarray(node.get_embedding(), dtype=np.float32), node.ref_doc_id, metadata)
+                self._deleted.discard(node.node_id)
+        return [node.node_id for node in nodes]
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        with self._lock:
+            for (node_id,) in self._conn.execute("SELECT node_id FROM vectors WHERE ref_doc_id = ?", (ref_doc_id,)):
+                self._deleted.add(node_id)
+            for node_id in [n for n, (_, ref, _) in self._pending.items() if ref == ref_doc_id]:
+                del self._pending[node_id]
+
+    def persist(self, persist_path: Optional[str] = None, fs: Any = None) -> None:
+        """Write live vectors to a new vectors-<n>.npy (persist_path's name is ignored; the files live in persist_dir)."""
+        with self._lock:
+            if not self._pending and not self._deleted and (self._matrix is not None or not self._ids):
+                return
+            keep = [(i, node_id) for i, node_id in enumerate(self._ids) if node_id not in self._deleted and node_id not in self._pending]
+            parts = []
+            if keep and self._matrix is not None:
+                parts.append(np.asarray(self._matrix[[i for i, _ in keep]], dtype=np.float32))
+            if self._pending:
+                parts.append(np.stack([v for v, _, _ in self._pending.values()]))
+            matrix = np.concatenate(parts) if parts else np.zeros((0, 0), dtype=np.float32)
+            version = self._version + 1
+            tmp = self._vectors_path(version) + ".tmp.npy"
+            np.save(tmp, matrix)
+            os.replace(tmp, self._vectors_path(version))
+
+            live = {node_id for _, node_id in keep}
+            kept_meta = {
+                node_id: (ref, meta)
+                for node_id, ref, meta in self._conn.execute("SELECT node_id, ref_doc_id, metadata FROM vectors")
+                if node_id in live
+            }
+            rows = [(node_id, row, *kept_meta[node_id]) for row, (_, node_id) in enumerate(keep)]
+            rows += [
+                (node_id, len(keep) + j, ref, json.dumps(meta, separators=(",", ":"), ensure_ascii=False))
+                for j, (node_id, (_, ref, meta)) in enumerate(self._pending.items())
+            ]
+            fmt = json.dumps({"vectors_version": version})
+            with self._conn:
+                self._conn.execute("DELETE FROM vectors")
+                self._conn.executemany("INSERT INTO vectors VALUES (?, ?, ?, ?)", rows)
+                self._conn.execute("INSERT OR REPLACE INTO kv VALUES (?, ?, ?)", (_FORMAT_COLLECTION, _FORMAT_KEY, fmt))
+            old = self._vectors_path(self._version)
+            self._matrix = None
+            if os.path.exists(old):
+                os.remove(old)
+            self._version = version
+            self._pending, self._deleted = {}, set()
+            self._ids = [row[0] for row in rows]
+            self._matrix = np.load(self._vectors_path(version), mmap_mode="r") if rows else None
+            self._norms = None
+
+    # -------------- Reads --------------
+    def _snapshot(self):
+        """(ids, matrix, norms) including unsaved additions, minus deletions."""
+        ids = [i for i in self._ids if i not in self._deleted and i not in self._pending]
+        matrix = self._matrix
+        if matrix is not None and self._norms is None:
+            self._norms = np.linalg.norm(matrix, axis=1)
+        if matrix is not None and len(ids) != len(self._ids):
+            rows = [r for r, i in enumerate(self._ids) if i not in self._deleted and i not in self._pending]
+            matrix, norms = np.asarray(matrix[rows]), self._norms[rows]
+        else:
+            norms = self._norms
+        if self._pending:
+            extra = np.stack([v for v, _, _ in self._pending.values()])
+            ids = ids + list(self._pending)
+            matrix = extra if matrix is None or not len(matrix) else np.concatenate([matrix, extra])
+            norms = np.linalg.norm(extra, axis=1) if norms is None or not len(norms) else np.concatenate([norms, np.linalg.norm(extra, axis=1)])
+        return ids, matrix, norms
+
+    def _metadata(self, node_ids: List[str]) -> Dict[str, tuple]:
+        out = {n: (ref, meta) for n, (_, ref, meta) in self._pending.items() if n in set(node_ids)}
+        for start in range(0, len(node_ids), 500):
+            chunk = node_ids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for node_id, ref, meta in self._conn.execute(
+                f"SELECT node_id, ref_doc_id, metadata FROM vectors WHERE node_id IN ({placeholders})", chunk
+            ):
+                out[node_id] = (ref, json.loads(meta))
+        return out
+
+    def get(self, text_id: str) -> List[float]:
+        with self._lock:
+            ids, matrix, _ = self._snapshot()
+        return np.asarray(matrix[ids.index(text_id)]).tolist()
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if query.query_embedding is None:
+            raise ValueError(f"MmapVectorStore needs a query embedding (dense search); got none for mode {query.mode.value}")
+        if query.mode != VectorStoreQueryMode.DEFAULT and query.mode not in self._warned_modes:
+            self._warned_modes.add(query.mode)
+            print(f"⚠️ MmapVectorStore has no {query.mode.value} search, using dense similarity instead")
+        with self._lock:
+            ids, matrix, norms = self._snapshot()
+            if not ids or matrix is None:
+                return VectorStoreQueryResult(similarities=[], ids=[])
+            allowed = np.ones(len(ids), dtype=bool)
+            if query.node_ids is not None:
+                wanted = set(query.node_ids)
+                allowed &= np.array([i in wanted for i in ids])
+            if query.doc_ids is not None or query.filters is not None:
+                meta = self._metadata(ids)
+                if query.doc_ids is not None:
+                    docs = set(query.doc_ids)
+                    allowed &= np.array([meta.get(i, (None, None))[0] in docs for i in ids])
+                if query.filters is not None:
+                    from llama_index.core.vector_stores.simple import _build_metadata_filter_fn
+
+                    keep = _build_metadata_filter_fn(lambda node_id: meta[node_id][1], query.filters)
+                    allowed &= np.array([keep(i) for i in ids])
+            q = np.asarray(query.query_embedding, dtype=np.float32)
+            sims = (np.asarray(matrix) @ q) / np.maximum(norms * np.linalg.norm(q), 1e-12)
+        sims[~allowed] = -np.inf
+        k = min(query.similarity_top_k, int(allowed.sum()))
+        if k <= 0:
+            return VectorStoreQueryResult(similarities=[], ids=[])
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top])]
+        return VectorStoreQueryResult(similarities=[float(sims[i]) for i in top], ids=[ids[i] for i in top])
+
+
+# -------------- Migration / loading --------------
+def migrate_json(persist_dir: str) -> bool:
+    """Copy llama_index's JSON stores into store.sqlite3 + vectors-1.npy once; the JSON files go to json_backup/."""
+    sources = [os.path.join(persist_dir, name) for name in JSON_FILES]
+    if not any(os.path.exists(p) for p in sources):
+        return False
+    conn = _connect(os.path.join(persist_dir, DB_FILE))
+    kv = SqliteKVStore(os.path.join(persist_dir, DB_FILE), conn)
+    for name in ("docstore.json", "index_store.json"):
+        path = os.path.join(persist_dir, name)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for collection, entries in json.load(f).items():
+                    kv.put_all(list(entries.items()), collection=collection)
+
+    path = os.path.join(persist_dir, "default__vector_store.json")
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        ids = list(data.get("embedding_dict", {}))
+        matrix = np.asarray([data["embedding_dict"][i] for i in ids], dtype=np.float32) if ids else np.zeros((0, 0), dtype=np.float32)
+        np.save(os.path.join(persist_dir, "vectors-1.npy"), matrix)
+        refs, metas = data.get("text_id_to_ref_doc_id", {}), data.get("metadata_dict", {})
+        with conn:
+            conn.execute("DELETE FROM vectors")
+            conn.executemany(
+                "INSERT INTO vectors VALUES (?, ?, ?, ?)",
+                [(i, row, refs.get(i), json.dumps(metas.get(i, {}), separators=(",", ":"), ensure_ascii=False)) for row, i in enumerate(ids)],
+            )
+            conn.execute("INSERT OR REPLACE INTO kv VALUES (?, ?, ?)", (_FORMAT_COLLECTION, _FORMAT_KEY, json.dumps({"vectors_version": 1})))
+
+    backup = os.path.join(persist_dir, BACKUP_DIR)
+    os.makedirs(backup, exist_ok=True)
+    for p in sources:
+        if os.path.exists(p):
+            shutil.move(p, os.path.join(backup, os.path.basename(p)))
+    conn.close()
+    print(f"📦 Migrated llama_index JSON stores in {persist_dir} to {DB_FILE} (originals in {BACKUP_DIR}/)")
+    return True
+
+
+def open_storage(persist_dir: str = "memory/index"):
+    """StorageContext over the binary stores (migrating JSON stores on first use)."""
+    from llama_index.core import StorageContext
+    from llama_index.core.graph_stores import SimpleGraphStore
+    from llama_index.core.storage.docstore.keyval_docstore import KVDocumentStore
+    from llama_index.core.storage.index_store.keyval_index_store import KVIndexStore
+
+    os.makedirs(persist_dir, exist_ok=True)
+    migrate_json(persist_dir)
+    conn = _connect(os.path.join(persist_dir, DB_FILE))
+    kv = SqliteKVStore(os.path.join(persist_dir, DB_FILE), conn)
+    graph_path = os.path.join(persist_dir, "graph_store.json")
+    return StorageContext.from_defaults(
+        docstore=KVDocumentStore(kv),
+        index_store=KVIndexStore(kv),
+        vector_store=MmapVectorStore(persist_dir, conn),
+        graph_store=SimpleGraphStore.from_persist_path(graph_path) if os.path.exists(graph_path) else SimpleGraphStore(),
+    )
+
+
+def load_index(persist_dir: str = "memory/index"):
+    """The persisted VectorStoreIndex, or None when the directory holds no index yet."""
+    from llama_index.core import load_index_from_storage
+
+    storage = open_storage(persist_dir)
+    if not storage.index_store.index_structs():
+        return None
+    return load_index_from_storage(storage)
+
+
+if __name__ == "__main__":
+    import sys
+
+    target = sys.argv[1] if len(sys.argv) > 1 else "memory/index"
+    started = time.perf_counter()
+    index = load_index(target)
+    print(f"✅ Loaded {'index' if index else 'empty storage'} from {target} in {(time.perf_counter() - started) * 1000:.0f} ms")
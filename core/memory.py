@@ -1,22 +1,45 @@
-import json
+import gzip
+import io
 import os
+import re
 import shutil
+import threading
+import time
 from datetime import datetime
-from typing import List, Tuple, Optional
+from typing import Callable, Dict, Iterator, List, Tuple, Optional
+
+CLEAR_ROLE = "clear"  # per-session clear marker, see Memory.clear_session
+_BACKUP_NAME = re.compile(r"^conversation_(\d{8}_\d{6})(?:_(\d+))?\.txt(\.gz|\.zst)?$")
 
 
 class Memory:
     """
     File-based memory:
       - conversation log at memory/conversation_log.txt
-      - backups to memory/backups/
+      - backups to memory/backups/ (rotated by rename, compressed in the background)
       - persona prefs at memory/persona.json
       - documents dir stays as-is for your notes
+
+    compression: "gzip" or "zstd" (needs the zstandard package; falls back to gzip)
+    retention: {"max_count": N, "max_age_days": D, "max_total_mb": M}, any subset; off
+      (None / missing) by default, so backups are only ever deleted when a limit is set
     """
 
-    def __init__(self, base_dir: str = "memory", enable: bool = True):
+    def __init__(
+        self,
+        base_dir: str = "memory",
+        enable: bool = True,
+        compression: str = "gzip",
+        retention: Optional[Dict[str, float]] = None,
+    ):
         self.enabled = enable
         self.base_dir = base_dir
+        self.compression = compression
+        self.retention = retention or {}
+        self._lock = threading.Lock()
+        self._backup_lock = threading.Lock()  # one compress-and-prune pass at a time
+        self._workers: List[threading.Thread] = []
+        self._listeners: List[Callable[[dict], None]] = []
         self.log_path = os.path.join(base_dir, "conversation_log.txt")
         self.backup_dir = os.path.join(base_dir, "backups")
         self.persona_path = os.path.join(base_dir, "persona.json")
@@ -32,22 +55,22 @@ class Memory:
                 f.write("")
 
     # -------------- Persona persistence --------------
+    @property
+    def persona_store(self):
+        """Cached persona.json; saves are debounced and atomic (see core.settings)."""
+        from core.settings import get_store
+
+        return get_store(self.persona_path)
+
     def load_persona(self) -> Optional[dict]:
         if not self.enabled:
             return None
-        try:
-            with open(self.persona_path, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return None
-        except Exception:
-            return None
+        return self.persona_store.data or None
 
     def save_persona(self, persona_dict: dict):
         if not self.enabled:
             return
-        with open(self.persona_path, "w", encoding="utf-8") as f:
-            json.dump(persona_dict, f, ensure_ascii=False, indent=2)
+        self.persona_store.update(persona_dict)
 
     # -------------- Conversation logging --------------
     def append_message(self, role: str, text: str, ts: Optional[str] = None, user_id: Optional[str] = None):
@@ -56,8 +79,23 @@ class Memory:
         ts = ts or (datetime.utcnow().isoformat() + "Z")
         safe_text = text.replace("\n", "\\n")
         line = f"{ts}\t{role}\t{user_id or ''}\t{safe_text}\n"
-        with open(self.log_path, "a", encoding="utf-8") as f:
-            f.write(line)
+        with self._lock:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(line)
+        record = {"ts": ts, "role": role, "user_id": user_id or "", "text": text}
+        for listener in self._listeners:
+            listener(record)
+
+    def add_listener(self, listener: Callable[[dict], None]):
+        """listener(record) is called after each append_message ({"ts", "role", "user_id", "text"}); keep it fast."""
+        self._listeners.append(listener)
+
+    def _parse_record(self, line: str) -> Optional[dict]:
+        parts = line.rstrip("\n").split("\t", 3)
+        # ts, role, user_id, text
+        if len(parts) < 4:
+            return None
+        return {"ts": parts[0], "role": parts[1], "user_id": parts[2], "text": parts[3].replace("\\n", "\n")}
 
     def _parse_line(self, line: str) -> Optional[Tuple[str, str]]:
         # returns (user_text, bot_text) pairs is handled at higher-level
@@ -71,25 +109,47 @@ class Memory:
             pass
         return None
 
-    def load_history_pairs(self, max_messages: Optional[int] = None) -> List[Tuple[str, str]]:
+    def load_history_pairs(self, max_messages: Optional[int] = None, user_id: Optional[str] = None) -> List[Tuple[str, str]]:
         """
         Returns a list of (user, assistant) tuples for Gradio Chatbot.
         We pair messages in order; if odd count, trailing user message stays unpaired.
+        With user_id, only that session's messages after its last clear_session().
         """
         if not self.enabled or not os.path.exists(self.log_path):
             return []
 
         roles_and_texts = []
         with open(self.log_path, "r", encoding="utf-8") as f:
-            for line in f:
-                parsed = self._parse_line(line)
-                if parsed:
-                    roles_and_texts.append(parsed)
+            if user_id is None:
+                for line in f:
+                    parsed = self._parse_line(line)
+                    if parsed and parsed[0] != CLEAR_ROLE:
+                        roles_and_texts.append(parsed)
+            else:
+                previous_kept = False
+                for line in f:
+                    record = self._parse_record(line)
+                    if record is None:
+                        continue
+                    # replies logged by older versions carry the shared "assistant" id
+                    keep = record["user_id"] == user_id or (
+                        previous_kept and record["role"] == "assistant" and record["user_id"] == "assistant"
+                    )
+                    previous_kept = keep and record["role"] == "user"
+                    if not keep:
+                        continue
+                    if record["role"] == CLEAR_ROLE:
+                        roles_and_texts = []
+                    else:
+                        roles_and_texts.append((record["role"], record["text"]))
 
         # optionally only take last N role entries
         if max_messages is not None and max_messages > 0:
             roles_and_texts = roles_and_texts[-max_messages:]
+        return self._pair_messages(roles_and_texts)
 
+    @staticmethod
+    def _pair_messages(roles_and_texts: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
         pairs: List[Tuple[str, str]] = []
         buffer_user = None
         for role, text in roles_and_texts:
@@ -112,17 +172,264 @@ class Memory:
 
         return pairs
 
+    def load_history_page(
+        self, limit: int = 50, before: Optional[int] = None, user_id: Optional[str] = None
+    ) -> Tuple[List[Tuple[str, str]], Optional[int]]:
+        """
+        One page of history for the Chatbot, read from the end of the log:
+        (pairs, cursor). pairs holds the newest `limit` messages older than byte
+        offset `before` (None = end of the log), paired like load_history_pairs;
+        a reply whose question is one message past the limit brings it along, so
+        pages never split an exchange. Pass cursor as `before` to get the page
+        before it; it is None once the start of the log (or, with user_id, the
+        session's last clear_session()) is reached.
+
+        Byte offsets stay valid while new messages are appended, and only the
+        tail of the log is read, however long it is; backup_log() starts a new log.
+        """
+        if not self.enabled or not os.path.exists(self.log_path):
+            return [], None
+        limit = max(1, limit)
+        messages: List[Tuple[int, str, str]] = []  # newest first
+        cursor = None
+        for offset, role, text in self._iter_tail(before, user_id):
+            completes_pair = len(messages) == limit and messages[-1][1] == "assistant" and role == "user"
+            if len(messages) >= limit and not completes_pair:
+                cursor = messages[-1][0]
+                break
+            messages.append((offset, role, text))
+        return self._pair_messages([(role, text) for _, role, text in reversed(messages)]), cursor
+
+    def _iter_tail(self, before: Optional[int], user_id: Optional[str]) -> Iterator[Tuple[int, str, str]]:
+        """(byte offset, role, text) of the live log's messages, newest first, filtered like load_history_pairs."""
+        legacy_reply = None  # shared-"assistant" reply, kept if the message before it is this session's
+        for offset, line in self._reverse_lines(before):
+            record = self._parse_record(line)
+            if record is None:
+                continue
+            if user_id is None:
+                if record["role"] != CLEAR_ROLE:
+                    yield offset, record["role"], record["text"]
+                continue
+            if legacy_reply is not None:
+                if record["role"] == "user" and record["user_id"] == user_id:
+                    yield legacy_reply
+                legacy_reply = None
+            if record["user_id"] == user_id:
+                if record["role"] == CLEAR_ROLE:
+                    return
+                yield offset, record["role"], record["text"]
+            elif record["role"] == "assistant" and record["user_id"] == "assistant":
+                legacy_reply = (offset, record["role"], record["text"])
+
+    def _reverse_lines(self, before: Optional[int], block_size: int = 64 * 1024) -> Iterator[Tuple[int, str]]:
+        """Lines of the live log that end before byte offset `before`, last line first, with their start offsets."""
+        with open(self.log_path, "rb") as f:
+            end = f.seek(0, os.SEEK_END)
+            if before is not None:
+                end = max(0, min(before, end))
+            remainder = b""  # start of a line cut at the block boundary, completed by the next (older) block
+            while end > 0:
+                start = max(0, end - block_size)
+                f.seek(start)
+                pieces = (f.read(end - start) + remainder).split(b"\n")
+                offsets, position = [], start
+                for piece in pieces:
+                    offsets.append(position)
+                    position += len(piece) + 1
+                first = 1 if start > 0 else 0
+                remainder = pieces[0] if first else b""
+                for offset, piece in zip(reversed(offsets[first:]), reversed(pieces[first:])):
+                    if piece:
+                        yield offset, piece.rstrip(b"\r").decode("utf-8", errors="replace")
+                end = start
+
+    def clear_session(self, user_id: str):
+        """
+        Clear one session's history without touching other sessions: a marker is
+        logged and load_history_pairs(user_id=...) starts after it. The messages
+        themselves stay in the log (and exports) until the next backup_log().
+        """
+        self.append_message(role=CLEAR_ROLE, text="", user_id=user_id)
+
+    # -------------- Backups --------------
     def backup_log(self) -> Optional[str]:
-        """Copy current log to backups with timestamp and clear it."""
+        """
+        Rotate the current log into backups and start a fresh one.
+        The log is moved with an atomic rename (nothing appended meanwhile is lost:
+        late writers land in the rotated file), then compressed and pruned in the
+        background. Returns the compressed backup path.
+        """
         if not self.enabled:
             return None
         if not os.path.exists(self.log_path):
             return None
-        ts = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-        backup_name = f"conversation_{ts}.txt"
-        backup_path = os.path.join(self.backup_dir, backup_name)
-        shutil.copy2(self.log_path, backup_path)
-        # clear current
-        with open(self.log_path, "w", encoding="utf-8") as f:
-            f.write("")
-        return backup_path
+        ext = self._compressed_ext()
+        with self._lock:
+            # name chosen under the lock, so concurrent same-second backups get distinct numbers;
+            # numbered after the newest one, even if older ones were pruned
+            ts = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+            taken = [_backup_sort_key(name)[1] for name in os.listdir(self.backup_dir) if name.startswith(f"conversation_{ts}") and _BACKUP_NAME.match(name)]
+            backup_name = f"conversation_{ts}_{max(taken) + 1}.txt" if taken else f"conversation_{ts}.txt"
+            backup_path = os.path.join(self.backup_dir, backup_name)
+            os.replace(self.log_path, backup_path)
+            with open(self.log_path, "w", encoding="utf-8") as f:
+                f.write("")
+
+        worker = threading.Thread(target=self._compress_and_prune, args=(backup_path,), daemon=True)
+        self._workers = [w for w in self._workers if w.is_alive()] + [worker]
+        worker.start()
+        return backup_path + ext
+
+    def flush(self):
+        """Wait for background backup compression to finish and write pending persona changes."""
+        for worker in list(self._workers):
+            worker.join()
+        self._workers = []
+        if self.enabled:
+            self.persona_store.flush()
+
+    def _compressed_ext(self) -> str:
+        if self.compression == "zstd":
+            try:
+                import zstandard  # noqa: F401
+                return ".zst"
+            except ImportError:
+                pass
+        return ".gz"
+
+    def _compress_and_prune(self, path: str):
+        # passes from back-to-back backup_log() calls would otherwise prune the same files
+        with self._backup_lock:
+            self._compress(path)
+            if not any(limit is not None for limit in self.retention.values()):
+                return  # retention is opt-in
+            try:
+                self.prune_backups()
+            except OSError as e:
+                print(f"⚠️ Could not prune backups: {e}")
+
+    def _compress(self, path: str):
+        if not os.path.exists(path):
+            return  # already pruned by retention
+        ext = self._compressed_ext()
+        tmp = path + ext + ".tmp"
+        try:
+            with open(path, "rb") as src:
+                if ext == ".zst":
+                    import zstandard
+
+                    with open(tmp, "wb") as dst:
+                        zstandard.ZstdCompressor(level=10).copy_stream(src, dst)
+                else:
+                    with gzip.open(tmp, "wb", compresslevel=6) as dst:
+                        shutil.copyfileobj(src, dst)
+            shutil.copystat(path, tmp)
+            os.replace(tmp, path + ext)
+            os.remove(path)
+        except OSError as e:
+            print(f"⚠️ Could not compress backup {path}: {e}")
+
+    def list_backups(self) -> List[str]:
+        """Backup files, oldest first (by the timestamp in their name)."""
+        if not os.path.isdir(self.backup_dir):
+            return []
+        names = [n for n in os.listdir(self.backup_dir) if _BACKUP_NAME.match(n)]
+        return [os.path.join(self.backup_dir, n) for n in sorted(names, key=_backup_sort_key)]
+
+    def prune_backups(self) -> List[str]:
+        """Apply retention (count / age / total size), oldest first. Returns removed paths."""
+        backups = self.list_backups()
+        max_count = self.retention.get("max_count")
+        max_age = self.retention.get("max_age_days")
+        max_bytes = self.retention.get("max_total_mb")
+        max_bytes = max_bytes * 1_000_000 if max_bytes is not None else None
+        stats = {}
+        for p in backups:
+            try:
+                stats[p] = os.stat(p)
+            except OSError:
+                pass  # removed or renamed (compressed) meanwhile
+        backups = [p for p in backups if p in stats]
+        total = sum(st.st_size for st in stats.values())
+        now = time.time()
+
+        removed = []
+        for path in backups:
+            remaining = len(backups) - len(removed)
+            too_many = max_count is not None and remaining > max_count
+            too_old = max_age is not None and now - stats[path].st_mtime > max_age * 86400
+            too_big = max_bytes is not None and total > max_bytes
+            if not (too_many or too_old or too_big):
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= stats[path].st_size
+            removed.append(path)
+        return removed
+
+    # -------------- Streaming reads --------------
+    @staticmethod
+    def _open_text(path: str):
+        if path.endswith(".gz"):
+            return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+        if path.endswith(".zst"):
+            import zstandard
+
+            raw = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+            return io.TextIOWrapper(raw, encoding="utf-8", errors="replace")
+        return open(path, "r", encoding="utf-8", errors="replace")
+
+    def iter_messages(self, include_backups: bool = True, since: Optional[str] = None) -> Iterator[dict]:
+        """
+        Stream every message, oldest first: compressed/plain backups, then the live log.
+        Yields {"ts", "role", "user_id", "text", "source"}; nothing is decompressed to disk.
+        Early backups in the old "You: / AI:" format are parsed as well (ts is empty).
+        since (a message ts): backups rotated before that second are not opened, as
+        everything in them is older; later files are read in full.
+        """
+        backups = self.list_backups() if include_backups else []
+        if since:
+            backups = [path for path in backups if _backup_time(os.path.basename(path)) >= since[:19]]
+        sources = backups + [self.log_path]
+        for path in sources:
+            try:
+                f = self._open_text(path)
+            except FileNotFoundError:
+                continue
+            with f:
+                legacy = None
+                for line in f:
+                    record = self._parse_record(line)
+                    if record is None:
+                        # legacy transcript: "You: ..." / "AI: ..." with continuation lines
+                        if line.startswith(("You: ", "AI: ")):
+                            if legacy:
+                                yield legacy
+                            role = "user" if line.startswith("You: ") else "assistant"
+                            legacy = {"ts": "", "role": role, "user_id": "", "text": line.split(": ", 1)[1].rstrip("\n"), "source": path}
+                        elif legacy is not None:
+                            legacy["text"] += "\n" + line.rstrip("\n")
+                        continue
+                    if legacy:
+                        yield legacy
+                        legacy = None
+                    if record["role"] == CLEAR_ROLE:
+                        continue
+                    record["source"] = path
+                    yield record
+                if legacy:
+                    yield legacy
+
+
+def _backup_time(name: str) -> str:
+    """Rotation time of a backup as an ISO timestamp to the second, comparable with message ts."""
+    stamp = _BACKUP_NAME.match(name).group(1)
+    return f"{stamp[:4]}-{stamp[4:6]}-{stamp[6:8]}T{stamp[9:11]}:{stamp[11:13]}:{stamp[13:15]}"
+
+
+def _backup_sort_key(name: str):
+    m = _BACKUP_NAME.match(name)
+    return m.group(1), int(m.group(2) or 0)
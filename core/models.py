@@ -0,0 +1,203 @@
+import gc
+import threading
+import time
+from typing import Dict, List, Optional
+
+try:
+    from langchain_core.embeddings import Embeddings as _LangchainEmbeddings
+except ImportError:  # langchain not installed: the adapter still works by duck typing
+    _LangchainEmbeddings = object
+
+
+def canonical(name: str) -> str:
+    """'all-MiniLM-L6-v2' and 'sentence-transformers/all-MiniLM-L6-v2' are the same model."""
+    return name if "/" in name else f"sentence-transformers/{name}"
+
+
+class _Entry:
+    def __init__(self, model, load_s: float, rss_delta: Optional[int]):
+        self.model = model
+        self.load_s = load_s
+        self.rss_delta = rss_delta
+        self.last_used = time.monotonic()
+        self.uses = 0
+
+
+def _rss() -> Optional[int]:
+    try:
+        import psutil
+
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return None
+
+
+def _param_bytes(model) -> int:
+    try:
+        return sum(t.numel() * t.element_size() for t in list(model.parameters()) + list(model.buffers()))
+    except AttributeError:
+        return 0
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of SentenceTransformer models:
+      - each model is loaded once, on first use (thread-safe; concurrent first
+        users wait for the same load)
+      - models unused for idle_timeout seconds are unloaded by a reaper thread
+        and transparently reloaded on next use
+      - memory_report() lists parameter memory (and RSS growth at load, with psutil)
+    """
+
+    def __init__(self, idle_timeout: Optional[float] = 900.0, device: Optional[str] = None):
+        self.idle_timeout = idle_timeout
+        self.device = device
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+        self._loading: Dict[str, threading.Lock] = {}
+        self._reaper: Optional[threading.Thread] = None
+        self.loads = 0
+
+    def get(self, name: str):
+        name = canonical(name)
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                load_lock = self._loading.setdefault(name, threading.Lock())
+        if entry is None:
+            with load_lock:
+                with self._lock:
+                    entry = self._entries.get(name)
+                if entry is None:
+                    entry = self._load(name)
+        entry.last_used = time.monotonic()
+        entry.uses += 1
+        return entry.model
+
+    def _load(self, name: str) -> _Entry:
+        from sentence_transformers import SentenceTransformer
+
+        print(f"📦 Loading embedding model {name}...")
+        before, started = _rss(), time.perf_counter()
+        model = SentenceTransformer(name, device=self.device)
+        after = _rss()
+        entry = _Entry(model, time.perf_counter() - started, after - before if before is not None and after is not None else None)
+        with self._lock:
+            self._entries[name] = entry
+            self.loads += 1
+        self._start_reaper()
+        return entry
+
+    def unload(self, name: str) -> bool:
+        with self._lock:
+            entry = self._entries.pop(canonical(name), None)
+        if entry is None:
+            return False
+        del entry
+        gc.collect()
+        try:
+            import torch
+
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+        return True
+
+    def unload_idle(self) -> List[str]:
+        if self.idle_timeout is None:
+            return []
+        now = time.monotonic()
+        with self._lock:
+            idle = [n for n, e in self._entries.items() if now - e.last_used > self.idle_timeout]
+        for name in idle:
+            self.unload(name)
+            print(f"💤 Unloaded idle embedding model {name}")
+        return idle
+
+    def _start_reaper(self):
+        if self.idle_timeout is None or (self._reaper and self._reaper.is_alive()):
+            return
+
+        def reap():
+            while True:
+                time.sleep(max(1.0, min(60.0, (self.idle_timeout or 60.0) / 4)))
+                self.unload_idle()
+                with self._lock:
+                    if not self._entries:
+                        self._reaper = None
+                        return
+
+        self._reaper = threading.Thread(target=reap, daemon=True, name="model-reaper")
+        self._reaper.start()
+
+    def memory_report(self) -> List[dict]:
+        now = time.monotonic()
+        with self._lock:
+            entries = list(self._entries.items())
+        return [
+            {
+                "model": name,
+                "param_mb": round(_param_bytes(e.model) / 1e6, 1),
+                "rss_delta_mb": round(e.rss_delta / 1e6, 1) if e.rss_delta is not None else None,
+                "load_s": round(e.load_s, 2),
+                "uses": e.uses,
+                "idle_s": round(now - e.last_used, 1),
+            }
+            for name, e in entries
+        ]
+
+
+_registry = ModelRegistry()
+
+
+def registry() -> ModelRegistry:
+    return _registry
+
+
+def configure(cfg: dict):
+    """Apply the "models" config section to the shared registry."""
+    _registry.idle_timeout = cfg.get("idle_unload_seconds", _registry.idle_timeout)
+    _registry.device = cfg.get("device", _registry.device)
+
+
+# -------------- Adapters --------------
+class SharedLangchainEmbeddings(_LangchainEmbeddings):
+    """langchain Embeddings over a registry model (same vectors as HuggingFaceEmbeddings)."""
+
+    def __init__(self, model_name: str, batch_size: int = 32):
+        self.model_name = canonical(model_name)
+        self.batch_size = batch_size
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        texts = [t.replace("\n", " ") for t in texts]
+        return registry().get(self.model_name).encode(texts, batch_size=self.batch_size).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class SharedLlamaIndexEmbedding:
+    """The embedding interface llama_index's Settings.embed_model is used through, over a registry model."""
+
+    def __init__(self, model_name: str, batch_size: int = 32):
+        self.model_name = canonical(model_name)
+        self.batch_size = batch_size
+
+    @property
+    def model(self):
+        return registry().get(self.model_name)
+
+    def get_query_embedding(self, q):
+        return self.model.encode(q).tolist()
+
+    def get_text_embedding(self, t):
+        return self.model.encode(t).tolist()
+
+    def get_text_embedding_batch(self, texts, **kwargs):
+        return self.model.encode(list(texts), batch_size=self.batch_size).tolist()
+
+    def get_agg_embedding_from_queries(self, queries, **kwargs):
+        import numpy as np
+
+        return np.mean(self.model.encode(list(queries)), axis=0).tolist()
@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+import time
+import zlib
+from typing import Callable, Iterable, List, Optional, Set, Tuple
+
+CACHE_EXT = ".json.z"
+
+
+def file_hash(path: str, block: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(block), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ParseCache:
+    """
+    Extracted document text keyed by file content hash, so parsing (PyPDFLoader)
+    happens once per distinct file no matter how often the KB is re-chunked.
+      - one zlib-compressed JSON file per source: [[page_text, metadata], ...]
+      - least recently used entries are evicted beyond max_bytes
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 200_000_000):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _entry(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, digest + CACHE_EXT)
+
+    def _entries(self) -> List[Tuple[str, os.stat_result]]:
+        out = []
+        with os.scandir(self.cache_dir) as it:
+            for e in it:
+                if e.is_file() and e.name.endswith(CACHE_EXT):
+                    out.append((e.path, e.stat()))
+        return out
+
+    # -------------- Lookup --------------
+    def get(self, path: str, digest: Optional[str] = None) -> Optional[List[Tuple[str, dict]]]:
+        digest = digest or file_hash(path)
+        entry = self._entry(digest)
+        try:
+            with open(entry, "rb") as f:
+                pages = json.loads(zlib.decompress(f.read()).decode("utf-8"))
+        except (FileNotFoundError, zlib.error, ValueError):
+            self.misses += 1
+            return None
+        os.utime(entry)  # mark as recently used
+        self.hits += 1
+        # the same content may live under another name; report the path actually loaded
+        return [(text, {**meta, "source": path}) for text, meta in pages]
+
+    def put(self, digest: str, pages: List[Tuple[str, dict]]):
+        data = zlib.compress(json.dumps(pages, ensure_ascii=False).encode("utf-8"), 6)
+        entry = self._entry(digest)
+        tmp = entry + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, entry)
+        self.enforce_limit()
+
+    def load(self, path: str, parse: Callable[[str], List[Tuple[str, dict]]]) -> List[Tuple[str, dict]]:
+        """Cached pages for path, calling parse(path) only on a miss."""
+        digest = file_hash(path)
+        pages = self.get(path, digest)
+        if pages is None:
+            pages = parse(path)
+            self.put(digest, pages)
+        return pages
+
+    # -------------- Maintenance --------------
+    def stats(self) -> dict:
+        entries = self._entries()
+        return {
+            "entries": len(entries),
+            "bytes": sum(st.st_size for _, st in entries),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def enforce_limit(self) -> int:
+        entries = sorted(self._entries(), key=lambda e: e[1].st_mtime)
+        total = sum(st.st_size for _, st in entries)
+        removed = 0
+        while entries and total > self.max_bytes:
+            path, st = entries.pop(0)
+            os.remove(path)
+            total -= st.st_size
+            removed += 1
+        return removed
+
+    def clean(self, max_age_days: Optional[float] = None, keep_hashes: Optional[Set[str]] = None, clear: bool = False) -> int:
+        """
+        Remove entries: everything (clear), not used for max_age_days, and/or whose
+        hash is not in keep_hashes (sources that no longer exist). Returns count removed.
+        """
+        cutoff = time.time() - max_age_days * 86400 if max_age_days is not None else None
+        removed = 0
+        for path, st in self._entries():
+            digest = os.path.basename(path)[: -len(CACHE_EXT)]
+            if (
+                clear
+                or (cutoff is not None and st.st_mtime < cutoff)
+                or (keep_hashes is not None and digest not in keep_hashes)
+            ):
+                os.remove(path)
+                removed += 1
+        return removed
+
+
+def hashes_of(paths: Iterable[str]) -> Set[str]:
+    return {file_hash(p) for p in paths if os.path.isfile(p)}
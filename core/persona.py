@@ -1,4 +1,3 @@
-import json
 from typing import Dict, Optional
 
 
@@ -28,7 +27,20 @@ class Persona:
         }
 
     def update(self, key: str, value: Optional[str]):
-        if hasattr(self, key) and value is not None:
+        self.update_many({key: value})
+
+    def update_many(self, changes: Dict) -> Dict:
+        """
+        Apply several fields at once; persisted as one (debounced, atomic) save.
+        Returns the fields that actually changed.
+        """
+        changed = {
+            key: value
+            for key, value in changes.items()
+            if hasattr(self, key) and value is not None and getattr(self, key) != value
+        }
+        for key, value in changed.items():
             setattr(self, key, value)
-            if self._memory and self.remember_prefs:
-                self._memory.save_persona(self.to_dict())
+        if changed and self._memory and self.remember_prefs:
+            self._memory.save_persona(self.to_dict())
+        return changed
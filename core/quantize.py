@@ -0,0 +1,370 @@
+import gzip
+import json
+import os
+import re
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DTYPES = ("float32", "float16", "int8")
+_BLOCK = 8192  # rows dequantized at a time while scoring
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def quantize(vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Returns (codes, scales). int8 uses symmetric per-vector scalar quantization:
+    v ~= codes * scale with scale = max|v| / 127.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dtype == "float32":
+        return vectors, None
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    if dtype == "int8":
+        scales = np.abs(vectors).max(axis=-1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.round(vectors / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+    raise ValueError(f"dtype must be one of {DTYPES}")
+
+
+def dequantize(codes: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+    out = codes.astype(np.float32)
+    if scales is not None:
+        out *= scales[:, None]
+    return out
+
+
+def scores(codes: np.ndarray, scales: Optional[np.ndarray], query: np.ndarray) -> np.ndarray:
+    """Dot products of a float32 query with quantized rows, dequantizing block by block."""
+    out = np.empty(len(codes), dtype=np.float32)
+    for start in range(0, len(codes), _BLOCK):
+        out[start:start + _BLOCK] = codes[start:start + _BLOCK].astype(np.float32) @ query
+    if scales is not None:
+        out *= scales
+    return out
+
+
+def top_k(values: np.ndarray, k: int) -> np.ndarray:
+    if k >= len(values):
+        return np.argsort(-values)
+    idx = np.argpartition(-values, k)[:k]
+    return idx[np.argsort(-values[idx])]
+
+
+class QuantizedVectorStore:
+    """
+    Minimal vector store (the part of the Chroma API KnowledgeBase uses) that keeps
+    embeddings quantized in memory and on disk:
+      - float16: 2 bytes/dim
+      - int8: 1 byte/dim + one float32 scale per vector
+    Vectors are L2-normalised first, so scores are cosine similarities.
+    With rerank=True a float32 copy is kept on disk and memory-mapped; only the
+    top rerank_factor * k candidates are re-scored against it.
+
+    Files in persist_directory (like legacy Chroma, call persist() after updates;
+    KnowledgeBase does):
+      - store.npz: codes, scales, texts/metadatas and the float32 row map, replaced
+        atomically by persist()
+      - exact-<n>.f32: raw float32 rows, appended as documents are added; deleted
+        rows are only dropped from the row map until persist() finds more than half
+        of the file dead and writes the next generation
+    An index built with rerank=False has no float32 copy: reopened with rerank=True
+    it keeps working without reranking (rebuild it to get one). Opening an index
+    that has one with rerank=False leaves the copy alone; it stays usable as long
+    as no documents are added meanwhile (deletes keep its row map up to date).
+    """
+
+    def __init__(self, persist_directory: str, embedding_function, dtype: str = "int8", rerank: bool = True, rerank_factor: int = 4):
+        if dtype not in ("float16", "int8"):
+            raise ValueError("QuantizedVectorStore dtype must be float16 or int8")
+        self.persist_directory = persist_directory
+        self._embedding = embedding_function
+        self.dtype = dtype
+        self.rerank = rerank
+        self.rerank_factor = rerank_factor
+        os.makedirs(persist_directory, exist_ok=True)
+
+        self.ids: List[str] = []
+        self.texts: List[str] = []
+        self.metadatas: List[dict] = []
+        self.codes = np.zeros((0, 0), dtype=np.int8 if dtype == "int8" else np.float16)
+        self.scales = np.zeros(0, dtype=np.float32) if dtype == "int8" else None
+        self.exact = None  # memory-mapped rows of the current exact-<n>.f32
+        self._exact_gen = 1
+        self._exact_rows = np.zeros(0, dtype=np.int64)  # store row -> row in exact-<n>.f32
+        self._exact_dim = 0
+        self._load()
+
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.persist_directory, name)
+
+    def _exact_path(self, gen: Optional[int] = None) -> str:
+        return self._path(f"exact-{self._exact_gen if gen is None else gen}.f32")
+
+    # -------------- Persistence --------------
+    def _load(self):
+        exact = None
+        if os.path.exists(self._path("store.npz")):
+            with np.load(self._path("store.npz")) as data:
+                docs = json.loads(gzip.decompress(data["docs"].tobytes()).decode("utf-8"))
+                self.codes = data["codes"]
+                if self.scales is not None:
+                    self.scales = data["scales"]
+                exact = docs.get("exact")
+        elif os.path.exists(self._path("docs.json.gz")):
+            # written by an older version: codes.npy / scales.npy / docs.json.gz / exact.npy
+            with gzip.open(self._path("docs.json.gz"), "rt", encoding="utf-8") as f:
+                docs = json.load(f)
+            self.codes = np.load(self._path("codes.npy"))
+            if self.scales is not None:
+                self.scales = np.load(self._path("scales.npy"))
+        else:
+            return
+        self.ids, self.texts, self.metadatas = docs["ids"], docs["texts"], docs["metadatas"]
+        if self.rerank and exact is None and os.path.exists(self._path("exact.npy")):
+            legacy = np.load(self._path("exact.npy"), mmap_mode="r")
+            if len(legacy) == len(self.ids) and len(legacy):
+                exact = {"gen": 1, "dim": legacy.shape[1], "rows": list(range(len(legacy)))}
+                with open(self._exact_path(1), "wb") as f:
+                    for start in range(0, len(legacy), _BLOCK):
+                        f.write(np.ascontiguousarray(legacy[start:start + _BLOCK], dtype=np.float32).tobytes())
+        if exact is not None and len(exact["rows"]) == len(self.ids):
+            self._exact_gen, self._exact_dim = exact["gen"], exact["dim"]
+            self._exact_rows = np.asarray(exact["rows"], dtype=np.int64)
+            if not self.rerank:
+                return  # tracked but not mapped, so persist() keeps it for a later reopen with rerank
+            if self._remap_exact(truncate=True) > (self._exact_rows.max() if len(self._exact_rows) else -1):
+                return
+        if not self.rerank:
+            return
+        self._exact_rows = np.zeros(0, dtype=np.int64)
+        self.exact = None
+        if self.ids:
+            print(f"⚠️ {self.persist_directory} has no float32 copy of its vectors: searching without rerank (rebuild the index to enable it)")
+            self.rerank = False
+
+    def _remap_exact(self, truncate: bool = False) -> int:
+        """Map the current exact-<n>.f32 (dropping a partly written last row); returns its row count."""
+        self.exact = None
+        path = self._exact_path()
+        row_bytes = self._exact_dim * 4
+        size = os.path.getsize(path) if os.path.exists(path) and row_bytes else 0
+        rows = size // row_bytes if row_bytes else 0
+        if truncate and size != rows * row_bytes:
+            with open(path, "ab") as f:
+                f.truncate(rows * row_bytes)
+        if rows:
+            self.exact = np.memmap(path, dtype=np.float32, mode="r", shape=(rows, self._exact_dim))
+        return rows
+
+    def persist(self):
+        if self.rerank and self.exact is not None and len(self.exact) > 2 * len(self._exact_rows):
+            self._compact_exact()
+        docs = {"ids": self.ids, "texts": self.texts, "metadatas": self.metadatas}
+        tracked = bool(self._exact_dim) and len(self._exact_rows) == len(self.ids)
+        if tracked:
+            docs["exact"] = {"gen": self._exact_gen, "dim": self._exact_dim, "rows": self._exact_rows.tolist()}
+        arrays = {
+            "codes": self.codes,
+            "docs": np.frombuffer(gzip.compress(json.dumps(docs, ensure_ascii=False).encode("utf-8")), dtype=np.uint8),
+        }
+        if self.scales is not None:
+            arrays["scales"] = self.scales
+        tmp = self._path("store.npz.tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, self._path("store.npz"))
+        # the pre-store.npz files are no longer read; float32 files only go once a newer
+        # generation (or, for exact.npy, its migration) is what store.npz tracks and uses
+        for fname in os.listdir(self.persist_directory):
+            gen = re.fullmatch(r"exact-(\d+)\.f32", fname)
+            if fname in ("codes.npy", "scales.npy", "docs.json.gz") or (
+                tracked and self.rerank and (fname == "exact.npy" or (gen and int(gen.group(1)) < self._exact_gen))
+            ):
+                os.remove(self._path(fname))
+
+    def _compact_exact(self):
+        """Copy the live float32 rows into the next generation file; the old one goes once store.npz points here."""
+        gen = self._exact_gen + 1
+        with open(self._exact_path(gen), "wb") as f:
+            for start in range(0, len(self._exact_rows), _BLOCK):
+                f.write(np.ascontiguousarray(self.exact[self._exact_rows[start:start + _BLOCK]]).tobytes())
+        self._exact_gen = gen
+        self._exact_rows = np.arange(len(self._exact_rows), dtype=np.int64)
+        self._remap_exact()
+
+    # -------------- Updates --------------
+    def add_documents(self, documents: list, ids: Optional[List[str]] = None):
+        if not documents:
+            return []
+        ids = ids or [str(len(self.ids) + i) for i in range(len(documents))]
+        existing = set(self.ids)
+        self.delete(ids=[i for i in ids if i in existing])
+        vectors = normalize(self._embedding.embed_documents([d.page_content for d in documents]))
+        codes, scales = quantize(vectors, self.dtype)
+        self.codes = np.concatenate([self.codes, codes]) if len(self.codes) else codes
+        if self.scales is not None:
+            self.scales = np.concatenate([self.scales, scales])
+        if self.rerank:
+            self._append_exact(vectors)
+        self.ids.extend(ids)
+        self.texts.extend(d.page_content for d in documents)
+        self.metadatas.extend(dict(d.metadata) for d in documents)
+        return ids
+
+    def _append_exact(self, vectors: np.ndarray):
+        """Append float32 rows to the current exact-<n>.f32 (the file is never rewritten here)."""
+        self._exact_dim = self._exact_dim or vectors.shape[1]
+        start = len(self.exact) if self.exact is not None else 0
+        self.exact = None  # release the mapping before growing the file
+        with open(self._exact_path(), "ab") as f:
+            f.seek(start * self._exact_dim * 4)
+            f.truncate()
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        self._exact_rows = np.concatenate([self._exact_rows, np.arange(start, start + len(vectors), dtype=np.int64)])
+        self._remap_exact()
+
+    def delete(self, ids: Optional[Iterable[str]] = None):
+        drop = set(ids or ())
+        if not drop:
+            return
+        keep = np.array([i not in drop for i in self.ids], dtype=bool)
+        if keep.all():
+            return
+        self.codes = self.codes[keep]
+        if self.scales is not None:
+            self.scales = self.scales[keep]
+        if len(self._exact_rows) == len(keep):
+            self._exact_rows = self._exact_rows[keep]
+        self.ids = [i for i, k in zip(self.ids, keep) if k]
+        self.texts = [t for t, k in zip(self.texts, keep) if k]
+        self.metadatas = [m for m, k in zip(self.metadatas, keep) if k]
+
+    def update_metadatas(self, ids: Sequence[str], metadatas: Sequence[dict]):
+        pos = {doc_id: i for i, doc_id in enumerate(self.ids)}
+        for doc_id, meta in zip(ids, metadatas):
+            if doc_id in pos:
+                self.metadatas[pos[doc_id]] = dict(meta)
+
+    # -------------- Reads --------------
+    def get(self, ids: Optional[Sequence[str]] = None, include: Optional[Sequence[str]] = None, **kwargs) -> Dict[str, list]:
+        include = include or ["documents", "metadatas"]
+        if ids is None:
+            rows = list(range(len(self.ids)))
+        else:
+            pos = {doc_id: i for i, doc_id in enumerate(self.ids)}
+            rows = [pos[i] for i in ids if i in pos]
+        out = {"ids": [self.ids[r] for r in rows]}
+        if "documents" in include:
+            out["documents"] = [self.texts[r] for r in rows]
+        if "metadatas" in include:
+            out["metadatas"] = [self.metadatas[r] for r in rows]
+        if "embeddings" in include:
+            out["embeddings"] = [self._vector(r).tolist() for r in rows]
+        return out
+
+    def _vector(self, row: int) -> np.ndarray:
+        if self.rerank and self.exact is not None:
+            return np.asarray(self.exact[self._exact_rows[row]], dtype=np.float32)
+        scales = None if self.scales is None else self.scales[row:row + 1]
+        return dequantize(self.codes[row:row + 1], scales)[0]
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding: Sequence[float], k: int = 4):
+        from langchain_core.documents import Document
+
+        if not self.ids:
+            return []
+        q = normalize(np.asarray(embedding, dtype=np.float32))
+        sims = scores(self.codes, self.scales, q)
+        rerank = self.rerank and self.exact is not None
+        rows = top_k(sims, k * self.rerank_factor if rerank else k)
+        if rerank:
+            exact = np.asarray(self.exact[self._exact_rows[np.sort(rows)]]) @ q
+            order = np.argsort(-exact)[:k]
+            rows, picked = np.sort(rows)[order], exact[order]
+        else:
+            picked = sims[rows]
+        # like Chroma, the "by_vector" variant returns distances (normalised L2), not relevance
+        return [
+            (Document(page_content=self.texts[r], metadata=self.metadatas[r]), distance(float(s)))
+            for r, s in zip(rows, picked)
+        ]
+
+    def similarity_search_with_relevance_scores(self, query: str, k: int = 4):
+        hits = self.similarity_search_by_vector_with_relevance_scores(self._embedding.embed_query(query), k=k)
+        return [(doc, relevance(d)) for doc, d in hits]
+
+    def _select_relevance_score_fn(self):
+        return relevance
+
+    def similarity_search(self, query: str, k: int = 4):
+        return [doc for doc, _ in self.similarity_search_with_relevance_scores(query, k=k)]
+
+    def memory_bytes(self) -> int:
+        """Resident bytes of the quantized vectors (the float32 copy stays on disk)."""
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+
+def distance(cosine: float) -> float:
+    """L2 distance between unit vectors with the given cosine similarity."""
+    return float(np.sqrt(max(0.0, 2.0 - 2.0 * cosine)))
+
+
+def relevance(dist: float) -> float:
+    """Same [0, 1] scale langchain's Chroma uses for normalised L2: 1 - dist / sqrt(2)."""
+    return 1.0 - dist / float(np.sqrt(2.0))
+
+
+# -------------- Recall vs memory --------------
+def recall_memory_report(vectors: np.ndarray, queries: np.ndarray, k: int = 5, rerank_factor: int = 4) -> List[dict]:
+    """
+    For each storage setting: bytes per vector, total bytes, recall@k against exact
+    float32 search, and mean query time.
+    """
+    vectors = normalize(vectors)
+    queries = normalize(queries)
+    truth = [set(top_k(vectors @ q, k)) for q in queries]
+    rows = []
+    for dtype in DTYPES:
+        codes, scales = quantize(vectors, dtype)
+        for rerank in ((False,) if dtype == "float32" else (False, True)):
+            hits, started = 0, time.perf_counter()
+            for q, expected in zip(queries, truth):
+                sims = scores(codes, scales, q)
+                cand = top_k(sims, k * rerank_factor if rerank else k)
+                if rerank:
+                    cand = cand[np.argsort(-(vectors[cand] @ q))[:k]]
+                hits += len(expected.intersection(cand.tolist()))
+            elapsed = time.perf_counter() - started
+            mem = codes.nbytes + (scales.nbytes if scales is not None else 0)
+            rows.append({
+                "storage": dtype + (" + f32 rerank" if rerank else ""),
+                "bytes_per_vector": mem / max(len(vectors), 1),
+                "memory_mb": mem / 1e6,
+                f"recall@{k}": hits / (k * max(len(queries), 1)),
+                "query_ms": 1000 * elapsed / max(len(queries), 1),
+            })
+    return rows
+
+
+def format_report(rows: List[dict]) -> str:
+    if not rows:
+        return "(no vectors)"
+    headers = list(rows[0])
+    cells = [[f"{r[h]:.3f}" if isinstance(r[h], float) else str(r[h]) for h in headers] for r in rows]
+    widths = [max(len(h), *(len(c[i]) for c in cells)) for i, h in enumerate(headers)]
+    line = lambda vals: "  ".join(v.ljust(w) for v, w in zip(vals, widths))
+    return "\n".join([line(headers), line(["-" * w for w in widths])] + [line(c) for c in cells])
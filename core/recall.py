@@ -0,0 +1,366 @@
+import json
+import os
+import queue
+import threading
+import time
+from array import array
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.context import estimate_tokens
+from core.gate import content_words
+from core.quantize import normalize, quantize, scores
+
+DEFAULT_RECALL = {
+    "enabled": False,
+    "dir": None,  # default: <memory dir>/semantic
+    "model": "sentence-transformers/all-MiniLM-L6-v2",
+    "batch_size": 32,
+    "flush_seconds": 5.0,
+    "catch_up_limit": 2000,
+    "k": 3,
+    "min_score": 0.35,
+    "budget_tokens": 200,
+}
+_MAX_CHARS = 2000  # per side of an exchange, stored and embedded
+_LEGACY_REPLY_IDS = ("", "assistant")  # replies logged before they carried the session's user_id
+
+
+class ConversationIndex:
+    """
+    Semantic long-term memory: a vector index over past exchanges (a user message
+    and the reply to it), searched per user_id for prompt context.
+
+    Files in index_dir (append-only, so adding a batch never rewrites the index):
+      - codes.i8 / scales.f32: int8-quantized, L2-normalised embeddings (core.quantize),
+        memory-mapped for search
+      - exchanges.jsonl: {"ts", "user_id", "user", "assistant"} per row, read by offset
+      - offsets.i64 / users.i32: per row, its byte offset in exchanges.jsonl and its
+        user code, so opening the index does not read the exchanges
+      - state.json: model, dimension, row count, user ids (in code order) and the newest
+        indexed timestamp (rows past the recorded count, e.g. from a crash mid-append,
+        are discarded; sidecars that fall short are rebuilt from exchanges.jsonl)
+
+    Messages reach it through Memory listeners (on_message) and are embedded on a
+    background thread in batches of batch_size, or after flush_seconds. Exchanges
+    whose user message has no content words (small talk like "hi" / "thanks") are
+    not indexed. At start the same thread catches up on what Memory holds past the
+    last indexed timestamp (backups rotated before it are not read), embedding at
+    most the newest catch_up_limit exchanges, so a first run over a long history
+    stays bounded.
+    """
+
+    def __init__(
+        self,
+        memory,
+        index_dir: str = "memory/semantic",
+        model: str = DEFAULT_RECALL["model"],
+        batch_size: int = 32,
+        flush_seconds: float = 5.0,
+        catch_up_limit: int = 2000,
+    ):
+        from core.models import SharedLangchainEmbeddings
+
+        self.memory = memory
+        self.index_dir = index_dir
+        self.model = model
+        self.embeddings = SharedLangchainEmbeddings(model)
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.catch_up_limit = catch_up_limit
+        self.stats = {"indexed": 0, "skipped": 0, "searches": 0, "last_search_ms": 0.0}
+
+        self._lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue()  # message dicts, threading.Event = flush, None = stop
+        self._pending: Dict[str, dict] = {}  # user_id -> user message waiting for its reply
+        self._last_user_id: Optional[str] = None
+        self._dim = 0
+        self._rows = 0
+        self._watermark = ""
+        self._offsets = array("q")
+        self._user_codes = array("i")
+        self._users: Dict[str, int] = {}
+        self._codes = None
+        self._scales = None
+        os.makedirs(index_dir, exist_ok=True)
+        self._load()
+        self._worker = threading.Thread(target=self._run, daemon=True, name="recall-index")
+        self._worker.start()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.index_dir, name)
+
+    # -------------- Persistence --------------
+    def _load(self):
+        try:
+            with open(self._path("state.json"), "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (FileNotFoundError, ValueError):
+            state = {}
+        if state.get("model") != self.model:
+            # new index, or embedded with another model: start over
+            for name in ("codes.i8", "scales.f32", "exchanges.jsonl", "offsets.i64", "users.i32"):
+                if os.path.exists(self._path(name)):
+                    os.remove(self._path(name))
+            state = {}
+        self._dim = state.get("dim", 0)
+        self._watermark = state.get("watermark", "")
+        rows = state.get("rows", 0)
+
+        if rows and not self._load_sidecars(rows, state.get("users")):
+            self._rebuild_sidecars(rows)
+        self._rows = len(self._offsets)
+        offset = 0
+        if self._rows:
+            with open(self._path("exchanges.jsonl"), "rb") as f:
+                f.seek(self._offsets[-1])
+                offset = self._offsets[-1] + len(f.readline())
+        # drop anything appended after the last recorded state
+        for name, size in (
+            ("exchanges.jsonl", offset),
+            ("codes.i8", self._rows * self._dim),
+            ("scales.f32", self._rows * 4),
+            ("offsets.i64", self._rows * 8),
+            ("users.i32", self._rows * 4),
+        ):
+            with open(self._path(name), "ab") as f:
+                f.truncate(size)
+        self._remap()
+
+    def _load_sidecars(self, rows: int, users: Optional[List[str]]) -> bool:
+        """Row offsets and user codes from offsets.i64 / users.i32; False if they do not cover rows."""
+        try:
+            offsets = np.fromfile(self._path("offsets.i64"), dtype=np.int64)
+            codes = np.fromfile(self._path("users.i32"), dtype=np.int32)
+        except (FileNotFoundError, ValueError):
+            return False
+        if users is None or len(offsets) < rows or len(codes) < rows or (rows and codes[:rows].max() >= len(users)):
+            return False
+        self._offsets = array("q", offsets[:rows].tobytes())
+        self._user_codes = array("i", codes[:rows].tobytes())
+        self._users = {user_id: code for code, user_id in enumerate(users)}
+        return True
+
+    def _rebuild_sidecars(self, rows: int):
+        """Written by an older version (or the sidecars are short): read exchanges.jsonl once."""
+        self._offsets, self._user_codes, self._users = array("q"), array("i"), {}
+        offset = 0
+        if os.path.exists(self._path("exchanges.jsonl")):
+            with open(self._path("exchanges.jsonl"), "rb") as f:
+                for line in f:
+                    if len(self._offsets) == rows:
+                        break
+                    self._offsets.append(offset)
+                    self._user_codes.append(self._user_code(json.loads(line)["user_id"]))
+                    offset += len(line)
+        with open(self._path("offsets.i64"), "wb") as f:
+            f.write(self._offsets.tobytes())
+        with open(self._path("users.i32"), "wb") as f:
+            f.write(self._user_codes.tobytes())
+        self._rows = len(self._offsets)
+        self._save_state()
+
+    def _save_state(self):
+        state = {"model": self.model, "dim": self._dim, "rows": self._rows, "users": list(self._users), "watermark": self._watermark}
+        tmp = self._path("state.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, self._path("state.json"))
+
+    def _remap(self):
+        if not self._rows:
+            self._codes = self._scales = None
+            return
+        self._codes = np.memmap(self._path("codes.i8"), dtype=np.int8, mode="r", shape=(self._rows, self._dim))
+        self._scales = np.memmap(self._path("scales.f32"), dtype=np.float32, mode="r", shape=(self._rows,))
+
+    def _user_code(self, user_id: str) -> int:
+        if user_id not in self._users:
+            self._users[user_id] = len(self._users)
+        return self._users[user_id]
+
+    # -------------- Ingestion --------------
+    def on_message(self, record: dict):
+        """Memory listener: {"ts", "role", "user_id", "text"} as it is appended."""
+        self._queue.put(record)
+
+    def _pair(self, record: dict) -> Optional[dict]:
+        """Turn a message stream into exchanges: a reply completes its user's pending message."""
+        user_id = record.get("user_id") or ""
+        if record["role"] == "user":
+            self._pending[user_id] = record
+            self._last_user_id = user_id
+            return None
+        if record["role"] != "assistant":
+            return None
+        if user_id in _LEGACY_REPLY_IDS and user_id not in self._pending:
+            user_id = self._last_user_id
+        question = self._pending.pop(user_id, None) if user_id is not None else None
+        if question is None:
+            return None
+        if not content_words(question["text"]):
+            self.stats["skipped"] += 1
+            return None
+        return {
+            "ts": record.get("ts") or question.get("ts") or "",
+            "user_id": question.get("user_id") or "",
+            "user": question["text"][:_MAX_CHARS],
+            "assistant": record["text"][:_MAX_CHARS],
+        }
+
+    def _catch_up(self):
+        newest: deque = deque(maxlen=self.catch_up_limit)
+        for record in self.memory.iter_messages(since=self._watermark or None):
+            if self._watermark and record.get("ts", "") <= self._watermark:
+                continue
+            exchange = self._pair(record)
+            if exchange:
+                newest.append(exchange)
+        self._pending.clear()
+        batch = list(newest)
+        for start in range(0, len(batch), self.batch_size):
+            self._append(batch[start:start + self.batch_size])
+
+    def _run(self):
+        try:
+            self._catch_up()
+        except Exception as e:
+            print(f"⚠️ Could not index past conversations: {e}")
+        batch: List[dict] = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = threading.Event()  # flush_seconds elapsed: same as an explicit flush
+            if isinstance(item, dict):
+                exchange = self._pair(item)
+                # exchanges already picked up by the catch-up pass (same log line) are skipped
+                if exchange is None or (exchange["ts"] and exchange["ts"] <= self._watermark):
+                    continue
+                batch.append(exchange)
+                deadline = deadline or time.monotonic() + self.flush_seconds
+                if len(batch) < self.batch_size:
+                    continue
+            if batch:
+                self._append_safely(batch)
+                batch, deadline = [], None
+            if item is None:
+                return
+            if isinstance(item, threading.Event):
+                item.set()
+
+    def _append_safely(self, batch: List[dict]):
+        try:
+            self._append(batch)
+        except Exception as e:
+            print(f"⚠️ Could not index {len(batch)} exchange(s): {e}")
+
+    def _append(self, batch: List[dict]):
+        texts = [f"{e['user']}\n{e['assistant']}" for e in batch]
+        vectors = normalize(self.embeddings.embed_documents(texts))
+        codes, scales = quantize(vectors, "int8")
+        lines = [(json.dumps(e, ensure_ascii=False) + "\n").encode("utf-8") for e in batch]
+        with self._lock:
+            if not self._dim:
+                self._dim = codes.shape[1]
+            offset = os.path.getsize(self._path("exchanges.jsonl")) if os.path.exists(self._path("exchanges.jsonl")) else 0
+            with open(self._path("exchanges.jsonl"), "ab") as f:
+                f.writelines(lines)
+            with open(self._path("codes.i8"), "ab") as f:
+                f.write(codes.tobytes())
+            with open(self._path("scales.f32"), "ab") as f:
+                f.write(scales.tobytes())
+            start = len(self._offsets)
+            for e, line in zip(batch, lines):
+                self._offsets.append(offset)
+                self._user_codes.append(self._user_code(e["user_id"]))
+                offset += len(line)
+            with open(self._path("offsets.i64"), "ab") as f:
+                f.write(self._offsets[start:].tobytes())
+            with open(self._path("users.i32"), "ab") as f:
+                f.write(self._user_codes[start:].tobytes())
+            self._rows += len(batch)
+            self._watermark = max([self._watermark] + [e["ts"] for e in batch])
+            self._save_state()
+            self._remap()
+            self.stats["indexed"] += len(batch)
+
+    def flush(self, timeout: float = 30.0):
+        """Embed whatever is queued now (e.g. before shutdown)."""
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self):
+        self.flush()
+        self._queue.put(None)
+        self._worker.join(timeout=5)
+
+    # -------------- Search --------------
+    def __len__(self):
+        return self._rows
+
+    def _exchange(self, row: int) -> dict:
+        with open(self._path("exchanges.jsonl"), "rb") as f:
+            f.seek(self._offsets[row])
+            return json.loads(f.readline())
+
+    def search(self, query: str, user_id: Optional[str], k: int = 3, min_score: float = 0.35) -> List[Tuple[dict, float]]:
+        """Most similar past exchanges of user_id (all users when None), best first."""
+        started = time.perf_counter()
+        with self._lock:
+            if not self._rows or (user_id is not None and user_id not in self._users):
+                return []
+            codes, scales = self._codes, self._scales
+            users = np.frombuffer(self._user_codes, dtype=np.int32).copy() if user_id is not None else None
+            uid = self._users.get(user_id)
+        q = normalize(self.embeddings.embed_query(query))
+        values = scores(codes, scales, q)
+        if users is not None:
+            values[users != uid] = -np.inf
+        k = min(k, len(values))
+        top = np.argpartition(-values, k - 1)[:k] if k < len(values) else np.arange(len(values))
+        top = top[np.argsort(-values[top])]
+        hits = [(self._exchange(int(r)), float(values[r])) for r in top if values[r] >= min_score]
+        self.stats["searches"] += 1
+        self.stats["last_search_ms"] = (time.perf_counter() - started) * 1000
+        return hits
+
+    def context(self, query: str, user_id: Optional[str], k: int = 3, min_score: float = 0.35, budget_tokens: int = 200) -> str:
+        """Relevant past exchanges as prompt text, at most budget_tokens (the last one trimmed to fit)."""
+        parts, used = [], 0
+        for exchange, _ in self.search(query, user_id, k=k, min_score=min_score):
+            piece = f"User: {exchange['user']}\nAssistant: {exchange['assistant']}"
+            room = budget_tokens - used
+            if room <= 0:
+                break
+            if estimate_tokens(piece) > room:
+                piece = piece[: room * 4].rsplit(" ", 1)[0] + "..."
+            parts.append(piece)
+            used += estimate_tokens(piece)
+        return "\n---\n".join(parts)
+
+
+def recall_config(config: dict) -> dict:
+    return {**DEFAULT_RECALL, **config.get("semantic_memory", {})}
+
+
+def recall_from_config(memory, config: dict) -> Optional[ConversationIndex]:
+    """ConversationIndex subscribed to memory's new messages (None when disabled)."""
+    cfg = recall_config(config)
+    if not cfg["enabled"] or not memory.enabled:
+        return None
+    index = ConversationIndex(
+        memory,
+        index_dir=cfg["dir"] or os.path.join(memory.base_dir, "semantic"),
+        model=cfg["model"],
+        batch_size=cfg["batch_size"],
+        flush_seconds=cfg["flush_seconds"],
+        catch_up_limit=cfg["catch_up_limit"],
+    )
+    memory.add_listener(index.on_message)
+    return index
@@ -0,0 +1,170 @@
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Iterator, List, Optional
+
+DEFAULT_RULES = [
+    {"route": "large", "when": {"info_type": ["code"]}},
+    {"route": "large", "when": {"length": ["detailed"]}},
+    {"route": "fast", "when": {"length": ["short"]}},
+    {"route": "fast", "when": {"urgency": ["high"]}},
+    {"route": "fast", "when": {"tone": ["casual"]}},
+]
+
+
+class ModelRouter:
+    """
+    Picks a model per request from the style detect_response_style() returns.
+      - rules: first rule whose "when" matches every listed style field wins, else default
+      - fallback: routes tried in order when a model fails; a failed model is skipped
+        for retry_after seconds
+      - stats: per-route request/error/fallback/cancelled counts and latency percentiles
+        (streams the consumer closes early count as cancelled, not in the latencies)
+    LLM clients are created lazily with make_llm(model_name).
+    """
+
+    def __init__(
+        self,
+        models: Dict[str, str],
+        make_llm: Callable[[str], object],
+        rules: Optional[List[dict]] = None,
+        default: str = "large",
+        fallback: Optional[Dict[str, List[str]]] = None,
+        retry_after: float = 60.0,
+    ):
+        self.models = models
+        self.make_llm = make_llm
+        self.rules = DEFAULT_RULES if rules is None else rules
+        self.default = default
+        self.fallback = fallback or {name: [other for other in models if other != name] for name in models}
+        self.retry_after = retry_after
+        self._llms: Dict[str, object] = {}
+        self._down_until: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._stats = {name: {"requests": 0, "errors": 0, "fallbacks": 0, "cancelled": 0, "latency": deque(maxlen=1000)} for name in models}
+
+    @classmethod
+    def from_config(cls, cfg: dict, llm, default_model: str) -> "ModelRouter":
+        """Router from the "router" config section; llm serves default_model and is the client template."""
+        models = {"large": default_model, **cfg.get("models", {})}
+        router = cls(
+            models,
+            make_llm=lambda model: llm.__class__(model=model),
+            rules=cfg.get("rules"),
+            default=cfg.get("default", "large"),
+            fallback=cfg.get("fallback"),
+            retry_after=cfg.get("retry_after_seconds", 60.0),
+        )
+        for name, model in models.items():
+            if model == default_model:
+                router._llms[name] = llm
+        return router
+
+    # -------------- Routing --------------
+    def route(self, style: Optional[dict]) -> str:
+        style = style or {}
+        for rule in self.rules:
+            when = rule.get("when", {})
+            if rule.get("route") in self.models and all(style.get(k) in v for k, v in when.items()):
+                return rule["route"]
+        return self.default
+
+    def _candidates(self, route: str) -> List[str]:
+        order = [route] + [r for r in self.fallback.get(route, []) if r != route and r in self.models]
+        now = time.time()
+        up = [r for r in order if self._down_until.get(r, 0) <= now]
+        return up or order  # everything marked down: try anyway rather than fail outright
+
+    def _llm(self, route: str):
+        with self._lock:
+            if route not in self._llms:
+                self._llms[route] = self.make_llm(self.models[route])
+            return self._llms[route]
+
+    def _record(self, route: str, started: float, outcome: str, fell_back: bool):
+        """outcome: "ok", "error" (route marked down for retry_after) or "cancelled" (stream closed early)."""
+        with self._lock:
+            stats = self._stats[route]
+            stats["requests"] += 1
+            stats["fallbacks"] += int(fell_back)
+            if outcome == "ok":
+                stats["latency"].append(time.perf_counter() - started)
+                self._down_until.pop(route, None)
+            elif outcome == "cancelled":
+                stats["cancelled"] += 1
+            else:
+                stats["errors"] += 1
+                self._down_until[route] = time.time() + self.retry_after
+
+    # -------------- Generation --------------
+    def invoke(self, prompt: str, style: Optional[dict] = None) -> str:
+        wanted = self.route(style)
+        error = None
+        for route in self._candidates(wanted):
+            started = time.perf_counter()
+            try:
+                reply = self._llm(route).invoke(prompt)
+            except Exception as e:
+                self._record(route, started, "error", fell_back=route != wanted)
+                print(f"⚠️ Model {self.models[route]} ({route}) failed: {e}")
+                error = e
+                continue
+            self._record(route, started, "ok", fell_back=route != wanted)
+            return reply
+        raise error
+
+    def stream(self, prompt: str, style: Optional[dict] = None) -> Iterator[str]:
+        """Falls back only if a model fails before producing its first chunk."""
+        wanted = self.route(style)
+        error = None
+        for route in self._candidates(wanted):
+            started = time.perf_counter()
+            llm = self._llm(route)
+            produced = False
+            try:
+                pieces = llm.stream(prompt) if hasattr(llm, "stream") else iter([llm.invoke(prompt)])
+                for piece in pieces:
+                    produced = True
+                    yield piece
+            except GeneratorExit:
+                # consumer stopped reading (cancelled or timed out): close the model's stream too
+                self._record(route, started, "cancelled", fell_back=route != wanted)
+                if hasattr(pieces, "close"):
+                    pieces.close()
+                raise
+            except Exception as e:
+                self._record(route, started, "error", fell_back=route != wanted)
+                if produced:
+                    raise
+                print(f"⚠️ Model {self.models[route]} ({route}) failed: {e}")
+                error = e
+                continue
+            self._record(route, started, "ok", fell_back=route != wanted)
+            return
+        raise error
+
+    # -------------- Stats --------------
+    def stats(self) -> Dict[str, dict]:
+        out = {}
+        with self._lock:
+            for route, s in self._stats.items():
+                lat = sorted(s["latency"])
+                out[route] = {
+                    "model": self.models[route],
+                    "requests": s["requests"],
+                    "errors": s["errors"],
+                    "fallbacks": s["fallbacks"],
+                    "cancelled": s["cancelled"],
+                    "p50_s": round(lat[len(lat) // 2], 3) if lat else None,
+                    "p95_s": round(lat[min(len(lat) - 1, int(0.95 * len(lat)))], 3) if lat else None,
+                    "down": self._down_until.get(route, 0) > time.time(),
+                }
+        return out
+
+    def report(self) -> str:
+        lines = []
+        for route, s in self.stats().items():
+            p50 = f"{s['p50_s']:.2f}s" if s["p50_s"] is not None else "-"
+            p95 = f"{s['p95_s']:.2f}s" if s["p95_s"] is not None else "-"
+            lines.append(f"{route:<6} {s['model']:<20} requests {s['requests']:<5} errors {s['errors']:<3} fallbacks {s['fallbacks']:<3} cancelled {s['cancelled']:<3} p50 {p50} p95 {p95}")
+        return "\n".join(lines)
@@ -0,0 +1,43 @@
+from typing import Optional
+
+DEFAULT_SESSIONS = {"isolate": False, "concurrency": 4, "max_queue": 64}
+SESSION_COOKIE = "ren_session"
+# run on page load (demo.load(..., js=SESSION_COOKIE_JS)): gives the browser a lasting random id
+SESSION_COOKIE_JS = (
+    "() => { if (!document.cookie.split('; ').some(c => c.startsWith('%s='))) "
+    "{ document.cookie = '%s=' + crypto.randomUUID() + '; max-age=31536000; path=/; SameSite=Lax'; } }"
+) % (SESSION_COOKIE, SESSION_COOKIE)
+
+
+def session_config(config: dict) -> dict:
+    """The "sessions" section of config.json with defaults filled in."""
+    return {**DEFAULT_SESSIONS, **config.get("sessions", {})}
+
+
+def session_user_id(request, isolate: bool = True, default: str = "user") -> str:
+    """
+    user_id for one browser session (a gradio.Request).
+      - ?session=<name> in the URL picks the id, so a session can be resumed anywhere;
+        ?session=<default> opens the shared history (everything logged before isolation)
+      - otherwise the browser's SESSION_COOKIE, which survives reloads and is shared by its tabs
+      - no cookie (e.g. an API client): the default id
+    With isolation off every tab shares the default id (the old behaviour).
+    """
+    if not isolate or request is None:
+        return default
+    named: Optional[str] = None
+    browser: Optional[str] = None
+    try:
+        named = request.query_params.get("session")
+        browser = request.cookies.get(SESSION_COOKIE)
+    except AttributeError:
+        pass
+    if named:
+        return default if named == default else f"session-{named}"
+    return f"session-{browser}" if browser else default
+
+
+def configure_queue(demo, config: dict):
+    """Bound concurrent handler runs (each one holds an LLM call) and queue length."""
+    cfg = session_config(config)
+    return demo.queue(default_concurrency_limit=cfg["concurrency"], max_size=cfg["max_queue"])
@@ -0,0 +1,125 @@
+import atexit
+import copy
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+
+class SettingsStore:
+    """
+    A JSON settings file cached in memory.
+      - reads come from memory; the file is read once
+      - update() applies changes immediately, notifies subscribers, and schedules
+        one write debounce seconds after the last change (temp file + rename)
+      - flush() writes pending changes now (also run at interpreter exit)
+    """
+
+    def __init__(self, path: str, defaults: Optional[dict] = None, debounce: float = 0.5):
+        self.path = path
+        self.debounce = debounce
+        self.writes = 0
+        self._lock = threading.RLock()
+        self._timer: Optional[threading.Timer] = None
+        self._dirty = False
+        self._subscribers: List[Callable[[dict, dict], None]] = []
+        self._data = copy.deepcopy(defaults or {})
+        self._exists = False
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self._data.update(json.load(f))
+            self._exists = True
+        except FileNotFoundError:
+            pass
+        except ValueError as e:
+            print(f"⚠️ Could not parse {path}: {e}")
+
+    @property
+    def exists(self) -> bool:
+        """Whether the file existed on load or has been written since."""
+        return self._exists
+
+    @property
+    def data(self) -> dict:
+        with self._lock:
+            return copy.deepcopy(self._data)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            return copy.deepcopy(self._data.get(key, default))
+
+    def update(self, changes: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply changes; returns the keys whose value actually changed."""
+        with self._lock:
+            changed = {k: v for k, v in changes.items() if self._data.get(k, object()) != v}
+            if not changed:
+                return {}
+            self._data.update(copy.deepcopy(changed))
+            self._dirty = True
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.debounce, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+            snapshot = copy.deepcopy(self._data)
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(changed, snapshot)
+            except Exception as e:
+                print(f"⚠️ Settings subscriber failed: {e}")
+        return changed
+
+    def subscribe(self, callback: Callable[[dict, dict], None]) -> Callable[[], None]:
+        """callback(changed, snapshot) after every effective update; returns an unsubscribe function."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+
+        return unsubscribe
+
+    def flush(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return
+            directory = os.path.dirname(self.path) or "."
+            os.makedirs(directory, exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._data, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            self._dirty = False
+            self._exists = True
+            self.writes += 1
+
+
+_stores: Dict[str, SettingsStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path: str, defaults: Optional[dict] = None, debounce: float = 0.5) -> SettingsStore:
+    """One shared store per file, so every reader sees the same cached state."""
+    key = os.path.abspath(path)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = SettingsStore(path, defaults=defaults, debounce=debounce)
+        return _stores[key]
+
+
+def flush_all():
+    with _stores_lock:
+        stores = list(_stores.values())
+    for store in stores:
+        store.flush()
+
+
+atexit.register(flush_all)
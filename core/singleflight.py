@@ -0,0 +1,122 @@
+import threading
+from typing import Callable, Dict, Hashable, Iterator, List, Optional
+
+from core.cancel import Cancelled
+
+
+class _Flight:
+    """One in-flight generation: chunks so far, completion, and who is listening."""
+
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.listeners = 0
+        self.abandoned = False
+        self.cond = threading.Condition()
+
+    def push(self, chunk: str):
+        with self.cond:
+            self.chunks.append(chunk)
+            self.cond.notify_all()
+
+    def finish(self, error: Optional[BaseException] = None):
+        with self.cond:
+            self.done = True
+            self.error = error
+            self.cond.notify_all()
+
+    def follow(self) -> Iterator[str]:
+        """Every chunk from the start (late joiners catch up), then the live ones."""
+        i = 0
+        while True:
+            with self.cond:
+                while i >= len(self.chunks) and not self.done:
+                    self.cond.wait()
+                pending = self.chunks[i:]
+                done, error = self.done, self.error
+            i += len(pending)
+            yield from pending
+            if done and i >= len(self.chunks):
+                if error is not None:
+                    raise error
+                return
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical requests: the first caller for a key starts the
+    generation in a background thread, later callers attach to it and receive the
+    same chunks (streaming fan-out). The entry is dropped once the generation
+    finishes, so this is not a cache: a repeat of the prompt afterwards runs again.
+    If every listener goes away early the generation is told to stop; a stopped
+    generation never gets new listeners, and ends with Cancelled rather than as a
+    normal (truncated) completion.
+
+    stats: generations started, requests coalesced onto one, i.e. generations saved.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "generations": 0, "coalesced": 0}
+
+    def run(self, key: Hashable, source: Callable[[], Iterator[str]]) -> Iterator[str]:
+        with self._lock:
+            self.stats["requests"] += 1
+            flight = self._flights.get(key)
+            leader = True
+            if flight is not None:
+                # joining and the last listener leaving (_listen) both happen under flight.cond
+                with flight.cond:
+                    if not flight.abandoned:
+                        flight.listeners += 1
+                        leader = False
+            if leader:
+                flight = self._flights[key] = _Flight()
+                flight.listeners = 1
+                self.stats["generations"] += 1
+            else:
+                self.stats["coalesced"] += 1
+        if leader:
+            threading.Thread(target=self._produce, args=(key, flight, source), daemon=True).start()
+        return self._listen(key, flight)
+
+    def _produce(self, key: Hashable, flight: _Flight, source: Callable[[], Iterator[str]]):
+        error = None
+        try:
+            pieces = source()
+            try:
+                for piece in pieces:
+                    flight.push(piece)
+                    if flight.abandoned:
+                        error = Cancelled("generation stopped: every listener left")
+                        break
+            finally:
+                close = getattr(pieces, "close", None)
+                if close:
+                    close()  # e.g. stops an Ollama stream nobody is reading any more
+        except BaseException as e:
+            error = e
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            flight.finish(error)
+
+    def _listen(self, key: Hashable, flight: _Flight) -> Iterator[str]:
+        try:
+            yield from flight.follow()
+        finally:
+            with flight.cond:
+                flight.listeners -= 1
+                abandoned = flight.abandoned = flight.listeners == 0 and not flight.done
+            if abandoned:
+                # new identical requests must not attach to a generation that is stopping
+                with self._lock:
+                    if self._flights.get(key) is flight:
+                        del self._flights[key]
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
@@ -0,0 +1,167 @@
+import fnmatch
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+def walk_files(dirs: Iterable[str], extensions: Tuple[str, ...], exclude_dirs: Tuple[str, ...] = ()) -> Iterator[os.DirEntry]:
+    """
+    Files with one of extensions anywhere below dirs, in sorted order, yielded as
+    they are found (os.scandir, no list of the whole tree is built).
+    Sub-folders whose name matches one of the exclude_dirs patterns are skipped.
+    """
+    stack = [d for d in reversed(list(dirs)) if d]
+    while stack:
+        d = stack.pop()
+        try:
+            with os.scandir(d) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            continue
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    if not any(fnmatch.fnmatchcase(entry.name, p) for p in exclude_dirs):
+                        subdirs.append(entry.path)
+                elif entry.name.endswith(extensions) and entry.is_file():
+                    yield entry
+            except OSError:
+                continue
+        stack.extend(reversed(subdirs))
+
+
+class DocumentWatcher:
+    """
+    Watches document directories (recursively, minus folders matching
+    exclude_dirs) and reports changed files in debounced batches.
+      - uses watchdog (inotify on Linux, ReadDirectoryChangesW on Windows) when installed
+      - falls back to polling mtimes/sizes otherwise
+    on_change(changed_paths, removed_paths) is called from the watcher thread.
+    """
+
+    def __init__(
+        self,
+        dirs: Iterable[str],
+        on_change: Callable[[List[str], List[str]], None],
+        debounce: float = 2.0,
+        poll_interval: float = 1.0,
+        extensions: Tuple[str, ...] = (".txt", ".pdf"),
+        exclude_dirs: Tuple[str, ...] = (),
+    ):
+        self.dirs = [d for d in dirs if d]
+        self.on_change = on_change
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.extensions = extensions
+        self.exclude_dirs = exclude_dirs
+
+        self._pending: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._observer = None
+        self.mode: Optional[str] = None
+
+    # -------------- Lifecycle --------------
+    def start(self):
+        for d in self.dirs:
+            os.makedirs(d, exist_ok=True)
+        try:
+            self._start_watchdog()
+            self.mode = "watchdog"
+        except ImportError:
+            self._spawn(self._poll_loop)
+            self.mode = "polling"
+        self._spawn(self._flush_loop)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=2)
+        for t in self._threads:
+            t.join(timeout=2)
+        self._threads = []
+
+    def _spawn(self, target):
+        t = threading.Thread(target=target, daemon=True)
+        t.start()
+        self._threads.append(t)
+
+    # -------------- Event sources --------------
+    def _start_watchdog(self):
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+
+        watcher = self
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.is_directory:
+                    return
+                watcher._mark(event.src_path)
+                dest = getattr(event, "dest_path", None)
+                if dest:
+                    watcher._mark(dest)
+
+        observer = Observer()
+        for d in self.dirs:
+            observer.schedule(_Handler(), d, recursive=True)
+        observer.start()
+        self._observer = observer
+
+    def _snapshot(self) -> Dict[str, Tuple[int, int]]:
+        snap = {}
+        for entry in walk_files(self.dirs, self.extensions, self.exclude_dirs):
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            snap[entry.path] = (st.st_mtime_ns, st.st_size)
+        return snap
+
+    def _excluded(self, path: str) -> bool:
+        for d in self.dirs:
+            rel = os.path.relpath(path, d)
+            if not rel.startswith(".."):
+                folders = rel.split(os.sep)[:-1]
+                return any(fnmatch.fnmatchcase(f, p) for f in folders for p in self.exclude_dirs)
+        return False
+
+    def _poll_loop(self):
+        previous = self._snapshot()
+        while not self._stop.wait(self.poll_interval):
+            current = self._snapshot()
+            for path, sig in current.items():
+                if previous.get(path) != sig:
+                    self._mark(path)
+            for path in previous.keys() - current.keys():
+                self._mark(path)
+            previous = current
+
+    # -------------- Debouncing --------------
+    def _mark(self, path: str):
+        if not path.endswith(self.extensions) or self._excluded(path):
+            return
+        with self._lock:
+            self._pending[os.path.normpath(path)] = time.monotonic()
+
+    def _flush_loop(self):
+        tick = min(0.25, self.debounce / 2) if self.debounce > 0 else 0.05
+        while not self._stop.wait(tick):
+            now = time.monotonic()
+            with self._lock:
+                ready = [p for p, t in self._pending.items() if now - t >= self.debounce]
+                for p in ready:
+                    del self._pending[p]
+            if not ready:
+                continue
+            changed = [p for p in ready if os.path.isfile(p)]
+            removed = [p for p in ready if not os.path.isfile(p)]
+            try:
+                self.on_change(changed, removed)
+            except Exception as e:
+                print(f"⚠️ Document watcher failed to ingest {len(ready)} file(s): {e}")
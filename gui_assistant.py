@@ -2,35 +2,24 @@
 
 from core.memory import Memory
 from core.config import load_config
+from core.brain import SmartBrain as BaseBrain
 from langchain_ollama import OllamaLLM
 from modern_gui import launch_modern_gui
-from datetime import datetime
-from typing import Optional
 import re
 
 
-class SmartBrain:
+class SmartBrain(BaseBrain):
     """Smart brain that automatically detects response style"""
 
     def __init__(self, config: dict, memory, llm):
-        self.config = config
-        self.memory = memory
-        self.llm = llm
-        
-        # Load knowledge base
-        try:
-            from rag import build_knowledge_base, query_knowledge_base
-            print("🔍 Loading knowledge base...")
-            self.db = build_knowledge_base()
-            self.query_kb = query_knowledge_base
-            if self.db:
-                print("✅ Knowledge base loaded successfully!")
-            else:
-                print("⚠️ No documents found in knowledge_base/")
-        except ImportError:
-            print("ℹ️ RAG system not available")
-            self.db = None
-            self.query_kb = lambda db, q: ""
+        print("🔍 Loading knowledge base...")
+        super().__init__(config, memory, llm)
+        if self.db:
+            print("✅ Knowledge base loaded successfully!")
+        else:
+            print("⚠️ No documents found in knowledge_base/")
+        if self.watcher:
+            print(f"👀 Watching for new documents ({self.watcher.mode})")
 
     def detect_response_style(self, user_text: str) -> dict:
         """Auto-detect what kind of response the user wants"""
@@ -101,36 +90,6 @@ class SmartBrain:
 User: {user_text}
 Assistant:"""
 
-    def think(self, user_text: str, user_id: Optional[str] = "user") -> str:
-        """Generate smart response based on auto-detected style"""
-        # Auto-detect response style
-        style = self.detect_response_style(user_text)
-        
-        # Get RAG context
-        context = ""
-        if self.db:
-            try:
-                context = self.query_kb(self.db, user_text)
-            except Exception as e:
-                print(f"⚠️ RAG query error: {e}")
-        
-        # Build smart prompt
-        prompt = self.build_smart_prompt(user_text, context, style)
-        
-        # Generate response
-        try:
-            reply = self.llm.invoke(prompt)
-        except Exception as e:
-            reply = f"Sorry, I encountered an error: {str(e)}"
-        
-        # Save to memory
-        timestamp = datetime.utcnow().isoformat() + "Z"
-        if self.memory.enabled:
-            self.memory.append_message(role="user", text=user_text, ts=timestamp, user_id=user_id)
-            self.memory.append_message(role="assistant", text=reply, ts=timestamp, user_id="assistant")
-        
-        return reply
-
 
 def main():
     """Launch the GUI version of Smart AI Assistant"""
@@ -141,7 +100,8 @@ def main():
     print("✅ Configuration loaded")
 
     # Initialize Memory
-    memory = Memory()
+    mem_cfg = config.get("memory", {})
+    memory = Memory(compression=mem_cfg.get("compression", "gzip"), retention=mem_cfg.get("retention"))
     print("✅ Memory system initialized")
 
     # Initialize LLM
@@ -180,6 +140,8 @@ def main():
         print("\n👋 Shutting down...")
     except Exception as e:
         print(f"❌ GUI error: {e}")
+    finally:
+        brain.close()
 
 
 if __name__ == "__main__":
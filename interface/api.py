@@ -0,0 +1,319 @@
+"""
+Headless HTTP API for SmartBrain (stdlib asyncio, no web framework).
+
+    POST /chat       {"message": "...", "user_id": "svc-1", "stream": false}
+                     -> {"reply": "..."}, or with "stream": true a text/event-stream of
+                        data: {"token": "..."} events ending with event: done
+    POST /retrieve   {"query": "...", "k": 3} -> {"hits": [{"text", "source", "score"}]}
+    GET  /health     -> {"status": "ok", "in_flight": n, ...}
+
+HTTP/1.1 keep-alive; SSE bodies are chunked so the connection can be reused.
+At most max_in_flight chat/retrieve requests run at once, beyond that the server
+answers 429 with Retry-After instead of queueing. SIGINT/SIGTERM stop accepting,
+let in-flight requests finish (up to shutdown_grace seconds), then close the
+brain (watcher + Memory flush).
+
+    python -m interface.api
+"""
+import asyncio
+import json
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from core.cancel import CancelToken
+from core.models import registry
+
+DEFAULT_SERVER = {
+    "host": "127.0.0.1",
+    "port": 8000,
+    "max_in_flight": 8,
+    "keepalive_timeout": 15.0,
+    "max_body_bytes": 1_000_000,
+    "max_k": 50,  # /retrieve answers at most this many hits
+    "shutdown_grace": 30.0,
+}
+
+_REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    408: "Request Timeout", 413: "Payload Too Large", 429: "Too Many Requests",
+    500: "Internal Server Error", 503: "Service Unavailable",
+}
+_DONE = object()
+_DISCONNECT_POLL_S = 0.25  # how often a non-streaming /chat checks whether its client is still there
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class BrainServer:
+    def __init__(self, brain, config: Optional[dict] = None):
+        self.brain = brain
+        self.cfg = {**DEFAULT_SERVER, **(config or {})}
+        self.in_flight = 0
+        self.stats = {"requests": 0, "rejected": 0, "errors": 0, "streams": 0}
+        self.started = time.time()
+        self._executor = ThreadPoolExecutor(max_workers=self.cfg["max_in_flight"], thread_name_prefix="brain")
+        self._server = None
+        self._closing = False
+        self._idle = None
+
+    # -------------- Connection handling --------------
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while not self._closing:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), self.cfg["keepalive_timeout"])
+                except asyncio.TimeoutError:
+                    break
+                except HTTPError as e:
+                    await self._send_json(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close" and not self._closing
+                self.stats["requests"] += 1
+                try:
+                    await self._dispatch(reader, writer, method, path, body, keep_alive)
+                except HTTPError as e:
+                    await self._send_json(writer, e.status, {"error": str(e)}, keep_alive)
+                except ConnectionError:
+                    raise
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    await self._send_json(writer, 500, {"error": str(e)}, keep_alive=False)
+                    break
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, dict, bytes]]:
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, _ = line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "malformed request line")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = _content_length(headers.get("content-length"))
+        if length > self.cfg["max_body_bytes"]:
+            raise HTTPError(413, "request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target.split("?", 1)[0], headers, body
+
+    async def _dispatch(self, reader, writer, method: str, path: str, body: bytes, keep_alive: bool):
+        routes = {"/chat": ("POST", self._chat), "/retrieve": ("POST", self._retrieve), "/health": ("GET", self._health)}
+        if path not in routes:
+            raise HTTPError(404, f"no route {path}")
+        allowed, handler = routes[path]
+        if method != allowed:
+            raise HTTPError(405, f"use {allowed}")
+        if path == "/health":
+            return await self._health(writer, keep_alive)
+
+        payload = _parse_json(body)
+        if self.in_flight >= self.cfg["max_in_flight"]:
+            self.stats["rejected"] += 1
+            return await self._send_json(writer, 429, {"error": "too many requests in flight"}, keep_alive, {"Retry-After": "1"})
+        self.in_flight += 1
+        try:
+            await handler(reader, writer, payload, keep_alive)
+        finally:
+            self.in_flight -= 1
+            if self.in_flight == 0 and self._idle is not None:
+                self._idle.set()
+
+    # -------------- Endpoints --------------
+    async def _health(self, writer, keep_alive: bool):
+        await self._send_json(writer, 200, {
+            "status": "closing" if self._closing else "ok",
+            "in_flight": self.in_flight,
+            "max_in_flight": self.cfg["max_in_flight"],
+            "knowledge_base": bool(self.brain.db),
+            "uptime_s": round(time.time() - self.started, 1),
+            **self.stats,
+            **({"routes": self.brain.router.stats()} if getattr(self.brain, "router", None) else {}),
+            **({"singleflight": self.brain.singleflight.stats} if getattr(self.brain, "singleflight", None) else {}),
+            "embedding_models": registry().memory_report(),
+            **({"semantic_memory": {"exchanges": len(self.brain.recall), **self.brain.recall.stats}} if getattr(self.brain, "recall", None) else {}),
+            **({"generations": self.brain.cancel_stats} if hasattr(self.brain, "cancel_stats") else {}),
+        }, keep_alive)
+
+    async def _retrieve(self, reader, writer, payload: dict, keep_alive: bool):
+        query = payload.get("query")
+        if not isinstance(query, str) or not query.strip():
+            raise HTTPError(400, "'query' is required")
+        k = payload.get("k")
+        if k is not None:
+            if isinstance(k, bool) or not isinstance(k, int) or k < 1:
+                raise HTTPError(400, "'k' must be a positive integer")
+            k = min(k, self.cfg["max_k"])
+        loop = asyncio.get_running_loop()
+        hits = await loop.run_in_executor(self._executor, self.brain.retrieve, query, k)
+        await self._send_json(writer, 200, {"hits": hits}, keep_alive)
+
+    async def _chat(self, reader, writer, payload: dict, keep_alive: bool):
+        message = payload.get("message")
+        if not isinstance(message, str) or not message.strip():
+            raise HTTPError(400, "'message' is required")
+        user_id = str(payload.get("user_id") or "api")
+        loop = asyncio.get_running_loop()
+        if not payload.get("stream"):
+            token = CancelToken()
+            reply = loop.run_in_executor(self._executor, lambda: self.brain.think(message, user_id, token=token))
+            while not (await asyncio.wait({reply}, timeout=_DISCONNECT_POLL_S))[0]:
+                if reader.at_eof():
+                    # client went away while waiting: stop the generation (partial reply is saved with a marker)
+                    token.cancel("client gone")
+                    await reply
+                    raise ConnectionError("client gone")
+            return await self._send_json(writer, 200, {"reply": reply.result()}, keep_alive)
+
+        # stream: the blocking generator runs in a worker thread and hands pieces over a queue
+        self.stats["streams"] += 1
+        queue: asyncio.Queue = asyncio.Queue()
+        token = CancelToken()
+
+        def produce():
+            try:
+                for piece in self.brain.think_stream(message, user_id, token=token):
+                    loop.call_soon_threadsafe(queue.put_nowait, piece)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, _DONE)
+
+        producer = loop.run_in_executor(self._executor, produce)
+        try:
+            await self._start_response(writer, 200, "text/event-stream", keep_alive, {"Cache-Control": "no-cache", "Transfer-Encoding": "chunked"})
+            while True:
+                item = await queue.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, Exception):
+                    await self._write_chunk(writer, _sse({"error": str(item)}, event="error"))
+                    continue
+                await self._write_chunk(writer, _sse({"token": item}))
+            await self._write_chunk(writer, _sse({}, event="done"))
+            await self._write_chunk(writer, b"")
+        finally:
+            # client went away mid-stream: stop the generation (partial reply is saved with a marker)
+            token.cancel("client gone")
+            await producer
+
+    # -------------- Responses --------------
+    async def _start_response(self, writer, status: int, content_type: str, keep_alive: bool, extra: Optional[dict] = None):
+        head = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}", f"Content-Type: {content_type}"]
+        head.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+        if keep_alive:
+            head.append(f"Keep-Alive: timeout={int(self.cfg['keepalive_timeout'])}")
+        head += [f"{k}: {v}" for k, v in (extra or {}).items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+        await writer.drain()
+
+    async def _send_json(self, writer, status: int, data: dict, keep_alive: bool = True, extra: Optional[dict] = None):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        await self._start_response(writer, status, "application/json", keep_alive, {**(extra or {}), "Content-Length": len(body)})
+        writer.write(body)
+        await writer.drain()
+
+    @staticmethod
+    async def _write_chunk(writer, data: bytes):
+        writer.write(f"{len(data):X}\r\n".encode("latin-1") + data + b"\r\n")
+        await writer.drain()
+
+    # -------------- Lifecycle --------------
+    async def serve(self):
+        self._server = await asyncio.start_server(self.handle, self.cfg["host"], self.cfg["port"])
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass  # Windows: Ctrl+C raises KeyboardInterrupt instead
+        print(f"🌐 API listening on http://{self.cfg['host']}:{self.cfg['port']} (max {self.cfg['max_in_flight']} in flight)")
+        try:
+            await stop.wait()
+        finally:
+            await self.shutdown()
+
+    async def shutdown(self):
+        """Stop accepting, drain in-flight requests, then close the brain (flushes Memory)."""
+        if self._closing:
+            return
+        self._closing = True
+        print("🛑 Shutting down API server...")
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self.in_flight:
+            self._idle = asyncio.Event()
+            try:
+                await asyncio.wait_for(self._idle.wait(), self.cfg["shutdown_grace"])
+            except asyncio.TimeoutError:
+                print(f"⚠️ {self.in_flight} request(s) still running after {self.cfg['shutdown_grace']}s")
+        self._executor.shutdown(wait=False)
+        self.brain.close()
+        print("✅ Memory flushed, bye")
+
+
+def _content_length(value: Optional[str]) -> int:
+    if not value:
+        return 0
+    if not (value.isascii() and value.isdigit()):  # also rejects "-1", "+5" and "1, 2"
+        raise HTTPError(400, "invalid Content-Length")
+    return int(value)
+
+
+def _parse_json(body: bytes) -> dict:
+    try:
+        data = json.loads(body or b"{}")
+    except ValueError:
+        raise HTTPError(400, "body must be JSON")
+    if not isinstance(data, dict):
+        raise HTTPError(400, "body must be a JSON object")
+    return data
+
+
+def _sse(data: dict, event: Optional[str] = None) -> bytes:
+    lines = f"event: {event}\n" if event else ""
+    return (lines + f"data: {json.dumps(data, ensure_ascii=False)}\n\n").encode("utf-8")
+
+
+def main():
+    from langchain_ollama import OllamaLLM
+
+    from core.brain import SmartBrain
+    from core.config import load_config
+    from core.memory import Memory
+
+    config = load_config()
+    mem_cfg = config.get("memory", {})
+    memory = Memory(compression=mem_cfg.get("compression", "gzip"), retention=mem_cfg.get("retention"))
+    llm = OllamaLLM(model=config.get("api", {}).get("model", "llama3"))
+    brain = SmartBrain(config=config, memory=memory, llm=llm)
+    server = BrainServer(brain, config.get("server"))
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        brain.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,16 @@
 import gradio as gr
 
+from core.session import SESSION_COOKIE_JS, configure_queue, session_config, session_user_id
+
 
 def launch_gui(brain, persona, memory):
-    # Seed previous session into chat window
-    initial_history = memory.load_history_pairs(max_messages=None) if memory.enabled else []
+    sessions = session_config(brain.config)
+    page_size = brain.config.get("memory", {}).get("history_page_size", 50)
+    # Seed the latest page of the previous session into the chat window (per browser session
+    # when isolated, see load_history); older pages are fetched on demand by load_older
+    initial_history, initial_cursor = [], None
+    if memory.enabled and not sessions["isolate"]:
+        initial_history, initial_cursor = memory.load_history_page(limit=page_size)
 
     with gr.Blocks(title=f"{persona.name} – Your AI") as demo:
         gr.Markdown(f"# {persona.name} — Your AI Assistant")
@@ -20,7 +27,10 @@ def launch_gui(brain, persona, memory):
             )
             name_tb = gr.Textbox(value=persona.name, label="Name", scale=1)
 
+        older_btn = gr.Button("Load older messages", size="sm", visible=initial_cursor is not None)
         chat = gr.Chatbot(value=initial_history, height=520)
+        # byte offset in the log where the oldest shown message starts (None: nothing older)
+        cursor = gr.State(initial_cursor)
         msg = gr.Textbox(placeholder="Type a message and press Enter…", label="Message")
 
         with gr.Row():
@@ -30,29 +40,49 @@ def launch_gui(brain, persona, memory):
         status = gr.Markdown("")
 
         def on_persona_change(style, mood, name):
-            persona.update("style", style)
-            persona.update("mood", mood)
-            persona.update("name", name)
+            # one in-memory update; the file write happens later on a background timer
+            persona.update_many({"style": style, "mood": mood, "name": name})
             return gr.update(value=f"**Persona saved.** Name: {persona.name}, Style: {persona.style}, Mood: {persona.mood}")
 
-        def respond(message, history):
+        def load_history(request: gr.Request):
+            if not memory.enabled:
+                return [], None, gr.update(visible=False)
+            pairs, next_cursor = memory.load_history_page(limit=page_size, user_id=session_user_id(request))
+            return pairs, next_cursor, gr.update(visible=next_cursor is not None)
+
+        def load_older(history, before, request: gr.Request):
+            if not memory.enabled or before is None:
+                return history, None, gr.update(visible=False)
+            user_id = session_user_id(request) if sessions["isolate"] else None
+            pairs, next_cursor = memory.load_history_page(limit=page_size, before=before, user_id=user_id)
+            return pairs + history, next_cursor, gr.update(visible=next_cursor is not None)
+
+        def respond(message, history, request: gr.Request):
             if not message.strip():
                 return history, ""
-            reply = brain.think(message)
+            reply = brain.think(message, user_id=session_user_id(request, sessions["isolate"]))
             history = history + [(message, reply)]
             return history, ""
 
-        def clear_chat():
+        def clear_chat(request: gr.Request):
+            if sessions["isolate"]:
+                memory.clear_session(session_user_id(request))
+                return [], "Cleared this session's chat (other sessions are untouched).", None, gr.update(visible=False)
             path = memory.backup_log()
             # reset the chatbot display
-            return [], f"Backed up the previous conversation to: `{path or 'n/a'}` and cleared the current log."
+            return [], f"Backed up the previous conversation to: `{path or 'n/a'}` and cleared the current log.", None, gr.update(visible=False)
 
         style_dd.change(on_persona_change, [style_dd, mood_dd, name_tb], [status])
         mood_dd.change(on_persona_change, [style_dd, mood_dd, name_tb], [status])
         name_tb.submit(on_persona_change, [style_dd, mood_dd, name_tb], [status])
 
+        if sessions["isolate"]:
+            demo.load(load_history, [], [chat, cursor, older_btn], js=SESSION_COOKIE_JS)
+
         msg.submit(respond, [msg, chat], [chat, msg])
         send_btn.click(respond, [msg, chat], [chat, msg])
-        clear_btn.click(clear_chat, [], [chat, status])
+        older_btn.click(load_older, [chat, cursor], [chat, cursor, older_btn])
+        clear_btn.click(clear_chat, [], [chat, status, cursor, older_btn])
 
+    configure_queue(demo, brain.config)
     demo.launch(server_name="127.0.0.1", server_port=7860)
@@ -1,12 +1,18 @@
 # modern_gui.py
 
 import gradio as gr
+import threading
 import time
-from datetime import datetime
+
+from core.cancel import CancelToken
+from core.export import export_history
+from core.session import SESSION_COOKIE_JS, configure_queue, session_config, session_user_id
 
 
 def create_modern_gui(brain, memory):
     """Create a premium LobeChat-style interface"""
+    sessions = session_config(brain.config)
+    page_size = brain.config.get("memory", {}).get("history_page_size", 50)
     
     # Premium LobeChat-inspired CSS
     css = """
@@ -438,11 +444,26 @@ def create_modern_gui(brain, memory):
                 messages.append({"role": "assistant", "content": ai_msg})
         return messages
 
-    def respond_with_typing(message, history):
+    # One in-flight reply per browser tab: a new message or Stop cancels the previous one
+    active_tokens = {}
+    tokens_lock = threading.Lock()
+
+    def cancel_active(session_hash, reason):
+        with tokens_lock:
+            token = active_tokens.pop(session_hash, None)
+        if token:
+            token.cancel(reason)
+
+    def respond_with_typing(message, history, request: gr.Request):
         """Generate response with smooth animation"""
         if not message.strip():
             return history, ""
         
+        token = CancelToken()
+        cancel_active(request.session_hash, "new message")
+        with tokens_lock:
+            active_tokens[request.session_hash] = token
+        
         # Add user message
         history = history + [{"role": "user", "content": message}]
         yield history, ""
@@ -450,59 +471,92 @@ def create_modern_gui(brain, memory):
         # Brief pause for premium feel
         time.sleep(0.6)
         
-        # Get AI response
+        # Stream the AI response; closing the tab stops this generator, which stops the LLM
+        history = history + [{"role": "assistant", "content": ""}]
         try:
-            ai_response = brain.think(message)
+            for piece in brain.think_stream(message, user_id=session_user_id(request, sessions["isolate"]), token=token):
+                history[-1] = {"role": "assistant", "content": history[-1]["content"] + piece}
+                yield history, ""
         except Exception as e:
-            ai_response = f"I encountered an error: {str(e)}"
-        
-        # Add AI response
-        history = history + [{"role": "assistant", "content": ai_response}]
-        yield history, ""
+            history[-1] = {"role": "assistant", "content": f"I encountered an error: {str(e)}"}
+            yield history, ""
+        finally:
+            with tokens_lock:
+                if active_tokens.get(request.session_hash) is token:
+                    del active_tokens[request.session_hash]
+
+    def stop_generation(request: gr.Request):
+        cancel_active(request.session_hash, "stopped")
 
-    def clear_conversation():
+    def clear_conversation(request: gr.Request):
         """Clear chat with premium feedback"""
         try:
             if memory and memory.enabled:
-                memory.backup_log()
-            return [], "✨ Conversation cleared successfully"
+                if sessions["isolate"]:
+                    # only this session; other tabs keep their history
+                    memory.clear_session(session_user_id(request))
+                else:
+                    memory.backup_log()
+            return [], "✨ Conversation cleared successfully", None, gr.update(visible=False)
         except Exception as e:
-            return [], f"❌ Error: {str(e)}"
+            return [], f"❌ Error: {str(e)}", None, gr.update(visible=False)
 
-    def export_conversation(history):
-        """Export with premium styling"""
+    def export_conversation(fmt, request: gr.Request):
+        """Export the full history (backups + live log) in the background"""
+        if not memory or not memory.enabled:
+            yield gr.update(value="📝 No conversation to export", visible=True)
+            return
+
+        job = {"count": 0, "result": None, "error": None}
+        # with isolated sessions a tab only exports its own messages
+        user_id = session_user_id(request) if sessions["isolate"] else None
+
+        def run():
+            try:
+                job["result"] = export_history(memory, fmt=fmt, user_id=user_id, progress=lambda n: job.update(count=n))
+            except Exception as e:
+                job["error"] = e
+
+        worker = threading.Thread(target=run, daemon=True)
+        worker.start()
+        while worker.is_alive():
+            yield gr.update(value=f"⏳ Exporting… {job['count']} messages", visible=True)
+            worker.join(0.5)
+
+        if job["error"] is not None:
+            yield gr.update(value=f"❌ Export failed: {str(job['error'])}", visible=True)
+        elif not job["result"]["messages"]:
+            yield gr.update(value="📝 No conversation to export", visible=True)
+        else:
+            result = job["result"]
+            yield gr.update(value=f"📁 Exported {result['messages']} messages to {result['path']}", visible=True)
+
+    def load_session_history(request: gr.Request):
+        """Latest page of this browser's history (its session cookie, or ?session= if given)"""
         try:
-            if not history:
-                return "📝 No conversation to export"
-            
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"lobe_chat_export_{timestamp}.md"
-            
-            with open(filename, 'w', encoding='utf-8') as f:
-                f.write("# 🤖 AI Assistant Conversation\n\n")
-                f.write(f"**Exported:** {datetime.now().strftime('%B %d, %Y at %H:%M:%S')}\n\n")
-                f.write("---\n\n")
-                
-                for i, msg in enumerate(history):
-                    role = msg.get("role", "")
-                    content = msg.get("content", "")
-                    
-                    if role == "user":
-                        f.write(f"## 👤 You\n\n{content}\n\n")
-                    elif role == "assistant":
-                        f.write(f"## 🤖 Assistant\n\n{content}\n\n")
-                        if i < len(history) - 1:
-                            f.write("---\n\n")
-            
-            return f"📁 Exported to {filename}"
+            if memory and memory.enabled:
+                history_pairs, cursor = memory.load_history_page(limit=page_size, user_id=session_user_id(request))
+                return convert_to_messages_format(history_pairs), cursor, gr.update(visible=cursor is not None)
         except Exception as e:
-            return f"❌ Export failed: {str(e)}"
+            print(f"Could not load history: {e}")
+        return [], None, gr.update(visible=False)
 
-    # Load existing history
-    initial_history = []
+    def load_older_history(history, before, request: gr.Request):
+        """Prepend the page of history before the oldest message shown"""
+        try:
+            if memory and memory.enabled and before is not None:
+                user_id = session_user_id(request) if sessions["isolate"] else None
+                history_pairs, cursor = memory.load_history_page(limit=page_size, before=before, user_id=user_id)
+                return convert_to_messages_format(history_pairs) + history, cursor, gr.update(visible=cursor is not None)
+        except Exception as e:
+            print(f"Could not load history: {e}")
+        return history, None, gr.update(visible=False)
+
+    # Load the latest page of existing history (shared log when sessions are not isolated)
+    initial_history, initial_cursor = [], None
     try:
-        if memory and memory.enabled:
-            history_pairs = memory.load_history_pairs(max_messages=50)
+        if memory and memory.enabled and not sessions["isolate"]:
+            history_pairs, initial_cursor = memory.load_history_page(limit=page_size)
             initial_history = convert_to_messages_format(history_pairs)
     except Exception as e:
         print(f"Could not load history: {e}")
@@ -529,6 +583,9 @@ def create_modern_gui(brain, memory):
             
             # Chat Interface
             with gr.Column(elem_classes="lobe-chat-area"):
+                older_btn = gr.Button("⬆️ Load older messages", elem_classes="lobe-control-btn", visible=initial_cursor is not None)
+                # byte offset in the log where the oldest shown message starts (None: nothing older)
+                history_cursor = gr.State(initial_cursor)
                 chatbot = gr.Chatbot(
                     type='messages',
                     value=initial_history,
@@ -558,24 +615,34 @@ def create_modern_gui(brain, memory):
                 
                 # Control Buttons
                 with gr.Row(elem_classes="lobe-controls"):
+                    stop_btn = gr.Button("⏹️ Stop", elem_classes="lobe-control-btn")
                     clear_btn = gr.Button("🗑️ Clear", elem_classes="lobe-control-btn")
+                    export_format = gr.Dropdown(
+                        ["markdown", "jsonl", "parquet"],
+                        value="markdown",
+                        show_label=False,
+                        container=False,
+                        elem_classes="lobe-control-btn"
+                    )
                     export_btn = gr.Button("📥 Export", elem_classes="lobe-control-btn")
 
         # Event Handlers
+        if sessions["isolate"]:
+            demo.load(load_session_history, outputs=[chatbot, history_cursor, older_btn], js=SESSION_COOKIE_JS)
+
         msg.submit(respond_with_typing, [msg, chatbot], [chatbot, msg])
         send_btn.click(respond_with_typing, [msg, chatbot], [chatbot, msg])
+        stop_btn.click(stop_generation, queue=False)
         
-        clear_btn.click(clear_conversation, outputs=[chatbot, status]).then(
+        older_btn.click(load_older_history, [chatbot, history_cursor], [chatbot, history_cursor, older_btn])
+        clear_btn.click(clear_conversation, outputs=[chatbot, status, history_cursor, older_btn]).then(
             lambda: gr.update(visible=True), outputs=[status]
         ).then(
             lambda: gr.update(visible=False), outputs=[status], show_progress=False
         )
         
-        export_btn.click(export_conversation, [chatbot], [status]).then(
-            lambda: gr.update(visible=True), outputs=[status]
-        ).then(
-            lambda: gr.update(visible=False), outputs=[status], show_progress=False
-        )
+        # Runs in a worker thread and streams progress; the status stays visible with the result
+        export_btn.click(export_conversation, [export_format], [status], show_progress=False)
 
     return demo
 
@@ -583,6 +650,7 @@ def create_modern_gui(brain, memory):
 def launch_modern_gui(brain, memory):
     """Launch the premium LobeChat-style GUI"""
     demo = create_modern_gui(brain, memory)
+    configure_queue(demo, brain.config)
     demo.launch(
         server_name="127.0.0.1",
         server_port=7860,
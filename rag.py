@@ -1,58 +1,1127 @@
 # rag.py
 
 from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.document_loaders import PyPDFLoader, TextLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+from core.bm25 import BM25Index, reciprocal_rank_fusion
+from core.dedup import MinHashLSH, add_source, dedup_documents, diverse
+from core.models import SharedLangchainEmbeddings
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import gzip
+import hashlib
+import itertools
+import json
 import os
+import queue
+import threading
+import time
+import numpy as np
 
 DB_DIR = "knowledge_base"
+EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+MANIFEST_FILE = "ingest_manifest.json"
+BM25_FILE = "bm25.json.gz"
+MINHASH_FILE = "minhash.npz"
+CENTROID_FILE = "centroid.json"
+VOCAB_FILE = "vocab.json.gz"
+SHARD_DIR = os.path.join(DB_DIR, "shards")
+SHARDING_MODES = ("none", "folder", "type")
+PARSE_CACHE_DIR = os.path.join(DB_DIR, ".parse_cache")
+RETRIEVAL_MODES = ("vector", "hybrid", "adaptive")
+LEXICAL_HALF_SCORE = 5.0  # BM25 score that maps to relevance 0.5 (bm25 / (bm25 + this))
+SUPPORTED_EXTENSIONS = (".pdf", ".txt")
+# folders inside document directories that never hold documents (index data, caches, hidden)
+KB_INTERNAL_DIRS = ("shards", "shards_*", "quantized_*", ".*")
+# what an index writes into its persist dir (which, unsharded, also holds the source documents):
+# our own files, Chroma's database and segment folders (named by UUID), QuantizedVectorStore's files
+INDEX_FILES = (
+    MANIFEST_FILE, BM25_FILE, MINHASH_FILE, CENTROID_FILE, VOCAB_FILE,
+    "chroma.sqlite3", "store.npz", "exact-*.f32", "codes.npy", "scales.npy", "docs.json.gz", "exact.npy",
+)
+INDEX_DIRS = ("????????-????-????-????-????????????",)
 
 
-def build_knowledge_base():
+@lru_cache(maxsize=None)
+def get_embeddings():
+    """Sentence-transformer embeddings from the shared model registry (one model per process)"""
+    return SharedLangchainEmbeddings(EMBED_MODEL)
+
+
+def _parse_pdf(path: str):
+    return [(doc.page_content, doc.metadata) for doc in PyPDFLoader(path).load()]
+
+
+def load_file(path: str, cache=None):
     """
-    Build (or reload) a knowledge base from files in knowledge_base/.
-    Supports PDF and TXT for now.
-    If no files found, returns None (so the AI still works).
+    Load one PDF or TXT file into langchain Documents.
+    With a core.parse_cache.ParseCache, PDFs are only parsed once per distinct content.
     """
-    docs = []
+    if path.endswith(".pdf"):
+        if cache is None:
+            return PyPDFLoader(path).load()
+        return [Document(page_content=text, metadata=meta) for text, meta in cache.load(path, _parse_pdf)]
+    if path.endswith(".txt"):
+        return TextLoader(path, encoding="utf-8").load()
+    return []
+
+
+def iter_files(dirs: Iterable[str]) -> Iterator[str]:
+    """Supported files anywhere below each directory (index folders excluded), as they are found."""
+    from core.watcher import walk_files
+
+    for entry in walk_files(dirs, SUPPORTED_EXTENSIONS, KB_INTERNAL_DIRS):
+        yield os.path.normpath(entry.path)
+
+
+def discover_files(dirs: Iterable[str]) -> List[str]:
+    return list(iter_files(dirs))
+
+
+def prefetch(items: Iterable, depth: int = 2) -> Iterator:
+    """
+    Produce items on a background thread, at most depth ahead of the consumer.
+    Errors are re-raised in the consumer; if the consumer stops early the
+    producer stops at its next item.
+    """
+    slots: "queue.Queue[tuple]" = queue.Queue(maxsize=max(1, depth))
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                slots.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put(("item", item)):
+                    return
+        except BaseException as e:
+            put(("error", e))
+            return
+        put(("end", None))
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            kind, value = slots.get()
+            if kind == "end":
+                return
+            if kind == "error":
+                raise value
+            yield value
+    finally:
+        stop.set()
+
+
+def ingest_progress_printer(every_s: float = 5.0) -> Callable[[dict], None]:
+    """progress callback for ingest_files: one line at the first batch, then at most every every_s seconds."""
+    last = [None]
+
+    def report(progress: dict):
+        if last[0] is not None and progress["elapsed"] - last[0] < every_s:
+            return
+        last[0] = progress["elapsed"]
+        rate = progress["chunks"] / progress["elapsed"] if progress["elapsed"] else 0.0
+        print(f"📥 Ingested {progress['files']} files, {progress['chunks']} chunks ({rate:.0f} chunks/s)")
+
+    return report
+
+
+class KnowledgeBase:
+    """
+    Chroma vectorstore plus a manifest of the source files it holds, so files can be
+    (re)embedded one at a time while the assistant is running:
+      - knowledge_base/ingest_manifest.json maps source path -> mtime, size, chunking, chunk ids
+        (changing chunk_size/chunk_overlap re-splits from the parse cache, no re-parse)
+      - chunk ids are derived from the source path, so re-ingesting replaces old chunks
+      - near-duplicate chunks are collapsed into one vector listing all their sources,
+        across ingests: the MinHash signatures of stored chunks are kept next to the
+        manifest (knowledge_base/minhash.npz) and every new chunk is checked against them
+      - a BM25 index over the same chunks is kept next to it (knowledge_base/bm25.json.gz)
+      - ingestion streams: files are loaded and split ahead on a background thread in
+        batches of ~ingest_batch_size chunks (at most ingest_in_flight batches waiting)
+        while batches are embedded and upserted one at a time, so memory is bounded
+        by the batch size rather than the corpus
+
+    retrieval_mode:
+      - "vector": embedding search only
+      - "hybrid": BM25 and vector rankings fused with reciprocal rank fusion
+      - "adaptive": hybrid, but the query is not embedded at all when BM25 is decisive
+        (top score >= lexical_decisive_ratio x the runner-up)
+    """
+
+    def __init__(
+        self,
+        store,
+        persist_dir: str = DB_DIR,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200,
+        parse_cache=None,
+        dedup_threshold: Optional[float] = 0.85,
+        retrieval_mode: str = "hybrid",
+        lexical_decisive_ratio: float = 2.0,
+        track_centroid: bool = False,
+        ingest_batch_size: int = 256,
+        ingest_in_flight: int = 2,
+    ):
+        if retrieval_mode not in RETRIEVAL_MODES:
+            raise ValueError(f"retrieval_mode must be one of {RETRIEVAL_MODES}")
+        self.store = store
+        self.persist_dir = persist_dir
+        os.makedirs(persist_dir, exist_ok=True)
+        self.manifest_path = os.path.join(persist_dir, MANIFEST_FILE)
+        self.bm25_path = os.path.join(persist_dir, BM25_FILE)
+        self.minhash_path = os.path.join(persist_dir, MINHASH_FILE)
+        self.retrieval_mode = retrieval_mode
+        self.lexical_decisive_ratio = lexical_decisive_ratio
+        self.retrieval_stats = {"queries": 0, "embeddings_skipped": 0}
+        self.assembler = None  # optional core.context.ContextAssembler, see make_assembler
+        self.splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        self.chunking = [chunk_size, chunk_overlap]
+        self.parse_cache = parse_cache
+        self.dedup_threshold = dedup_threshold
+        self.dedup_stats = {"chunks_in": 0, "chunks_out": 0}
+        self.ingest_batch_size = ingest_batch_size
+        self.ingest_in_flight = ingest_in_flight
+        self._lock = threading.Lock()
+        self.manifest: Dict[str, dict] = self._load_manifest()
+        self.bm25 = self._load_bm25()
+        self.lsh = self._load_lsh() if dedup_threshold else None
+        self.track_centroid = track_centroid
+        self.centroid_path = os.path.join(persist_dir, CENTROID_FILE)
+        self.vocab_path = os.path.join(persist_dir, VOCAB_FILE)
+        self.centroid_sum, self.centroid_count = load_centroid(self.centroid_path)
+
+    # -------------- Manifest --------------
+    def _load_manifest(self) -> Dict[str, dict]:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_manifest(self):
+        self.store.persist()
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, ensure_ascii=False)
+        os.replace(tmp, self.manifest_path)
+        tmp = self.bm25_path + ".tmp"
+        self.bm25.save(tmp)
+        os.replace(tmp, self.bm25_path)
+        if self.lsh is not None:
+            tmp = self.minhash_path + ".tmp"
+            self.lsh.save(tmp)
+            os.replace(tmp, self.minhash_path)
+        if self.track_centroid:
+            tmp = self.centroid_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"sum": self.centroid_sum.tolist(), "count": self.centroid_count}, f)
+            os.replace(tmp, self.centroid_path)
+            # chunk count and document frequencies, so a sharded KB answers idf() without opening shards
+            tmp = self.vocab_path + ".tmp"
+            with gzip.open(tmp, "wt", encoding="utf-8") as f:
+                json.dump({"chunks": len(self.bm25), "df": {t: len(p) for t, p in self.bm25.postings.items()}}, f, ensure_ascii=False)
+            os.replace(tmp, self.vocab_path)
+
+    def _load_bm25(self) -> BM25Index:
+        try:
+            return BM25Index.load(self.bm25_path)
+        except (FileNotFoundError, OSError, ValueError):
+            pass
+        # index persisted before BM25 existed: rebuild it from the stored chunks
+        bm25 = BM25Index()
+        if self.manifest:
+            data = self.store.get(include=["documents"])
+            for doc_id, text in zip(data["ids"], data["documents"]):
+                bm25.add(doc_id, text or "")
+        return bm25
+
+    def _load_lsh(self) -> MinHashLSH:
+        try:
+            return MinHashLSH.load(self.minhash_path, threshold=self.dedup_threshold)
+        except (FileNotFoundError, OSError, ValueError, KeyError):
+            pass
+        # index persisted before signatures were kept: compute them from the stored chunks
+        lsh = MinHashLSH(threshold=self.dedup_threshold)
+        if self.manifest:
+            data = self.store.get(include=["documents"])
+            for doc_id, text in zip(data["ids"], data["documents"]):
+                lsh.insert(doc_id, lsh.signature(text or ""))
+        return lsh
+
+    @staticmethod
+    def _signature(path: str) -> dict:
+        st = os.stat(path)
+        return {"mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+    @staticmethod
+    def _chunk_id(path: str, i: int) -> str:
+        return hashlib.sha1(path.encode("utf-8")).hexdigest()[:16] + f"-{i}"
+
+    def is_current(self, path: str) -> bool:
+        entry = self.manifest.get(path)
+        if not entry:
+            return False
+        try:
+            sig = self._signature(path)
+        except FileNotFoundError:
+            return False
+        return (
+            entry.get("mtime_ns") == sig["mtime_ns"]
+            and entry.get("size") == sig["size"]
+            and entry.get("chunking") == self.chunking
+        )
+
+    # -------------- Ingestion --------------
+    def ingest_files(self, paths: Iterable[str], progress: Optional[Callable[[dict], None]] = None) -> int:
+        """
+        Embed new or modified files, replacing their previous chunks. Returns chunks added.
+        paths may be a generator; progress(dict) is called after every batch.
+        """
+        with self._lock:
+            added = self._ingest(paths, progress)
+            self._save_manifest()
+        return added
+
+    def remove_files(self, paths: Iterable[str]) -> int:
+        removed = 0
+        with self._lock:
+            stale = []
+            for path in paths:
+                count, dependents = self._delete_chunks(os.path.normpath(path))
+                removed += count
+                stale.extend(dependents)
+            if stale:
+                self._ingest(stale)
+            self._save_manifest()
+        return removed
+
+    def _ingest(self, paths: Iterable[str], progress: Optional[Callable[[dict], None]] = None) -> int:
+        seen = set()
+        dedup_before = dict(self.dedup_stats)
+        counts = {"files": 0, "chunks": 0, "batches": 0, "elapsed": 0.0}
+        started = time.monotonic()
+        todo: Iterable[str] = (os.path.normpath(p) for p in paths)
+        while True:
+            # files whose duplicates were folded into a re-ingested file's chunks must be re-ingested too
+            dependents: List[str] = []
+            for batch in prefetch(self._load_batches(todo, seen), self.ingest_in_flight):
+                counts["chunks"] += self._upsert_batch(batch, dependents)
+                counts["files"] += sum(1 for _, sig, _ in batch if sig)
+                counts["batches"] += 1
+                counts["elapsed"] = time.monotonic() - started
+                if progress:
+                    progress(dict(counts))
+            if not dependents:
+                break
+            todo = dependents
+
+        chunks_in = self.dedup_stats["chunks_in"] - dedup_before["chunks_in"]
+        chunks_out = self.dedup_stats["chunks_out"] - dedup_before["chunks_out"]
+        if chunks_in > chunks_out:
+            print(f"🧹 Dedup: {chunks_in} → {chunks_out} chunks (-{(chunks_in - chunks_out) / chunks_in:.0%})")
+        return counts["chunks"]
+
+    def _load_batches(self, paths: Iterable[str], seen: set) -> Iterator[List[tuple]]:
+        """[(path, signature, chunks)] groups of ~ingest_batch_size chunks; chunks None = file is gone."""
+        batch, size = [], 0
+        for path in paths:
+            if path in seen or self.is_current(path):
+                continue
+            seen.add(path)
+            try:
+                sig = self._signature(path)
+                chunks = self.splitter.split_documents(load_file(path, self.parse_cache))
+            except FileNotFoundError:
+                sig, chunks = None, None
+            batch.append((path, sig, chunks))
+            size += len(chunks or ())
+            if size >= self.ingest_batch_size:
+                yield batch
+                batch, size = [], 0
+        if batch:
+            yield batch
+
+    def _upsert_batch(self, batch: List[tuple], dependents: List[str]) -> int:
+        docs, ids, owners, sigs = [], [], {}, {}
+        for path, sig, chunks in batch:
+            dependents.extend(self._delete_chunks(path)[1])
+            if chunks is None:
+                continue
+            chunk_ids = [self._chunk_id(path, i) for i in range(len(chunks))]
+            owners.update((i, path) for i in chunk_ids)
+            docs.extend(chunks)
+            ids.extend(chunk_ids)
+            sigs[path] = sig
+
+        # near-duplicates are collapsed within the batch and into chunks already stored
+        merged = {}
+        if self.lsh is not None and docs:
+            docs, ids, merged, stats = dedup_documents(docs, ids, threshold=self.dedup_threshold, index=self.lsh)
+            for key in ("chunks_in", "chunks_out"):
+                self.dedup_stats[key] += stats[key]
+            self._add_sources({kept: owners[dropped] for dropped, kept in merged.items() if kept not in owners})
+        if docs:
+            for doc, doc_id in zip(docs, ids):
+                doc.metadata["chunk_id"] = doc_id
+                self.bm25.add(doc_id, doc.page_content)
+            # a single large file can exceed the batch size: embed it in slices
+            step = max(1, self.ingest_batch_size)
+            for start in range(0, len(docs), step):
+                self.store.add_documents(docs[start:start + step], ids=ids[start:start + step])
+            self._update_centroid(ids, +1)
+
+        for path, sig in sigs.items():
+            self.manifest[path] = {**sig, "chunking": self.chunking, "ids": [], "merged": []}
+        for i in ids:
+            self.manifest[owners[i]]["ids"].append(i)
+        for dropped, kept in merged.items():
+            entry = self.manifest[owners[dropped]]
+            if owners.get(kept) != owners[dropped] and kept not in entry["merged"]:
+                entry["merged"].append(kept)
+        return len(docs)
+
+    def _add_sources(self, sources: Dict[str, str]):
+        """List new sources on stored chunks that just absorbed a duplicate ({chunk id: source path})."""
+        if not sources:
+            return
+        ids = list(sources)
+        data = self.store.get(ids=ids, include=["metadatas"])
+        metadatas = [add_source(dict(meta or {}), sources[i]) for i, meta in zip(data["ids"], data["metadatas"])]
+        if hasattr(self.store, "update_metadatas"):
+            self.store.update_metadatas(data["ids"], metadatas)
+        else:
+            self.store._collection.update(ids=data["ids"], metadatas=metadatas)
+
+    def _delete_chunks(self, path: str) -> Tuple[int, List[str]]:
+        """Drop a file's chunks; returns (count, files that had duplicates merged into them)."""
+        entry = self.manifest.pop(path, None)
+        if not entry or not entry.get("ids"):
+            return 0, []
+        ids = set(entry["ids"])
+        self._update_centroid(entry["ids"], -1)
+        self.store.delete(ids=entry["ids"])
+        self.bm25.remove(ids)
+        self._forget_signatures(ids)
+        dependents = [p for p, e in self.manifest.items() if ids.intersection(e.get("merged", ()))]
+        for p in dependents:
+            count, more = self._delete_chunks(p)
+            dependents.extend(q for q in more if q not in dependents)
+        return len(ids), dependents
+
+    def _forget_signatures(self, ids: Iterable[str]):
+        if self.lsh is not None:
+            for doc_id in ids:
+                self.lsh.remove(doc_id)
+
+    def _update_centroid(self, ids: List[str], sign: int):
+        """Running sum of unit-normalised chunk embeddings, for shard routing."""
+        if not self.track_centroid or not ids:
+            return
+        vectors = np.asarray(self.store.get(ids=ids, include=["embeddings"])["embeddings"], dtype=np.float32)
+        if not len(vectors):
+            return
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        total = vectors.sum(axis=0) * sign
+        self.centroid_sum = total if self.centroid_sum is None else self.centroid_sum + total
+        self.centroid_count += sign * len(vectors)
+
+    def on_files_changed(self, changed: List[str], removed: List[str]):
+        """DocumentWatcher callback."""
+        removed_count = self.remove_files(removed) if removed else 0
+        added = self.ingest_files(changed) if changed else 0
+        if added or removed_count:
+            print(f"📚 Knowledge base updated: +{added} / -{removed_count} chunks")
+
+    # -------------- Retrieval --------------
+    @property
+    def embeddings(self):
+        return self.store.embeddings
+
+    def idf(self, term: str) -> float:
+        return self.bm25.idf(term)
+
+    def doc_frequency(self, term: str) -> int:
+        """Chunks containing term (a cheap vocabulary check, no embedding)."""
+        return len(self.bm25.postings.get(term, ()))
+
+    def chunk_count(self) -> int:
+        return len(self.bm25)
+
+    def iter_stores(self):
+        yield self.store
+
+    def _vector_search(self, query: str, k: int, embedding=None):
+        if embedding is None:
+            return self.store.similarity_search_with_relevance_scores(query, k=k)
+        # the by-vector variant returns distances; convert with the store's own relevance function
+        to_relevance = self.store._select_relevance_score_fn()
+        hits = self.store.similarity_search_by_vector_with_relevance_scores(embedding, k=k)
+        return [(doc, to_relevance(dist)) for doc, dist in hits]
+
+    def search(self, query: str, k: int = 3, embedding=None) -> List[Tuple[Document, float]]:
+        """
+        Top-k (chunk, relevance in [0, 1]) pairs, best first. Over-fetches so
+        near-duplicate hits don't crowd out other results. Relevance is the vector
+        similarity where the chunk came back from Chroma, else its BM25 score
+        squashed to bm25 / (bm25 + LEXICAL_HALF_SCORE). Both are absolute, so the
+        assembler's min_score still drops weak hits when the best hit is weak.
+        Pass embedding to reuse an already embedded query.
+        """
+        fetch_k = k * 3
+        self.retrieval_stats["queries"] += 1
+        lexical = self.bm25.search(query, fetch_k) if self.retrieval_mode != "vector" else []
+        lex_scores = {doc_id: score / (score + LEXICAL_HALF_SCORE) for doc_id, score in lexical}
+
+        if self.retrieval_mode == "adaptive" and self._is_decisive(lexical):
+            self.retrieval_stats["embeddings_skipped"] += 1
+            hits = [(doc, lex_scores[self._doc_key(doc)]) for doc in self._fetch(list(lex_scores))]
+        elif not lexical:
+            hits = self._vector_search(query, fetch_k, embedding)
+        else:
+            vector = self._vector_search(query, fetch_k, embedding)
+            by_id = {self._doc_key(d): d for d, _ in vector}
+            vec_scores = {self._doc_key(d): score for d, score in vector}
+            fused = reciprocal_rank_fusion([list(lex_scores), list(by_id)])[:fetch_k]
+            missing = [doc_id for doc_id in fused if doc_id not in by_id]
+            by_id.update((self._doc_key(d), d) for d in self._fetch(missing))
+            hits = [
+                (by_id[doc_id], max(vec_scores.get(doc_id, 0.0), lex_scores.get(doc_id, 0.0)))
+                for doc_id in fused
+                if doc_id in by_id
+            ]
+        return diverse(hits, k, text=lambda hit: hit[0].page_content)
+
+    def similarity_search(self, query: str, k: int = 3):
+        return [doc for doc, _ in self.search(query, k=k)]
+
+    def _is_decisive(self, lexical: List[Tuple[str, float]]) -> bool:
+        if not lexical:
+            return False
+        if len(lexical) == 1:
+            return True
+        return lexical[0][1] >= self.lexical_decisive_ratio * lexical[1][1]
+
+    @staticmethod
+    def _doc_key(doc) -> str:
+        return doc.metadata.get("chunk_id") or doc.page_content
+
+    def _fetch(self, ids: List[str]) -> list:
+        """Documents for chunk ids, in the given order."""
+        if not ids:
+            return []
+        data = self.store.get(ids=ids, include=["documents", "metadatas"])
+        found = {
+            doc_id: Document(page_content=text or "", metadata=meta or {})
+            for doc_id, text, meta in zip(data["ids"], data["documents"], data["metadatas"])
+        }
+        return [found[doc_id] for doc_id in ids if doc_id in found]
+
+
+def load_centroid(path: str):
+    """(sum vector or None, count) from a shard's centroid.json."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return np.asarray(data["sum"], dtype=np.float32), int(data["count"])
+    except (FileNotFoundError, ValueError, KeyError):
+        return None, 0
+
+
+def shard_name(path: str, sharding: str) -> str:
+    """folder: the file's directory (knowledge_base/manuals -> knowledge_base-manuals); type: its extension."""
+    if sharding == "type":
+        return os.path.splitext(path)[1].lstrip(".").lower() or "other"
+    folder = os.path.dirname(os.path.normpath(path)) or "."
+    return folder.replace(os.sep, "-").replace("/", "-").strip(".-") or "root"
+
+
+class ShardedKnowledgeBase:
+    """
+    Knowledge base split into named shards (one per folder or per document type),
+    each a KnowledgeBase with its own persisted index under knowledge_base/shards/<name>/
+    and a centroid summary (mean chunk embedding).
+      - shards are opened lazily, so memory scales with the shards actually queried
+      - chunk counts and document frequencies (for the retrieval gate and idf) come from
+        each shard's vocab.json.gz, so they cover every shard without opening it
+      - queries go to explicitly requested shards, or to the route_top_n shards whose
+        centroid is closest to the query embedding, searched in parallel
+    """
+
+    def __init__(self, open_shard, sharding: str = "folder", route_top_n: int = 2, root: str = SHARD_DIR):
+        self.open_shard = open_shard  # name -> KnowledgeBase
+        self.sharding = sharding
+        self.route_top_n = route_top_n
+        self.root = root
+        self.assembler = None
+        self._shards: Dict[str, KnowledgeBase] = {}
+        self._vocab: Dict[str, Tuple[float, int, Dict[str, int]]] = {}  # name -> (mtime, chunks, df)
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self.retrieval_stats = {"queries": 0, "shards_searched": 0}
+
+    # -------------- Shards --------------
+    def names(self) -> List[str]:
+        return sorted(e.name for e in os.scandir(self.root) if e.is_dir())
+
+    def shard(self, name: str) -> KnowledgeBase:
+        with self._lock:
+            if name not in self._shards:
+                self._shards[name] = self.open_shard(name)
+            return self._shards[name]
+
+    def centroids(self) -> Dict[str, np.ndarray]:
+        out = {}
+        for name in self.names():
+            if name in self._shards:
+                total, count = self._shards[name].centroid_sum, self._shards[name].centroid_count
+            else:
+                total, count = load_centroid(os.path.join(self.root, name, CENTROID_FILE))
+            if total is not None and count > 0:
+                out[name] = total / max(np.linalg.norm(total), 1e-12)
+        return out
+
+    def release(self):
+        """Close all opened shards."""
+        with self._lock:
+            self._shards = {}
+
+    def iter_stores(self):
+        for name in self.names():
+            yield self.shard(name).store
+
+    @property
+    def manifest(self) -> Dict[str, dict]:
+        merged = {}
+        for name in self.names():
+            merged.update(self.shard(name).manifest)
+        return merged
 
+    # -------------- Ingestion --------------
+    def _by_shard(self, paths: Iterable[str]) -> Dict[str, List[str]]:
+        groups: Dict[str, List[str]] = {}
+        for path in paths:
+            groups.setdefault(shard_name(path, self.sharding), []).append(path)
+        return groups
+
+    def ingest_files(self, paths: Iterable[str], progress: Optional[Callable[[dict], None]] = None) -> int:
+        return sum(self.shard(name).ingest_files(group, progress) for name, group in self._by_shard(paths).items())
+
+    def remove_files(self, paths: Iterable[str]) -> int:
+        return sum(self.shard(name).remove_files(group) for name, group in self._by_shard(paths).items())
+
+    def on_files_changed(self, changed: List[str], removed: List[str]):
+        removed_count = self.remove_files(removed) if removed else 0
+        added = self.ingest_files(changed) if changed else 0
+        if added or removed_count:
+            print(f"📚 Knowledge base updated: +{added} / -{removed_count} chunks")
+
+    # -------------- Retrieval --------------
+    @property
+    def embeddings(self):
+        return get_embeddings()
+
+    def _term_stats(self, term: str) -> Tuple[int, int]:
+        """(chunks, chunks containing term) over all shards: live for opened shards, else from their vocab.json.gz."""
+        n = df = 0
+        for name in self.names():
+            with self._lock:
+                shard = self._shards.get(name)
+            if shard is None:
+                vocab = self._load_vocab(name)
+                if vocab is not None:
+                    n += vocab[1]
+                    df += vocab[2].get(term, 0)
+                    continue
+                # written before vocab files existed: open it once (the file appears on its next save)
+                shard = self.shard(name)
+            n += len(shard.bm25)
+            df += len(shard.bm25.postings.get(term, ()))
+        return n, df
+
+    def _load_vocab(self, name: str) -> Optional[Tuple[float, int, Dict[str, int]]]:
+        path = os.path.join(self.root, name, VOCAB_FILE)
+        try:
+            mtime = os.path.getmtime(path)
+            cached = self._vocab.get(name)
+            if cached is None or cached[0] != mtime:
+                with gzip.open(path, "rt", encoding="utf-8") as f:
+                    data = json.load(f)
+                cached = self._vocab[name] = (mtime, int(data["chunks"]), data["df"])
+            return cached
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def doc_frequency(self, term: str) -> int:
+        """Chunks containing term across all shards, opened or not."""
+        return self._term_stats(term)[1]
+
+    def chunk_count(self) -> int:
+        return self._term_stats("")[0]
+
+    def idf(self, term: str) -> float:
+        """BM25 idf over all shards, opened or not."""
+        n, df = self._term_stats(term)
+        return float(np.log(1 + (n - df + 0.5) / (df + 0.5)))
+
+    def route(self, embedding) -> List[str]:
+        centroids = self.centroids()
+        unsummarised = [n for n in self.names() if n not in centroids]
+        if not centroids:
+            return unsummarised
+        q = np.asarray(embedding, dtype=np.float32)
+        q /= max(np.linalg.norm(q), 1e-12)
+        ranked = sorted(centroids, key=lambda n: float(centroids[n] @ q), reverse=True)
+        return ranked[: self.route_top_n] + unsummarised
+
+    def search(self, query: str, k: int = 3, shards: Optional[List[str]] = None) -> List[Tuple[Document, float]]:
+        self.retrieval_stats["queries"] += 1
+        names = self.names()
+        targets = [n for n in shards if n in names] if shards else names
+        if not targets:
+            return []
+        # embedded once here and shared by every shard searched
+        embedding = self.embeddings.embed_query(query)
+        if not shards:
+            targets = self.route(embedding)
+        self.retrieval_stats["shards_searched"] += len(targets)
+        with ThreadPoolExecutor(max_workers=len(targets)) as pool:
+            results = list(pool.map(lambda n: self.shard(n).search(query, k=k, embedding=embedding), targets))
+        hits = sorted((hit for shard_hits in results for hit in shard_hits), key=lambda h: h[1], reverse=True)
+        return diverse(hits, k, text=lambda hit: hit[0].page_content)
+
+    def similarity_search(self, query: str, k: int = 3):
+        return [doc for doc, _ in self.search(query, k=k)]
+
+
+def kb_options(rag_cfg: dict) -> dict:
+    """KnowledgeBase / store options from the "rag" section of config.json."""
+    return {
+        "dedup_threshold": rag_cfg.get("dedup_threshold", 0.85),
+        "retrieval_mode": rag_cfg.get("retrieval_mode", "hybrid"),
+        "lexical_decisive_ratio": rag_cfg.get("lexical_decisive_ratio", 2.0),
+        "vector_dtype": rag_cfg.get("vector_dtype", "float32"),
+        "rerank": rag_cfg.get("rerank", True),
+        "chunk_size": rag_cfg.get("chunk_size", 1000),
+        "chunk_overlap": rag_cfg.get("chunk_overlap", 200),
+        "parse_cache_mb": rag_cfg.get("parse_cache_mb", 200),
+        "sharding": rag_cfg.get("sharding", "none"),
+        "route_top_n": rag_cfg.get("route_top_n", 2),
+        "ingest_batch_size": rag_cfg.get("ingest_batch_size", 256),
+        "ingest_in_flight": rag_cfg.get("ingest_in_flight", 2),
+    }
+
+
+def _open_store(persist_dir: str, vector_dtype: str, rerank: bool):
+    if vector_dtype == "float32":
+        return Chroma(persist_directory=persist_dir, embedding_function=get_embeddings())
+    from core.quantize import QuantizedVectorStore
+
+    return QuantizedVectorStore(persist_dir, get_embeddings(), dtype=vector_dtype, rerank=rerank)
+
+
+def open_knowledge_base(
+    vector_dtype: str = "float32",
+    rerank: bool = True,
+    parse_cache_mb: Optional[float] = 200,
+    sharding: str = "none",
+    route_top_n: int = 2,
+    **kb_options,
+):
+    """
+    Open the persisted index without scanning for documents.
+      - float32: Chroma in knowledge_base/
+      - float16 / int8: QuantizedVectorStore in knowledge_base/quantized_<dtype>/
+        (its own manifest and BM25 index, so switching back and forth is safe)
+      - sharding "folder" / "type": a ShardedKnowledgeBase under knowledge_base/shards/
+        (knowledge_base/shards_<dtype>/ when quantized)
+      - parsed PDF text is cached in knowledge_base/.parse_cache/ (0 disables)
+    """
+    if sharding not in SHARDING_MODES:
+        raise ValueError(f"sharding must be one of {SHARDING_MODES}")
+    if not os.path.exists(DB_DIR):
+        os.makedirs(DB_DIR)
+    if parse_cache_mb:
+        kb_options["parse_cache"] = open_parse_cache(parse_cache_mb)
+
+    if sharding != "none":
+        root = SHARD_DIR if vector_dtype == "float32" else os.path.join(DB_DIR, f"shards_{vector_dtype}")
+
+        def open_shard(name: str) -> KnowledgeBase:
+            persist_dir = os.path.join(root, name)
+            store = _open_store(persist_dir, vector_dtype, rerank)
+            return KnowledgeBase(store, persist_dir=persist_dir, track_centroid=True, **kb_options)
+
+        return ShardedKnowledgeBase(open_shard, sharding=sharding, route_top_n=route_top_n, root=root)
+
+    persist_dir = DB_DIR if vector_dtype == "float32" else os.path.join(DB_DIR, f"quantized_{vector_dtype}")
+    return KnowledgeBase(_open_store(persist_dir, vector_dtype, rerank), persist_dir=persist_dir, **kb_options)
+
+
+def open_parse_cache(max_mb: float = 200):
+    from core.parse_cache import ParseCache
+
+    return ParseCache(PARSE_CACHE_DIR, max_bytes=int(max_mb * 1_000_000))
+
+
+def build_knowledge_base(doc_dirs: Optional[Iterable[str]] = None, **kb_options):
+    """
+    Build (or reload) a knowledge base from files anywhere below knowledge_base/
+    plus any extra document directories (e.g. memory/documents), streamed through
+    KnowledgeBase.ingest_files with progress output.
+    Supports PDF and TXT for now; unchanged files are not re-embedded.
+    kb_options are passed to open_knowledge_base (see kb_options()).
+    If no files found and nothing to watch, returns None (so the AI still works).
+    """
     if not os.path.exists(DB_DIR):
         os.makedirs(DB_DIR)
 
-    # Load docs
-    for fname in os.listdir(DB_DIR):
-        path = os.path.join(DB_DIR, fname)
-        if fname.endswith(".pdf"):
-            loader = PyPDFLoader(path)
-            docs.extend(loader.load())
-        elif fname.endswith(".txt"):
-            loader = TextLoader(path, encoding="utf-8")
-            docs.extend(loader.load())
-
-    if not docs:  # 🚨 nothing found
+    doc_dirs = list(doc_dirs or [])
+    paths = iter_files([DB_DIR] + doc_dirs)
+    first = next(paths, None)
+    if first is None and not doc_dirs:  # 🚨 nothing found
         print("⚠️ No documents found in knowledge_base/. Skipping RAG.")
         return None
 
-    # Split docs into smaller chunks
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    split_docs = splitter.split_documents(docs)
+    # Open the persisted vectorstore and bring it up to date
+    kb = open_knowledge_base(**kb_options)
+    gone = [path for path in kb.manifest if not os.path.exists(path)]
+    if gone:
+        kb.remove_files(gone)
+    if first is not None:
+        kb.ingest_files(itertools.chain([first], paths), progress=ingest_progress_printer())
+    if isinstance(kb, ShardedKnowledgeBase):
+        kb.release()  # queries reopen only the shards they are routed to
+    return kb
 
-    # Use HuggingFace embeddings
-    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
 
-    # Create Chroma vectorstore
-    db = Chroma.from_documents(split_docs, embeddings, persist_directory=DB_DIR)
-    db.persist()
-    return db
+def watch_documents(kb: KnowledgeBase, dirs: Iterable[str], debounce: float = 2.0, poll_interval: float = 1.0):
+    """Start a background watcher that feeds new/modified notes into the live index."""
+    from core.watcher import DocumentWatcher
 
+    watcher = DocumentWatcher(
+        [DB_DIR] + list(dirs),
+        kb.on_files_changed,
+        debounce=debounce,
+        poll_interval=poll_interval,
+        extensions=SUPPORTED_EXTENSIONS,
+        exclude_dirs=KB_INTERNAL_DIRS,
+    )
+    return watcher.start()
 
-def query_knowledge_base(db, query: str, k: int = 3):
+
+def query_knowledge_base(db, query: str, k: int = 3, style: Optional[dict] = None, shards: Optional[List[str]] = None):
     """
-    Query the Chroma knowledge base for relevant context.
+    Query the knowledge base for relevant context.
+    If db has a ContextAssembler, up to k hits are filtered, trimmed and fit into
+    the token budget for the detected style; otherwise the top k chunks are joined.
+    shards restricts a sharded knowledge base to the named shards (default: routed).
     If db is None, return empty context.
     """
     if db is None:
         return ""  # no knowledge base yet
-    results = db.similarity_search(query, k=k)
-    return "\n".join([doc.page_content for doc in results])
+    search_kwargs = {"shards": shards} if shards else {}
+    hits = db.search(query, k=k, **search_kwargs)
+    if db.assembler is not None:
+        return db.assembler.assemble(query, hits, style)
+    return "\n".join([doc.page_content for doc, _ in hits])
+
+
+def make_assembler(kb, cfg: dict):
+    """ContextAssembler from the "rag.context" config section."""
+    from core.context import ContextAssembler
+
+    embed = None
+    if cfg.get("sentence_scoring", "lexical") == "embedding":
+        embed = kb.embeddings.embed_documents
+    return ContextAssembler(
+        budgets=cfg.get("budget_tokens"),
+        min_score=cfg.get("min_score", 0.2),
+        relative_cutoff=cfg.get("relative_cutoff", 0.6),
+        max_sentences=cfg.get("max_sentences_per_chunk", 4),
+        idf=kb.idf,
+        embed=embed,
+    )
+
+
+def quantization_report(kb, k: int = 5, sample: int = 200) -> str:
+    """Recall@k vs memory for float32 / float16 / int8 storage of this KB's vectors."""
+    import random
+    from core.context import split_sentences
+    from core.quantize import format_report, recall_memory_report
+
+    vectors, documents = [], []
+    for store in kb.iter_stores():
+        data = store.get(include=["documents", "embeddings"])
+        vectors.extend(data["embeddings"])
+        documents.extend(data["documents"])
+    if not vectors:
+        return "(knowledge base is empty)"
+    vectors = np.asarray(vectors, dtype=np.float32)
+    # queries: the first sentence of a sample of chunks, embedded like a user question
+    texts = random.Random(0).sample(documents, min(sample, len(documents)))
+    questions = [(split_sentences(t) or [t])[0][:300] for t in texts]
+    queries = np.asarray(kb.embeddings.embed_documents(questions), dtype=np.float32)
+    return format_report(recall_memory_report(vectors, queries, k=k))
+
+
+# -------------- Maintenance --------------
+def _kb_parts(kb) -> Iterator[Tuple[str, KnowledgeBase]]:
+    if isinstance(kb, ShardedKnowledgeBase):
+        for name in kb.names():
+            yield name, kb.shard(name)
+    else:
+        yield os.path.basename(os.path.normpath(kb.persist_dir)), kb
+
+
+def _matches(name: str, patterns: Tuple[str, ...]) -> bool:
+    import fnmatch
+
+    return any(fnmatch.fnmatchcase(name, p) for p in patterns)
+
+
+def index_disk_bytes(persist_dir: str) -> int:
+    """Size of one index on disk: INDEX_FILES and INDEX_DIRS only (no source documents, caches or nested indexes)."""
+    total = 0
+    try:
+        entries = list(os.scandir(persist_dir))
+    except OSError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.is_file() and _matches(entry.name, INDEX_FILES):
+                total += entry.stat().st_size
+            elif entry.is_dir() and _matches(entry.name, INDEX_DIRS):
+                for root, _, files in os.walk(entry.path):
+                    total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+        except OSError:
+            pass
+    return total
+
+
+def _text_key(text: Optional[str]) -> str:
+    return hashlib.sha1((text or "").encode("utf-8")).hexdigest()
+
+
+def _audit(part: KnowledgeBase) -> dict:
+    """Store contents vs manifest for one index."""
+    data = part.store.get(include=["documents", "metadatas"])
+    owner = {i: path for path, entry in part.manifest.items() for i in entry.get("ids", [])}
+    stored = data["ids"]
+    orphans = [i for i in stored if i not in owner]
+    # exact-duplicate chunk texts: keep the first copy the manifest knows about
+    first: Dict[str, str] = {}
+    duplicates: Dict[str, str] = {}
+    texts = dict(zip(stored, data["documents"]))
+    for doc_id in sorted(stored, key=lambda i: (i not in owner, i)):
+        key = _text_key(texts[doc_id])
+        if key in first:
+            duplicates[doc_id] = first[key]
+        else:
+            first[key] = doc_id
+    per_source: Dict[str, int] = {}
+    for doc_id, meta in zip(stored, data["metadatas"]):
+        source = owner.get(doc_id) or (meta or {}).get("source", "?")
+        per_source[source] = per_source.get(source, 0) + 1
+    stored_set = set(stored)
+    return {
+        "stored": stored,
+        "owner": owner,
+        "orphans": orphans,
+        "duplicates": duplicates,
+        "per_source": per_source,
+        "missing_vectors": [i for i in owner if i not in stored_set],
+    }
+
+
+def knowledge_base_stats(kb, top: int = 10) -> str:
+    """Vectors, sources, orphans, duplicate ratio and disk size per index, plus the largest sources."""
+    lines = [f"{'index':<24} {'vectors':>8} {'sources':>8} {'orphans':>8} {'dup %':>6} {'disk MB':>8}"]
+    per_source: Dict[str, int] = {}
+    totals = {"vectors": 0, "sources": 0, "orphans": 0, "duplicates": 0, "bytes": 0}
+    for name, part in _kb_parts(kb):
+        audit = _audit(part)
+        vectors, size = len(audit["stored"]), index_disk_bytes(part.persist_dir)
+        dup = len(audit["duplicates"]) / vectors if vectors else 0.0
+        lines.append(f"{name:<24} {vectors:>8} {len(part.manifest):>8} {len(audit['orphans']):>8} {dup:>6.1%} {size / 1e6:>8.1f}")
+        for key, value in (("vectors", vectors), ("sources", len(part.manifest)), ("orphans", len(audit["orphans"])), ("duplicates", len(audit["duplicates"])), ("bytes", size)):
+            totals[key] += value
+        for source, count in audit["per_source"].items():
+            per_source[source] = per_source.get(source, 0) + count
+    if len(lines) > 2:
+        dup = totals["duplicates"] / totals["vectors"] if totals["vectors"] else 0.0
+        lines.append(f"{'total':<24} {totals['vectors']:>8} {totals['sources']:>8} {totals['orphans']:>8} {dup:>6.1%} {totals['bytes'] / 1e6:>8.1f}")
+    if per_source:
+        lines.append("")
+        lines.append(f"Vectors per source (top {top}):")
+        for source, count in sorted(per_source.items(), key=lambda kv: -kv[1])[:top]:
+            lines.append(f"  {count:>6}  {source}")
+    return "\n".join(lines)
+
+
+def verify_knowledge_base(kb, doc_dirs: Iterable[str] = ()) -> Dict[str, List[str]]:
+    """
+    Check the index against the source files. Returns issue -> affected paths/ids
+    (empty dict when everything is consistent):
+      - missing_source: indexed file no longer exists
+      - stale: file changed (or chunking changed) since it was indexed
+      - unindexed: document on disk that is not in the index
+      - missing_vectors: chunk id in the manifest but not in the vector store
+      - orphans: vector not owned by any indexed file (e.g. left by an older version)
+      - duplicates: vector whose text is an exact copy of another
+      - bm25_mismatch: chunk id in only one of the BM25 index and the manifest
+    """
+    issues: Dict[str, List[str]] = {}
+
+    def add(issue: str, items: Iterable[str]):
+        items = list(items)
+        if items:
+            issues.setdefault(issue, []).extend(items)
+
+    indexed = set()
+    for name, part in _kb_parts(kb):
+        indexed.update(part.manifest)
+        add("missing_source", (p for p in part.manifest if not os.path.exists(p)))
+        add("stale", (p for p in part.manifest if os.path.exists(p) and not part.is_current(p)))
+        audit = _audit(part)
+        add("missing_vectors", audit["missing_vectors"])
+        add("orphans", audit["orphans"])
+        add("duplicates", audit["duplicates"])
+        add("bm25_mismatch", set(part.bm25.doc_len).symmetric_difference(audit["owner"]))
+    add("unindexed", (p for p in iter_files([DB_DIR] + list(doc_dirs)) if p not in indexed))
+    return issues
+
+
+def vacuum_knowledge_base(kb, dry_run: bool = False) -> dict:
+    """
+    Drop what verify reports as dead weight, then compact storage:
+      - files that no longer exist are removed from the index
+      - orphaned vectors and exact-duplicate vectors are deleted (a duplicate's file
+        records the kept copy in "merged", like near-duplicates merged at ingest)
+      - Chroma's SQLite file is VACUUMed; quantized stores are rewritten by persist()
+    Returns counts and disk bytes before/after.
+    """
+    result = {"removed_files": 0, "orphans": 0, "duplicates": 0, "bytes_before": 0, "bytes_after": 0}
+    for name, part in _kb_parts(kb):
+        result["bytes_before"] += index_disk_bytes(part.persist_dir)
+        gone = [p for p in part.manifest if not os.path.exists(p)]
+        if dry_run:
+            audit = _audit(part)
+            result["removed_files"] += len(gone)
+            result["orphans"] += len(audit["orphans"])
+            result["duplicates"] += len(set(audit["duplicates"]) - set(audit["orphans"]))
+            continue
+        if gone:
+            part.remove_files(gone)
+            result["removed_files"] += len(gone)
+        with part._lock:
+            audit = _audit(part)
+            orphans = set(audit["orphans"])
+            drop = list(audit["orphans"]) + [i for i in audit["duplicates"] if i not in orphans]
+            for dropped, kept in audit["duplicates"].items():
+                path = audit["owner"].get(dropped)
+                if path is None:
+                    continue
+                entry = part.manifest[path]
+                entry["ids"].remove(dropped)
+                if audit["owner"].get(kept) != path and kept not in entry.setdefault("merged", []):
+                    entry["merged"].append(kept)
+            if drop:
+                part._update_centroid(drop, -1)
+                part.store.delete(ids=drop)
+                part.bm25.remove(drop)
+                part._forget_signatures(drop)
+            part._save_manifest()
+            result["orphans"] += len(audit["orphans"])
+            result["duplicates"] += len(drop) - len(audit["orphans"])
+        _compact(part.persist_dir)
+        result["bytes_after"] += index_disk_bytes(part.persist_dir)
+    if dry_run:
+        result["bytes_after"] = result["bytes_before"]
+    return result
+
+
+def _compact(persist_dir: str):
+    """VACUUM Chroma's SQLite database and drop index temp files left by interrupted writes."""
+    import sqlite3
+
+    db_path = os.path.join(persist_dir, "chroma.sqlite3")
+    if os.path.exists(db_path):
+        try:
+            with sqlite3.connect(db_path, timeout=30) as conn:
+                conn.execute("VACUUM")
+        except sqlite3.Error as e:
+            print(f"⚠️ Could not compact {db_path}: {e}")
+    for fname in os.listdir(persist_dir):
+        if fname.endswith(".tmp") and _matches(fname[: -len(".tmp")], INDEX_FILES):
+            os.remove(os.path.join(persist_dir, fname))
+
+
+if __name__ == "__main__":
+    import argparse
+    from core.config import load_config
+
+    parser = argparse.ArgumentParser(description="Knowledge base tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("quant-report", help="recall vs memory for each vector storage setting")
+    p.add_argument("-k", type=int, default=5)
+    p.add_argument("--sample", type=int, default=200, help="number of sampled queries")
+    sub.add_parser("cache-stats", help="parsed-document cache size and entry count")
+    p = sub.add_parser("cache-clean", help="remove parsed-document cache entries")
+    p.add_argument("--all", action="store_true", help="remove every entry")
+    p.add_argument("--max-age-days", type=float, help="remove entries unused for this many days")
+    p.add_argument("--orphans", action="store_true", help="remove entries whose source file is gone or changed")
+    p = sub.add_parser("stats", help="vectors, sources, orphans, duplicate ratio and disk size of the index")
+    p.add_argument("--top", type=int, default=10, help="number of sources listed by vector count")
+    p = sub.add_parser("verify", help="check the index against the source files (exit code 1 on problems)")
+    p.add_argument("--show", type=int, default=5, help="examples listed per issue")
+    p = sub.add_parser("vacuum", help="drop orphaned/duplicate vectors and removed files, then compact storage")
+    p.add_argument("--dry-run", action="store_true", help="only report what would be removed")
+    args = parser.parse_args()
+
+    rag_cfg = load_config().get("rag", {})
+    options = kb_options(rag_cfg)
+    if args.command == "quant-report":
+        print(quantization_report(open_knowledge_base(**options), k=args.k, sample=args.sample))
+    elif args.command == "cache-stats":
+        stats = open_parse_cache(options["parse_cache_mb"] or 200).stats()
+        print(f"📦 {stats['entries']} entries, {stats['bytes'] / 1e6:.1f} MB (limit {stats['max_bytes'] / 1e6:.0f} MB)")
+    elif args.command == "cache-clean":
+        from core.parse_cache import hashes_of
+
+        cache = open_parse_cache(options["parse_cache_mb"] or 200)
+        keep = None
+        if args.orphans:
+            keep = hashes_of(discover_files([DB_DIR] + rag_cfg.get("watch_dirs", [])))
+        removed = cache.clean(max_age_days=args.max_age_days, keep_hashes=keep, clear=args.all)
+        print(f"🧹 Removed {removed} cache entries")
+    elif args.command == "stats":
+        print(knowledge_base_stats(open_knowledge_base(**options), top=args.top))
+    elif args.command == "verify":
+        issues = verify_knowledge_base(open_knowledge_base(**options), rag_cfg.get("watch_dirs", []))
+        if not issues:
+            print("✅ Knowledge base matches its source files")
+        for issue, items in issues.items():
+            print(f"⚠️ {issue}: {len(items)}")
+            for item in items[:args.show]:
+                print(f"    {item}")
+        if issues:
+            raise SystemExit(1)
+    elif args.command == "vacuum":
+        result = vacuum_knowledge_base(open_knowledge_base(**options), dry_run=args.dry_run)
+        verb = "Would remove" if args.dry_run else "Removed"
+        print(
+            f"🧹 {verb} {result['removed_files']} deleted files, {result['orphans']} orphaned and "
+            f"{result['duplicates']} duplicate vectors"
+        )
+        if not args.dry_run:
+            print(f"💾 Disk: {result['bytes_before'] / 1e6:.1f} MB → {result['bytes_after'] / 1e6:.1f} MB")
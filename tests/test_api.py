@@ -0,0 +1,116 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from interface.api import BrainServer
+
+
+class EchoBrain:
+    db = None
+
+    def think(self, message, user_id="api", token=None):
+        return f"echo: {message}"
+
+    def retrieve(self, query, k=None):
+        return [{"text": query, "source": "", "score": 1.0}] * (k or 3)
+
+    def close(self):
+        pass
+
+
+async def _request(server, raw: bytes):
+    listener = await asyncio.start_server(server.handle, "127.0.0.1", 0)
+    port = listener.sockets[0].getsockname()[1]
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(raw)
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), 5)
+        writer.close()
+    finally:
+        listener.close()
+        await listener.wait_closed()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split(b" ", 2)[1]), json.loads(body or b"{}")
+
+
+def _post(length: str, body: bytes = b"", path: str = "/chat") -> bytes:
+    return (f"POST {path} HTTP/1.1\r\nHost: x\r\nConnection: close\r\nContent-Length: {length}\r\n\r\n").encode() + body
+
+
+@pytest.mark.parametrize("length", ["abc", "-1", "+5", "1, 2", "1.5"])
+def test_invalid_content_length_is_400(length):
+    status, body = asyncio.run(_request(BrainServer(EchoBrain()), _post(length)))
+    assert status == 400
+    assert "Content-Length" in body["error"]
+
+
+def test_oversized_content_length_is_413():
+    server = BrainServer(EchoBrain(), {"max_body_bytes": 10})
+    status, _ = asyncio.run(_request(server, _post("11", b"x" * 11)))
+    assert status == 413
+
+
+def test_valid_request_still_served():
+    payload = json.dumps({"message": "hi"}).encode()
+    status, body = asyncio.run(_request(BrainServer(EchoBrain()), _post(str(len(payload)), payload)))
+    assert status == 200
+    assert body == {"reply": "echo: hi"}
+
+
+@pytest.mark.parametrize("k", ["3", -1, 0, 2.5, True, [3]])
+def test_invalid_k_is_400(k):
+    payload = json.dumps({"query": "q", "k": k}).encode()
+    status, body = asyncio.run(_request(BrainServer(EchoBrain()), _post(str(len(payload)), payload, "/retrieve")))
+    assert status == 400
+    assert body["error"] == "'k' must be a positive integer"
+
+
+def test_k_is_capped():
+    payload = json.dumps({"query": "q", "k": 1000}).encode()
+    server = BrainServer(EchoBrain(), {"max_k": 5})
+    status, body = asyncio.run(_request(server, _post(str(len(payload)), payload, "/retrieve")))
+    assert status == 200
+    assert len(body["hits"]) == 5
+
+
+class WaitingBrain(EchoBrain):
+    """think() runs until its token is cancelled."""
+
+    def __init__(self):
+        self.reason = None
+        self.started = threading.Event()
+
+    def think(self, message, user_id="api", token=None):
+        self.started.set()
+        token.wait(5)
+        self.reason = token.reason
+        return "partial"
+
+
+def test_client_disconnect_cancels_chat():
+    brain = WaitingBrain()
+    server = BrainServer(brain)
+    payload = json.dumps({"message": "hi"}).encode()
+
+    async def scenario():
+        listener = await asyncio.start_server(server.handle, "127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(_post(str(len(payload)), payload))
+            await writer.drain()
+            await asyncio.get_running_loop().run_in_executor(None, brain.started.wait, 5)
+            writer.close()
+            for _ in range(40):
+                if brain.reason:
+                    break
+                await asyncio.sleep(0.05)
+        finally:
+            listener.close()
+            await listener.wait_closed()
+
+    asyncio.run(scenario())
+    assert brain.reason == "client gone"
@@ -0,0 +1,51 @@
+from core.bm25 import BM25Index, reciprocal_rank_fusion, tokenize
+
+DOCS = {
+    "a": "load_config reads config.json once",
+    "b": "error 0x80070005 means access denied",
+    "c": "the garden needs water in summer",
+}
+
+
+def _index():
+    index = BM25Index()
+    for doc_id, text in DOCS.items():
+        index.add(doc_id, text)
+    return index
+
+
+def test_tokenize_keeps_identifiers_and_their_parts():
+    assert tokenize("Call load_config on v1.2-rc") == ["call", "load_config", "on", "v1.2-rc", "v1", "2", "rc"]
+
+
+def test_search_ranks_exact_identifier_first():
+    index = _index()
+    assert index.search("0x80070005")[0][0] == "b"
+    assert [doc_id for doc_id, _ in index.search("config.json water", k=3)] in (["a", "c"], ["c", "a"])
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = _index()
+    path = str(tmp_path / "bm25.json.gz")
+    index.save(path)
+    loaded = BM25Index.load(path)
+    assert loaded.postings == index.postings
+    assert loaded.doc_len == index.doc_len
+    assert loaded.avgdl == index.avgdl
+    assert loaded.search("garden water") == index.search("garden water")
+
+
+def test_remove_and_re_add_keep_statistics_consistent():
+    index = _index()
+    index.remove(["b", "missing"])
+    assert len(index) == 2
+    assert "0x80070005" not in index.postings
+    assert index.search("access denied") == []
+    index.add("a", "a completely different text")
+    assert index.doc_len["a"] == 4
+    assert index._total_len == sum(index.doc_len.values())
+    assert "load_config" not in index.postings
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    assert reciprocal_rank_fusion([["x", "y", "z"], ["y", "x"], ["y"]])[0] == "y"
@@ -0,0 +1,36 @@
+from core.context import ContextAssembler, estimate_tokens
+
+
+class Doc:
+    def __init__(self, page_content):
+        self.page_content = page_content
+
+
+LONG = " ".join(f"Filler sentence number {i} about nothing in particular." for i in range(40))
+
+
+def test_low_and_far_below_best_hits_are_dropped():
+    assembler = ContextAssembler(min_score=0.2, relative_cutoff=0.6)
+    hits = [(Doc("best"), 0.9), (Doc("close"), 0.6), (Doc("far"), 0.4), (Doc("noise"), 0.1)]
+    assert [d.page_content for d, _ in assembler.select(hits)] == ["best", "close"]
+    assert assembler.assemble("q", [(Doc("noise"), 0.1)]) == ""
+
+
+def test_chunks_are_trimmed_to_query_sentences():
+    assembler = ContextAssembler(max_sentences=1)
+    text = "The garden needs water. The flux capacitor is calibrated each spring. Budgets are due."
+    assert assembler.assemble("flux capacitor calibration", [(Doc(text), 0.9)]) == "The flux capacitor is calibrated each spring."
+
+
+def test_context_stays_within_the_style_budget():
+    assembler = ContextAssembler(budgets={"short": 40, "medium": 120}, max_sentences=50)
+    hits = [(Doc(LONG), 0.9), (Doc(LONG.replace("Filler", "Padding")), 0.8)]
+    short = assembler.assemble("filler sentence", hits, style={"length": "short"})
+    assert 0 < estimate_tokens(short) <= 40
+    medium = assembler.assemble("filler sentence", hits)
+    assert 40 < estimate_tokens(medium) <= 120
+
+    last = assembler.stats["last"]
+    assert last["budget"] == 120 and last["hits"] == 2
+    assert last["saved_tokens"] == last["baseline_tokens"] - last["context_tokens"] > 0
+    assert assembler.stats["requests"] == 2
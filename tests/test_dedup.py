@@ -0,0 +1,42 @@
+from core.dedup import MinHashLSH, dedup_documents, diverse
+
+TEXT = "The flux capacitor must be calibrated every spring before the first trip through time, or it drifts."
+
+
+class Doc:
+    def __init__(self, page_content, source):
+        self.page_content = page_content
+        self.metadata = {"source": source}
+
+
+def test_near_duplicates_collapse_into_the_first_with_all_sources():
+    docs = [Doc(TEXT, "a.txt"), Doc(TEXT.replace("drifts.", "drifts!"), "b.txt"), Doc("Something else entirely about gardens and water.", "c.txt")]
+    kept, kept_ids, merged, stats = dedup_documents(docs, ["1", "2", "3"])
+    assert kept_ids == ["1", "3"]
+    assert merged == {"2": "1"}
+    assert kept[0].metadata["sources"] == "a.txt; b.txt"
+    assert kept[0].metadata["duplicates"] == 1
+    assert stats["removed"] == 1 and stats["chunks_out"] == 2
+
+
+def test_index_catches_duplicates_of_stored_chunks(tmp_path):
+    index = MinHashLSH()
+    dedup_documents([Doc(TEXT, "a.txt")], ["stored"], index=index)
+    path = str(tmp_path / "minhash.npz")
+    index.save(path)
+
+    reloaded = MinHashLSH.load(path)
+    later = Doc(TEXT, "b.txt")
+    kept, _, merged, _ = dedup_documents([later], ["new"], index=reloaded)
+    assert kept == [] and merged == {"new": "stored"}
+    assert "sources" not in later.metadata  # updating the stored chunk is the caller's job
+
+    reloaded.remove("stored")
+    assert "stored" not in reloaded
+    kept, _, _, _ = dedup_documents([later], ["new"], index=reloaded)
+    assert [d.metadata["source"] for d in kept] == ["b.txt"]
+
+
+def test_diverse_skips_near_duplicate_hits():
+    hits = [Doc(TEXT, "a"), Doc(TEXT, "b"), Doc("A different passage about budgets and reviews.", "c")]
+    assert [d.metadata["source"] for d in diverse(hits, k=2)] == ["a", "c"]
@@ -0,0 +1,64 @@
+import argparse
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+from core.export import _parse_bound, export_history, filter_messages
+from core.memory import Memory
+
+
+def _msg(ts, role, user_id, text):
+    return {"ts": ts, "role": role, "user_id": user_id, "text": text}
+
+
+MESSAGES = [
+    _msg("2025-08-01T09:00:00Z", "user", "a", "a1"),
+    _msg("2025-08-01T09:00:01Z", "assistant", "assistant", "reply a1"),  # legacy shared reply id
+    _msg("2025-08-02T09:00:00Z", "user", "b", "b1"),
+    _msg("2025-08-02T09:00:01Z", "assistant", "b", "reply b1"),
+    _msg("2025-08-03T09:00:00Z", "user", "a", "a2"),
+    _msg("2025-08-03T09:00:01Z", "assistant", "a", "reply a2"),
+]
+
+
+def _texts(messages):
+    return [m["text"] for m in messages]
+
+
+def test_filter_by_user_keeps_legacy_replies():
+    assert _texts(filter_messages(MESSAGES, user_id="a")) == ["a1", "reply a1", "a2", "reply a2"]
+
+
+def test_filter_by_time_range_is_half_open():
+    kept = filter_messages(MESSAGES, since=datetime(2025, 8, 2), until=datetime(2025, 8, 3, 9))
+    assert _texts(kept) == ["b1", "reply b1"]
+
+
+def test_aware_bounds_compare_with_the_utc_log():
+    since = _parse_bound("2025-08-02T11:00+02:00")  # 09:00 UTC
+    assert since == datetime(2025, 8, 2, 9)
+    assert _texts(filter_messages(MESSAGES, since=since))[:1] == ["b1"]
+    assert _parse_bound("2025-08-02T09:00:00Z") == since
+    with pytest.raises(argparse.ArgumentTypeError):
+        _parse_bound("yesterday")
+
+
+def test_export_since_skips_older_backups(tmp_path, monkeypatch):
+    memory = Memory(base_dir=str(tmp_path / "memory"))
+    memory.append_message("user", "old", ts="2025-08-01T09:00:00Z", user_id="a")
+    old_backup = memory.backup_log()
+    memory.flush()
+    memory.append_message("user", "new", ts="2099-01-01T00:00:00Z", user_id="a")
+
+    opened = []
+    real_open = Memory._open_text
+    monkeypatch.setattr(Memory, "_open_text", staticmethod(lambda path: opened.append(path) or real_open(path)))
+    stats = export_history(memory, path=str(tmp_path / "out.jsonl"), since=datetime(2098, 1, 1))
+
+    assert stats["messages"] == 1
+    with open(tmp_path / "out.jsonl", encoding="utf-8") as f:
+        assert [json.loads(line)["text"] for line in f] == ["new"]
+    assert old_backup not in opened and memory.log_path in opened
+    assert os.path.exists(old_backup)
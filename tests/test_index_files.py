@@ -0,0 +1,22 @@
+import os
+
+import pytest
+
+pytest.importorskip("langchain_community")
+
+from rag import _compact, index_disk_bytes
+
+
+def test_only_index_artifacts_are_counted_and_cleaned(tmp_path):
+    kb = tmp_path / "knowledge_base"
+    segment = kb / "0a1b2c3d-1111-2222-3333-444455556666"
+    segment.mkdir(parents=True)
+    (segment / "data_level0.bin").write_bytes(b"x" * 10)
+    (kb / "ingest_manifest.json").write_bytes(b"x" * 100)
+    (kb / "manual.txt").write_bytes(b"x" * 1000)  # a source document, not part of the index
+    (kb / "notes.tmp").write_text("user file")
+    (kb / "bm25.json.gz.tmp").write_text("interrupted write")
+
+    assert index_disk_bytes(str(kb)) == 110
+    _compact(str(kb))
+    assert sorted(os.listdir(kb)) == ["0a1b2c3d-1111-2222-3333-444455556666", "ingest_manifest.json", "manual.txt", "notes.tmp"]
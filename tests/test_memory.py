@@ -0,0 +1,116 @@
+import gzip
+import os
+import threading
+import time
+
+from core.memory import Memory
+
+
+def _memory(tmp_path, **kwargs):
+    return Memory(base_dir=str(tmp_path / "memory"), **kwargs)
+
+
+def test_backup_rotates_and_compresses(tmp_path):
+    memory = _memory(tmp_path)
+    memory.append_message("user", "hello there", user_id="u")
+    path = memory.backup_log()
+    memory.flush()
+    assert path.endswith(".txt.gz") and os.path.exists(path)
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        assert f.read().endswith("\tuser\tu\thello there\n")
+    assert os.path.getsize(memory.log_path) == 0
+    assert [m["text"] for m in memory.iter_messages()] == ["hello there"]
+
+
+def test_concurrent_backups_get_distinct_names(tmp_path):
+    memory = _memory(tmp_path)
+    paths, start = [], threading.Barrier(8)
+
+    def backup(i):
+        memory.append_message("user", f"message {i}", user_id="u")
+        start.wait()
+        paths.append(memory.backup_log())
+
+    threads = [threading.Thread(target=backup, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    memory.flush()
+    assert len(set(paths)) == len(paths) == 8
+    assert sorted(m["text"] for m in memory.iter_messages()) == [f"message {i}" for i in range(8)]
+
+
+def test_no_retention_keeps_every_backup(tmp_path):
+    memory = _memory(tmp_path, retention={"max_count": None, "max_age_days": None, "max_total_mb": None})
+    for i in range(5):
+        memory.append_message("user", f"message {i}", user_id="u")
+        memory.backup_log()
+    memory.flush()
+    assert len(memory.list_backups()) == 5
+
+
+def test_prune_by_count_and_age_keeps_the_newest(tmp_path):
+    memory = _memory(tmp_path, retention={"max_count": 2})
+    for i in range(4):
+        memory.append_message("user", f"message {i}", user_id="u")
+        memory.backup_log()
+    memory.flush()
+    assert [m["text"] for m in memory.iter_messages()] == ["message 2", "message 3"]
+
+    memory.retention = {"max_age_days": 1}
+    old = memory.list_backups()[0]
+    os.utime(old, (time.time() - 2 * 86400,) * 2)
+    assert memory.prune_backups() == [old]
+    assert [m["text"] for m in memory.iter_messages()] == ["message 3"]
+
+
+def _chat(memory, exchanges, user_id="u", prefix=""):
+    for i in range(exchanges):
+        memory.append_message("user", f"{prefix}question {i}", user_id=user_id)
+        memory.append_message("assistant", f"{prefix}answer {i}", user_id=user_id)
+
+
+def test_reverse_lines_across_small_blocks(tmp_path):
+    memory = _memory(tmp_path)
+    _chat(memory, 3)
+    memory.append_message("user", "a line much longer than one block " * 3, user_id="u")
+    with open(memory.log_path, "rb") as f:
+        data = f.read()
+    expected, offset = [], 0
+    for line in data.split(b"\n")[:-1]:
+        expected.append((offset, line.decode("utf-8")))
+        offset += len(line) + 1
+
+    assert list(memory._reverse_lines(None, block_size=7)) == expected[::-1]
+    before = expected[3][0]
+    assert list(memory._reverse_lines(before, block_size=5)) == expected[:3][::-1]
+
+
+def test_history_pages_walk_back_to_the_start_without_splitting_exchanges(tmp_path):
+    memory = _memory(tmp_path)
+    _chat(memory, 5)
+    pages, cursor = [], None
+    while True:
+        pairs, cursor = memory.load_history_page(limit=3, before=cursor)
+        pages.append(pairs)
+        if cursor is None:
+            break
+    assert all(len(pairs) == 2 for pairs in pages[:-1])  # 3 messages, plus the question of a cut exchange
+    assert [pair for pairs in reversed(pages) for pair in pairs] == memory.load_history_pairs()
+    assert pages[0][-1] == ("question 4", "answer 4")
+
+
+def test_history_page_per_session_stops_at_clear(tmp_path):
+    memory = _memory(tmp_path)
+    _chat(memory, 2, user_id="a", prefix="a ")
+    memory.clear_session("a")
+    _chat(memory, 1, user_id="b", prefix="b ")
+    _chat(memory, 2, user_id="a", prefix="a new ")
+
+    pairs, cursor = memory.load_history_page(limit=10, user_id="a")
+    assert pairs == [("a new question 0", "a new answer 0"), ("a new question 1", "a new answer 1")]
+    assert cursor is None
+    pairs, cursor = memory.load_history_page(limit=2, user_id="a")
+    assert pairs == [("a new question 1", "a new answer 1")] and cursor is not None
+    assert memory.load_history_page(limit=2, before=cursor, user_id="a") == ([("a new question 0", "a new answer 0")], None)
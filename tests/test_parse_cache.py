@@ -0,0 +1,73 @@
+import os
+import time
+
+from core.parse_cache import ParseCache, file_hash, hashes_of
+
+
+def _counting_parser():
+    calls = []
+
+    def parse(path):
+        calls.append(path)
+        with open(path, encoding="utf-8") as f:
+            return [(f.read(), {"page": 0, "source": path})]
+
+    return parse, calls
+
+
+def test_parses_once_per_content_and_reparses_after_an_edit(tmp_path):
+    cache = ParseCache(str(tmp_path / "cache"))
+    parse, calls = _counting_parser()
+    doc = tmp_path / "a.txt"
+    doc.write_text("first version", encoding="utf-8")
+
+    assert cache.load(str(doc), parse) == [("first version", {"page": 0, "source": str(doc)})]
+    assert cache.load(str(doc), parse)[0][0] == "first version"
+    assert len(calls) == 1 and (cache.hits, cache.misses) == (1, 1)
+
+    doc.write_text("second version", encoding="utf-8")  # new content, new hash
+    assert cache.load(str(doc), parse)[0][0] == "second version"
+    assert len(calls) == 2
+
+
+def test_copy_under_another_name_hits_and_reports_its_own_path(tmp_path):
+    cache = ParseCache(str(tmp_path / "cache"))
+    parse, calls = _counting_parser()
+    (tmp_path / "a.txt").write_text("same bytes", encoding="utf-8")
+    (tmp_path / "b.txt").write_text("same bytes", encoding="utf-8")
+    cache.load(str(tmp_path / "a.txt"), parse)
+    [(_, meta)] = cache.load(str(tmp_path / "b.txt"), parse)
+    assert len(calls) == 1 and meta["source"] == str(tmp_path / "b.txt")
+
+
+def test_corrupt_entry_is_a_miss(tmp_path):
+    cache = ParseCache(str(tmp_path / "cache"))
+    parse, calls = _counting_parser()
+    doc = tmp_path / "a.txt"
+    doc.write_text("text", encoding="utf-8")
+    cache.load(str(doc), parse)
+    with open(os.path.join(cache.cache_dir, file_hash(str(doc)) + ".json.z"), "wb") as f:
+        f.write(b"not zlib")
+    assert cache.load(str(doc), parse)[0][0] == "text"
+    assert len(calls) == 2
+
+
+def test_clean_and_size_limit(tmp_path):
+    cache = ParseCache(str(tmp_path / "cache"))
+    for i in range(3):
+        cache.put(f"h{i}", [(f"page {i}" * 50, {})])
+    old = time.time() - 10 * 86400
+    os.utime(os.path.join(cache.cache_dir, "h0.json.z"), (old, old))
+
+    assert cache.clean(max_age_days=5) == 1
+    assert cache.clean(keep_hashes={"h1"}) == 1
+    assert cache.stats()["entries"] == 1
+
+    cache.max_bytes = cache.stats()["bytes"]  # room for exactly one entry
+    os.utime(os.path.join(cache.cache_dir, "h1.json.z"), (old, old))
+    cache.put("h3", [("newer", {})])
+    assert sorted(os.listdir(cache.cache_dir)) == ["h3.json.z"]
+
+    doc = tmp_path / "a.txt"
+    doc.write_text("x", encoding="utf-8")
+    assert hashes_of([str(doc), str(tmp_path / "missing.txt")]) == {file_hash(str(doc))}
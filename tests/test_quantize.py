@@ -0,0 +1,76 @@
+import hashlib
+import os
+
+import numpy as np
+
+from core.quantize import QuantizedVectorStore
+
+
+class Doc:
+    def __init__(self, page_content, metadata=None):
+        self.page_content = page_content
+        self.metadata = metadata or {}
+
+
+class HashEmbeddings:
+    def _embed(self, text):
+        v = np.zeros(32, dtype=np.float32)
+        for word in text.split():
+            v[int(hashlib.md5(word.encode()).hexdigest(), 16) % 32] += 1
+        return v.tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+def _store(path, rerank=True):
+    return QuantizedVectorStore(str(path), HashEmbeddings(), dtype="int8", rerank=rerank)
+
+
+def _fill(store, n, prefix="doc"):
+    store.add_documents([Doc(f"{prefix}{i} topic{i % 7}", {"i": i}) for i in range(n)], ids=[f"{prefix}{i}" for i in range(n)])
+
+
+def test_persist_and_reload_keep_documents_and_rerank(tmp_path):
+    store = _store(tmp_path)
+    _fill(store, 20)
+    store.persist()
+
+    reopened = _store(tmp_path)
+    assert reopened.ids == store.ids
+    assert reopened.rerank and reopened.exact is not None
+    np.testing.assert_array_equal(reopened.codes, store.codes)
+    assert reopened.get(ids=["doc3"])["documents"] == ["doc3 topic3"]
+    np.testing.assert_array_equal(reopened._vector(3), store._vector(3))  # the float32 row
+    assert sorted(os.listdir(tmp_path)) == ["exact-1.f32", "store.npz"]
+
+
+def test_compaction_writes_next_generation_and_drops_the_old_one(tmp_path):
+    store = _store(tmp_path)
+    _fill(store, 30)
+    store.delete(ids=[f"doc{i}" for i in range(20)])
+    store.persist()  # 10 live rows of 30: compacted
+    assert sorted(os.listdir(tmp_path)) == ["exact-2.f32", "store.npz"]
+
+    reopened = _store(tmp_path)
+    assert reopened.ids == [f"doc{i}" for i in range(20, 30)]
+    assert len(reopened.exact) == 10
+    np.testing.assert_allclose(reopened._vector(0), store._vector(0))
+
+
+def test_opening_without_rerank_keeps_the_float32_copy(tmp_path):
+    store = _store(tmp_path)
+    _fill(store, 10)
+    store.persist()
+
+    plain = _store(tmp_path, rerank=False)
+    plain.delete(ids=["doc0"])
+    plain.persist()
+    assert "exact-1.f32" in os.listdir(tmp_path)
+
+    again = _store(tmp_path)
+    assert again.rerank and len(again._exact_rows) == 9
+    np.testing.assert_allclose(again._vector(0), store._vector(1))
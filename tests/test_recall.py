@@ -0,0 +1,56 @@
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+from core.memory import Memory
+from core.recall import ConversationIndex
+
+
+def test_catch_up_skips_small_talk_and_keeps_the_newest(tmp_path):
+    memory = Memory(base_dir=str(tmp_path / "memory"))
+    for i in range(5):
+        memory.append_message("user", f"question about topic{i} details", ts=f"2026-01-01T00:00:0{i}Z", user_id="u")
+        memory.append_message("assistant", f"answer {i}", ts=f"2026-01-01T00:00:0{i}Z", user_id="u")
+    memory.append_message("user", "thanks!", ts="2026-01-01T00:00:06Z", user_id="u")
+    memory.append_message("assistant", "you're welcome", ts="2026-01-01T00:00:06Z", user_id="u")
+    memory.flush()
+
+    index = ConversationIndex(memory, index_dir=str(tmp_path / "semantic"), catch_up_limit=3, batch_size=2)
+    try:
+        index.flush()
+        assert [index._exchange(row)["user"] for row in range(len(index))] == [
+            "question about topic2 details", "question about topic3 details", "question about topic4 details",
+        ]
+        assert index.stats["skipped"] == 1
+    finally:
+        index.close()
+
+
+def test_reopen_reads_sidecars_and_rebuilds_missing_ones(tmp_path, monkeypatch):
+    memory = Memory(base_dir=str(tmp_path / "memory"))
+    for i, user_id in enumerate(["a", "b", "a"]):
+        memory.append_message("user", f"question about topic{i} details", ts=f"2026-01-01T00:00:0{i}Z", user_id=user_id)
+        memory.append_message("assistant", f"answer {i}", ts=f"2026-01-01T00:00:0{i}Z", user_id=user_id)
+    memory.flush()
+    index_dir = str(tmp_path / "semantic")
+    index = ConversationIndex(memory, index_dir=index_dir)
+    index.flush()
+    index.close()
+
+    def no_rebuild(self, rows):
+        raise AssertionError("exchanges.jsonl was re-read")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(ConversationIndex, "_rebuild_sidecars", no_rebuild)
+        reopened = ConversationIndex(memory, index_dir=index_dir)
+        reopened.close()
+    assert len(reopened) == 3
+    assert [reopened._exchange(row)["user_id"] for row in range(3)] == ["a", "b", "a"]
+    assert list(reopened._user_codes) == [0, 1, 0]
+
+    # an index written before the sidecars existed
+    (tmp_path / "semantic" / "users.i32").unlink()
+    rebuilt = ConversationIndex(memory, index_dir=index_dir)
+    rebuilt.close()
+    assert list(rebuilt._user_codes) == [0, 1, 0] and rebuilt._users == {"a": 0, "b": 1}
+    assert (tmp_path / "semantic" / "users.i32").stat().st_size == 12
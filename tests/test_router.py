@@ -0,0 +1,53 @@
+from core.router import ModelRouter
+
+
+class FakeLLM:
+    def __init__(self, model, fail=False):
+        self.model = model
+        self.fail = fail
+        self.closed = False
+
+    def invoke(self, prompt):
+        if self.fail:
+            raise ConnectionError(f"model {self.model} not found")
+        return f"{self.model}: {prompt}"
+
+    def stream(self, prompt):
+        if self.fail:
+            raise ConnectionError(f"model {self.model} not found")
+        try:
+            for word in prompt.split():
+                yield word
+        finally:
+            self.closed = True
+
+
+def _router(fail=()):
+    llms = {}
+
+    def make(model):
+        llms[model] = FakeLLM(model, fail=model in fail)
+        return llms[model]
+
+    return ModelRouter({"fast": "small", "large": "big"}, make), llms
+
+
+def test_closed_stream_is_counted_as_cancelled():
+    router, llms = _router()
+    stream = router.stream("one two three", {"length": "detailed"})
+    assert next(stream) == "one"
+    stream.close()
+    stats = router.stats()["large"]
+    assert (stats["requests"], stats["cancelled"], stats["errors"]) == (1, 1, 0)
+    assert stats["p50_s"] is None
+    assert llms["big"].closed
+    assert "cancelled 1" in router.report()
+
+
+def test_missing_model_falls_back_and_is_skipped():
+    router, _ = _router(fail={"small"})
+    assert list(router.stream("hi there", {"length": "short"})) == ["hi", "there"]
+    assert router.invoke("again", {"length": "short"}) == "big: again"
+    stats = router.stats()
+    assert stats["fast"]["errors"] == 1 and stats["fast"]["down"]
+    assert stats["large"]["fallbacks"] == 2
@@ -0,0 +1,27 @@
+from core.session import SESSION_COOKIE, session_user_id
+
+
+class FakeRequest:
+    """The parts of gradio.Request that session_user_id reads."""
+
+    def __init__(self, query=None, cookies=None, session_hash="tab-1"):
+        self.query_params = query or {}
+        self.cookies = cookies or {}
+        self.session_hash = session_hash
+
+
+def test_cookie_id_survives_a_new_tab():
+    first = session_user_id(FakeRequest(cookies={SESSION_COOKIE: "abc"}, session_hash="tab-1"))
+    reloaded = session_user_id(FakeRequest(cookies={SESSION_COOKIE: "abc"}, session_hash="tab-2"))
+    assert first == reloaded == "session-abc"
+
+
+def test_named_session_wins_and_default_name_is_the_shared_history():
+    request = FakeRequest(query={"session": "work"}, cookies={SESSION_COOKIE: "abc"})
+    assert session_user_id(request) == "session-work"
+    assert session_user_id(FakeRequest(query={"session": "user"})) == "user"
+
+
+def test_no_cookie_or_isolation_off_uses_the_default_id():
+    assert session_user_id(FakeRequest()) == "user"
+    assert session_user_id(FakeRequest(cookies={SESSION_COOKIE: "abc"}), isolate=False) == "user"
@@ -0,0 +1,68 @@
+import json
+import os
+import time
+
+import pytest
+
+from core.settings import SettingsStore
+
+
+def test_updates_are_debounced_into_one_write(tmp_path):
+    path = str(tmp_path / "persona.json")
+    store = SettingsStore(path, defaults={"tone": "calm"}, debounce=0.2)
+    assert not store.exists and store.get("tone") == "calm"
+
+    for i in range(5):
+        store.update({"count": i})
+    assert store.get("count") == 4  # readers see changes at once
+    assert not os.path.exists(path)
+
+    deadline = time.time() + 5
+    while store.writes == 0 and time.time() < deadline:
+        time.sleep(0.05)
+    time.sleep(0.3)
+    assert store.writes == 1 and store.exists
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f) == {"tone": "calm", "count": 4}
+
+
+def test_no_op_updates_neither_notify_nor_write(tmp_path):
+    store = SettingsStore(str(tmp_path / "s.json"), defaults={"a": 1}, debounce=60)
+    seen = []
+    unsubscribe = store.subscribe(lambda changed, snapshot: seen.append((changed, snapshot["a"])))
+    assert store.update({"a": 1}) == {}
+    assert store.update({"a": 2, "b": 3}) == {"a": 2, "b": 3}
+    unsubscribe()
+    store.update({"a": 4})
+    assert seen == [({"a": 2, "b": 3}, 2)]
+    store.flush()
+    store.flush()  # nothing pending
+    assert store.writes == 1
+
+
+def test_flush_replaces_the_file_atomically(tmp_path, monkeypatch):
+    path = str(tmp_path / "s.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"a": 1}, f)
+    store = SettingsStore(path, debounce=60)
+    assert store.exists and store.get("a") == 1
+
+    store.update({"a": 2})
+    monkeypatch.setattr(json, "dump", lambda *args, **kwargs: (_ for _ in ()).throw(OSError("disk full")))
+    with pytest.raises(OSError):
+        store.flush()
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f) == {"a": 1}  # the old file survives a failed write
+
+    monkeypatch.undo()
+    store.flush()
+    assert sorted(os.listdir(tmp_path)) == ["s.json"]
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f) == {"a": 2}
+
+
+def test_unparsable_file_falls_back_to_defaults(tmp_path):
+    path = tmp_path / "s.json"
+    path.write_text("{broken", encoding="utf-8")
+    store = SettingsStore(str(path), defaults={"a": 1})
+    assert store.data == {"a": 1} and not store.exists
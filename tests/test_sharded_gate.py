@@ -0,0 +1,75 @@
+import hashlib
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("langchain_community")
+
+from core.gate import RetrievalGate
+from core.quantize import QuantizedVectorStore
+from rag import KnowledgeBase, ShardedKnowledgeBase
+
+
+class HashEmbeddings:
+    """Bag-of-words hashed into 64 dimensions: deterministic and model-free."""
+
+    queries = 0  # embed_query calls, over all instances
+
+    def _embed(self, text):
+        v = np.zeros(64, dtype=np.float32)
+        for word in text.lower().split():
+            v[int(hashlib.md5(word.encode()).hexdigest(), 16) % 64] += 1
+        return (v / max(np.linalg.norm(v), 1e-12)).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text):
+        HashEmbeddings.queries += 1
+        return self._embed(text)
+
+
+def _sharded_kb(tmp_path):
+    root = str(tmp_path / "shards")
+
+    def open_shard(name):
+        persist_dir = os.path.join(root, name)
+        store = QuantizedVectorStore(persist_dir, HashEmbeddings(), dtype="float16")
+        return KnowledgeBase(store, persist_dir=persist_dir, track_centroid=True)
+
+    return ShardedKnowledgeBase(open_shard, sharding="folder", root=root)
+
+
+def _ingest(tmp_path, monkeypatch):
+    monkeypatch.setattr(ShardedKnowledgeBase, "embeddings", property(lambda self: HashEmbeddings()))
+    docs = tmp_path / "docs"
+    for folder, text in {"manuals": "The flux capacitor needs calibration every spring.", "notes": "Quarterly budget review for the garden project."}.items():
+        (docs / folder).mkdir(parents=True)
+        (docs / folder / "doc.txt").write_text(text, encoding="utf-8")
+    kb = _sharded_kb(tmp_path)
+    assert kb.ingest_files([str(p) for p in docs.glob("*/doc.txt")]) == 2
+    kb.release()
+    return kb
+
+
+def test_gate_sees_unopened_shards(tmp_path, monkeypatch):
+    _ingest(tmp_path, monkeypatch)
+
+    # a fresh process: no shard opened yet
+    kb = _sharded_kb(tmp_path)
+    gate = RetrievalGate(log_path=None)
+    decision = gate.decide("flux capacitor calibration schedule", None, kb)
+    assert decision.retrieve, decision.reason
+    assert kb.doc_frequency("capacitor") == 1
+    assert kb.chunk_count() == 2
+    assert kb._shards == {}
+    [(doc, _)] = kb.search("flux capacitor calibration", k=1)
+    assert "flux capacitor" in doc.page_content
+
+
+def test_explicit_shards_share_one_query_embedding(tmp_path, monkeypatch):
+    kb = _ingest(tmp_path, monkeypatch)
+    HashEmbeddings.queries = 0
+    kb.search("garden budget", k=2, shards=kb.names())
+    assert HashEmbeddings.queries == 1
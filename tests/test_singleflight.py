@@ -0,0 +1,47 @@
+import threading
+
+import pytest
+
+from core.cancel import Cancelled
+from core.singleflight import SingleFlight
+
+
+def _gated_source(gate: threading.Event, words=("one", "two", "three")):
+    def source():
+        yield words[0]
+        gate.wait(5)
+        yield from words[1:]
+
+    return source
+
+
+def test_identical_requests_share_one_generation():
+    flights = SingleFlight()
+    gate = threading.Event()
+    first = flights.run("k", _gated_source(gate))
+    assert next(first) == "one"
+    second = flights.run("k", _gated_source(gate))
+    gate.set()
+    assert list(first) == ["two", "three"]
+    assert list(second) == ["one", "two", "three"]
+    assert flights.stats == {"requests": 2, "generations": 1, "coalesced": 1}
+
+
+def test_abandoned_generation_ends_cancelled_and_is_not_joined():
+    flights = SingleFlight()
+    gate = threading.Event()
+    first = flights.run("k", _gated_source(gate))
+    assert next(first) == "one"
+    flight = flights._flights["k"]
+    first.close()  # the only listener leaves
+    assert flight.abandoned and flights.in_flight() == 0
+
+    done = threading.Event()
+    done.set()
+    again = flights.run("k", _gated_source(done))
+    assert flights.stats["generations"] == 2  # a new generation, not the stopping one
+    assert list(again) == ["one", "two", "three"]
+
+    gate.set()
+    with pytest.raises(Cancelled):
+        list(flight.follow())
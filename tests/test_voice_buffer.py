@@ -0,0 +1,46 @@
+import threading
+
+import pytest
+
+from tools.voice.buffer import RingBuffer
+
+
+def test_wraps_around_without_losing_or_reordering_bytes():
+    ring = RingBuffer(capacity=8)
+    assert ring.write(b"abcdef") == 6
+    assert ring.read(4) == b"abcd"
+    assert ring.write(b"ghijkl") == 6  # crosses the end of the buffer
+    assert len(ring) == 8 and ring.high_water == 8
+    assert ring.read(100) == b"efghijkl"
+
+
+def test_full_buffer_applies_backpressure_to_the_writer():
+    ring = RingBuffer(capacity=4)
+    assert ring.write(b"abcdefgh", timeout=0.05) == 4  # times out once full
+    assert ring.read(4) == b"abcd"
+
+    payload = bytes(range(256)) * 40
+    writer = threading.Thread(target=ring.write, args=(payload,))
+    writer.start()
+    received = b""
+    while len(received) < len(payload):
+        chunk = ring.read(3, timeout=5)
+        assert chunk, "writer stalled"
+        received += chunk
+    writer.join(5)
+    assert received == payload
+    assert ring.high_water == 4
+
+
+def test_close_drains_then_ends_and_rejects_writes():
+    ring = RingBuffer(capacity=16)
+    ring.write(b"tail")
+    ring.close()
+    assert list(ring.chunks(3)) == [b"tai", b"l"]
+    assert ring.read(10) == b""
+    with pytest.raises(ValueError):
+        ring.write(b"more")
+
+
+def test_read_times_out_empty():
+    assert RingBuffer().read(10, timeout=0.01) == b""
@@ -0,0 +1,73 @@
+import threading
+
+from tools.voice.pipeline import SentenceSplitter, VoicePipeline
+
+
+class Source:
+    sample_rate = 16000
+
+    def chunks(self):
+        yield b"\x00" * 320
+
+
+class STT:
+    def transcribe(self, chunks, sample_rate):
+        for _ in chunks:
+            pass
+        return "tell me a story"
+
+
+class TTS:
+    def synthesize(self, sentence):
+        for _ in range(50):
+            yield b"\x01" * 1024
+
+
+class Brain:
+    def think_stream(self, text, user_id=None):
+        for i in range(5):
+            yield f"This is sentence number {i} of the reply. "
+
+
+class FailingSink:
+    def play(self, chunk):
+        raise OSError("audio device unplugged")
+
+
+class RecordingSink:
+    def __init__(self):
+        self.played = 0
+
+    def play(self, chunk):
+        self.played += len(chunk)
+
+
+def _run(sink):
+    # a small speaker buffer, so synthesis fills it and blocks unless playback keeps up
+    pipeline = VoicePipeline(Brain(), STT(), TTS(), sink, buffer_bytes=4096, chunk_bytes=512)
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(pipeline.run_turn(Source())), daemon=True)
+    thread.start()
+    thread.join(timeout=10)
+    assert not thread.is_alive(), "voice turn hung"
+    return result
+
+
+def test_failing_sink_reports_error_instead_of_hanging():
+    result = _run(FailingSink())
+    assert [str(e) for e in result["errors"]] == ["audio device unplugged"]
+    assert result["reply"].startswith("This is sentence number 0")
+
+
+def test_turn_plays_all_audio():
+    sink = RecordingSink()
+    result = _run(sink)
+    assert result["errors"] == []
+    assert sink.played == 5 * 50 * 1024
+
+
+def test_sentence_splitter_waits_for_complete_sentences():
+    splitter = SentenceSplitter(min_chars=5)
+    assert splitter.feed("Hello there. How are") == ["Hello there."]
+    assert splitter.feed(" you? Fine") == ["How are you?"]
+    assert splitter.flush() == ["Fine"]
@@ -0,0 +1,204 @@
+"""
+Offline retrieval evaluation: builds the knowledge base under a grid of settings
+from a local corpus and reports, per configuration, recall@k, MRR, build time,
+index size and query latency p50/p95, marking the Pareto-optimal rows
+(no other row has better-or-equal recall, p95 latency and size).
+
+    python -m tools.eval_retrieval --docs memory/documents --chunk-size 500 1000 \
+        --chunk-overlap 100 200 --k 3 5 --dtype float32 int8 --mode vector hybrid
+
+Questions are generated from the corpus unless --questions is given: a sampled
+sentence is the known answer, its content words are the query. A hit is correct
+when it comes from the answer's file and contains (nearly) all of the answer's
+words, so the ground truth does not depend on how a configuration chunks the text.
+--questions takes JSON lines {"question", "answer", "source"} (source optional).
+
+Indexes are built in a temporary directory; the real knowledge_base/ is untouched
+apart from the shared parsed-PDF cache.
+"""
+import argparse
+import itertools
+import json
+import random
+import shutil
+import tempfile
+import time
+from typing import List, Optional
+
+from core.bm25 import tokenize
+from core.context import split_sentences
+from core.gate import STOPWORDS
+import rag
+
+ANSWER_COVERAGE = 0.8  # share of the answer's words a chunk must contain to count as a hit
+
+
+def generate_questions(paths: List[str], count: int, seed: int = 0, parse_cache=None) -> List[dict]:
+    """Sentences sampled across the corpus, queried by their first content words."""
+    candidates = []
+    for path in paths:
+        for doc in rag.load_file(path, parse_cache):
+            for sentence in split_sentences(doc.page_content):
+                words = [w for w in tokenize(sentence) if w not in STOPWORDS and len(w) > 2]
+                if 40 <= len(sentence) <= 300 and len(words) >= 4:
+                    candidates.append({"question": " ".join(words[:8]), "answer": sentence, "source": path})
+    rng = random.Random(seed)
+    return rng.sample(candidates, min(count, len(candidates)))
+
+
+def load_questions(path: str) -> List[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def is_answer(doc, question: dict) -> bool:
+    source = question.get("source")
+    if source:
+        sources = (doc.metadata.get("sources") or doc.metadata.get("source", "")).split("; ")
+        if source not in sources:
+            return False
+    answer = set(tokenize(question["answer"]))
+    if not answer:
+        return False
+    return len(answer & set(tokenize(doc.page_content))) / len(answer) >= ANSWER_COVERAGE
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def build_index(paths: List[str], chunk_size: int, chunk_overlap: int, dtype: str, parse_cache, workdir: str):
+    persist_dir = tempfile.mkdtemp(prefix=f"kb-{chunk_size}-{chunk_overlap}-{dtype}-", dir=workdir)
+    kb = rag.KnowledgeBase(
+        rag._open_store(persist_dir, dtype, rerank=True),
+        persist_dir=persist_dir,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        parse_cache=parse_cache,
+    )
+    started = time.perf_counter()
+    kb.ingest_files(paths)
+    return kb, time.perf_counter() - started, rag.index_disk_bytes(persist_dir)
+
+
+def evaluate(kb, questions: List[dict], k: int) -> dict:
+    hits = reciprocal = 0.0
+    latencies = []
+    for question in questions:
+        started = time.perf_counter()
+        results = kb.search(question["question"], k=k)
+        latencies.append(time.perf_counter() - started)
+        rank = next((i for i, (doc, _) in enumerate(results, 1) if is_answer(doc, question)), None)
+        if rank is not None:
+            hits += 1
+            reciprocal += 1 / rank
+    n = len(questions) or 1
+    return {
+        "recall": hits / n,
+        "mrr": reciprocal / n,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+    }
+
+
+def pareto(rows: List[dict]) -> List[dict]:
+    """Flag rows not dominated on (recall up, p95 latency down, index size down), per k."""
+    for row in rows:
+        row["pareto"] = not any(
+            other is not row
+            and other["k"] == row["k"]
+            and other["recall"] >= row["recall"]
+            and other["p95_ms"] <= row["p95_ms"]
+            and other["bytes"] <= row["bytes"]
+            and (other["recall"], -other["p95_ms"], -other["bytes"]) != (row["recall"], -row["p95_ms"], -row["bytes"])
+            for other in rows
+        )
+    return rows
+
+
+def format_table(rows: List[dict]) -> str:
+    lines = [
+        f"{'chunk':>6} {'overlap':>7} {'dtype':>8} {'mode':>9} {'k':>3} {'recall':>7} {'mrr':>6} "
+        f"{'build s':>8} {'size MB':>8} {'p50 ms':>7} {'p95 ms':>7}  pareto"
+    ]
+    for r in sorted(rows, key=lambda r: (r["k"], -r["recall"], r["p95_ms"])):
+        lines.append(
+            f"{r['chunk_size']:>6} {r['chunk_overlap']:>7} {r['dtype']:>8} {r['mode']:>9} {r['k']:>3} "
+            f"{r['recall']:>7.1%} {r['mrr']:>6.3f} {r['build_s']:>8.1f} {r['bytes'] / 1e6:>8.1f} "
+            f"{r['p50_ms']:>7.1f} {r['p95_ms']:>7.1f}  {'*' if r['pareto'] else ''}"
+        )
+    return "\n".join(lines)
+
+
+def run_grid(
+    paths: List[str],
+    questions: List[dict],
+    chunk_sizes: List[int],
+    chunk_overlaps: List[int],
+    dtypes: List[str],
+    modes: List[str],
+    ks: List[int],
+    parse_cache=None,
+) -> List[dict]:
+    rows = []
+    workdir = tempfile.mkdtemp(prefix="eval-retrieval-")
+    try:
+        for chunk_size, chunk_overlap, dtype in itertools.product(chunk_sizes, chunk_overlaps, dtypes):
+            if chunk_overlap >= chunk_size:
+                continue
+            print(f"🔧 Building chunk_size={chunk_size} overlap={chunk_overlap} dtype={dtype}...")
+            kb, build_s, size = build_index(paths, chunk_size, chunk_overlap, dtype, parse_cache, workdir)
+            for mode, k in itertools.product(modes, ks):
+                kb.retrieval_mode = mode
+                rows.append({
+                    "chunk_size": chunk_size,
+                    "chunk_overlap": chunk_overlap,
+                    "dtype": dtype,
+                    "mode": mode,
+                    "k": k,
+                    "build_s": build_s,
+                    "bytes": size,
+                    **evaluate(kb, questions, k),
+                })
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return pareto(rows)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Retrieval quality vs latency over a grid of knowledge base settings")
+    parser.add_argument("--docs", nargs="+", default=["memory/documents"], help="corpus directories (searched recursively)")
+    parser.add_argument("--questions", help="JSON lines file of {question, answer, source}; generated when omitted")
+    parser.add_argument("--num-questions", type=int, default=100)
+    parser.add_argument("--chunk-size", type=int, nargs="+", default=[500, 1000])
+    parser.add_argument("--chunk-overlap", type=int, nargs="+", default=[100, 200])
+    parser.add_argument("--dtype", nargs="+", default=["float32"], choices=["float32", "float16", "int8"])
+    parser.add_argument("--mode", nargs="+", default=["vector", "hybrid"], choices=list(rag.RETRIEVAL_MODES))
+    parser.add_argument("--k", type=int, nargs="+", default=[3, 5])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the rows to this file")
+    args = parser.parse_args(argv)
+
+    paths = rag.discover_files(args.docs)
+    if not paths:
+        raise SystemExit(f"No documents found in {', '.join(args.docs)}")
+    parse_cache = rag.open_parse_cache()
+    questions = load_questions(args.questions) if args.questions else generate_questions(paths, args.num_questions, args.seed, parse_cache)
+    if not questions:
+        raise SystemExit("No questions (corpus has no usable sentences)")
+    print(f"📚 {len(paths)} files, {len(questions)} questions")
+
+    rows = run_grid(paths, questions, args.chunk_size, args.chunk_overlap, args.dtype, args.mode, args.k, parse_cache)
+    print()
+    print(format_table(rows))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+        print(f"\n✅ Results saved to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
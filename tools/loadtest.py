@@ -0,0 +1,138 @@
+"""
+Load test for the Gradio UI: N concurrent chat sessions against modern_gui with a
+fake LLM, reporting latency and error rate per N.
+
+    python -m tools.loadtest --sessions 1 4 16 32 --messages 5 --llm-latency 0.5
+
+Needs gradio_client (installed with gradio). Conversation logs go to a temporary
+directory; the knowledge base is not loaded.
+"""
+import argparse
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from core.brain import SmartBrain
+from core.memory import Memory
+from core.session import SESSION_COOKIE, configure_queue
+from modern_gui import create_modern_gui
+
+
+class FakeLLM:
+    """Stands in for OllamaLLM: fixed latency with jitter, optional failures."""
+
+    def __init__(self, latency: float = 0.5, jitter: float = 0.2, fail_rate: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.fail_rate = fail_rate
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def invoke(self, prompt: str) -> str:
+        with self._lock:
+            self.calls += 1
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        if random.random() < self.fail_rate:
+            raise RuntimeError("fake LLM failure")
+        return f"Echo ({len(prompt)} prompt chars)"
+
+
+def run_session(url: str, session: int, messages: int, timeout: float) -> List[tuple]:
+    """One browser-like session: its own client and session cookie, messages sent in turn."""
+    from gradio_client import Client
+
+    results = []
+    try:
+        client = Client(url, verbose=False, headers={"Cookie": f"{SESSION_COOKIE}=loadtest-{session}"})
+    except Exception as e:
+        return [(None, f"connect: {e}")] * messages
+    history = []
+    for i in range(messages):
+        started = time.perf_counter()
+        try:
+            job = client.submit(f"session {session} message {i}", history, api_name="/respond_with_typing")
+            history, _ = job.result(timeout=timeout)
+            reply = history[-1]["content"] if history else ""
+            error = reply if reply.startswith(("I encountered an error", "Sorry, I encountered an error")) else None
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        results.append((time.perf_counter() - started, error))
+    return results
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def check_isolation(memory: Memory, served: int, sessions: int) -> bool:
+    """Every session that got through logged under its own id."""
+    ids = {r["user_id"] for r in memory.iter_messages(include_backups=False)}
+    return served <= len(ids) <= sessions and "user" not in ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-session load test for the chat UI")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--messages", type=int, default=3, help="messages per session")
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--llm-jitter", type=float, default=0.2)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--concurrency", type=int, default=4, help="Gradio default_concurrency_limit")
+    parser.add_argument("--max-queue", type=int, default=64)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--port", type=int, default=7861)
+    args = parser.parse_args()
+
+    config = {
+        "rag": {"enabled": False},
+        "semantic_memory": {"enabled": False},
+        "sessions": {"isolate": True, "concurrency": args.concurrency, "max_queue": args.max_queue},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        memory = Memory(base_dir=tmp)
+        llm = FakeLLM(args.llm_latency, args.llm_jitter, args.fail_rate)
+        brain = SmartBrain(config=config, memory=memory, llm=llm)
+        demo = create_modern_gui(brain, memory)
+        configure_queue(demo, config)
+        demo.launch(server_name="127.0.0.1", server_port=args.port, prevent_thread_lock=True, quiet=True)
+        url = f"http://127.0.0.1:{args.port}/"
+        print(f"🚀 UI on {url} (concurrency {args.concurrency}, queue {args.max_queue}, LLM ~{args.llm_latency}s)")
+
+        header = f"{'sessions':>8} {'requests':>8} {'errors':>7} {'err%':>6} {'p50 s':>7} {'p95 s':>7} {'max s':>7} {'req/s':>7}"
+        print(header)
+        print("-" * len(header))
+        try:
+            for n in args.sessions:
+                memory.backup_log()
+                started = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=n) as pool:
+                    futures = [pool.submit(run_session, url, s, args.messages, args.timeout) for s in range(n)]
+                    per_session = [f.result() for f in futures]
+                results = [r for session in per_session for r in session]
+                wall = time.perf_counter() - started
+                latencies = [lat for lat, err in results if err is None]
+                errors = [err for _, err in results if err is not None]
+                print(
+                    f"{n:>8} {len(results):>8} {len(errors):>7} {100 * len(errors) / len(results):>5.1f}% "
+                    f"{percentile(latencies, 0.5):>7.2f} {percentile(latencies, 0.95):>7.2f} "
+                    f"{max(latencies, default=0.0):>7.2f} {len(latencies) / wall:>7.2f}"
+                )
+                for err in sorted(set(errors))[:3]:
+                    print(f"         ⚠️ {err}")
+                served = sum(1 for session in per_session if any(err is None for _, err in session))
+                if not check_isolation(memory, served, n):
+                    print("         ❌ sessions were not isolated in the log")
+        finally:
+            demo.close()
+            brain.close()
+        print(f"✅ Done ({llm.calls} LLM calls)")
+
+
+if __name__ == "__main__":
+    main()
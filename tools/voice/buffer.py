@@ -0,0 +1,72 @@
+import threading
+from typing import Iterator, Optional
+
+
+class RingBuffer:
+    """
+    Fixed-size byte ring between one producer and one consumer thread (PCM audio).
+      - write() blocks while the buffer is full (backpressure, nothing is dropped)
+      - read() blocks until data arrives; returns b"" once closed and drained
+    """
+
+    def __init__(self, capacity: int = 1 << 18):
+        self.capacity = capacity
+        self._buf = bytearray(capacity)
+        self._start = 0
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self.high_water = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def write(self, data: bytes, timeout: Optional[float] = None) -> int:
+        view = memoryview(data)
+        written = 0
+        with self._cond:
+            while written < len(view):
+                if self._closed:
+                    raise ValueError("write to closed RingBuffer")
+                if self._size == self.capacity:
+                    if not self._cond.wait(timeout):
+                        break
+                    continue
+                end = (self._start + self._size) % self.capacity
+                n = min(len(view) - written, self.capacity - self._size, self.capacity - end)
+                self._buf[end:end + n] = view[written:written + n]
+                self._size += n
+                written += n
+                self.high_water = max(self.high_water, self._size)
+                self._cond.notify_all()
+        return written
+
+    def read(self, max_bytes: int, timeout: Optional[float] = None) -> bytes:
+        with self._cond:
+            while self._size == 0 and not self._closed:
+                if not self._cond.wait(timeout):
+                    return b""
+            n = min(max_bytes, self._size)
+            first = min(n, self.capacity - self._start)
+            out = bytes(self._buf[self._start:self._start + first]) + bytes(self._buf[: n - first])
+            self._start = (self._start + n) % self.capacity
+            self._size -= n
+            self._cond.notify_all()
+            return out
+
+    def close(self):
+        """No more writes; readers drain what is left, then get b""."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def chunks(self, size: int) -> Iterator[bytes]:
+        while True:
+            data = self.read(size)
+            if not data:
+                return
+            yield data
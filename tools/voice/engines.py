@@ -0,0 +1,200 @@
+"""
+Pluggable audio engines for the voice pipeline. All audio is 16-bit mono PCM bytes.
+
+  sources: FileReplaySource (tests / demos), MicrophoneSource (sounddevice)
+  stt:     ReplaySTT (fixed transcript), VoskSTT (offline, vosk)
+  tts:     SilenceTTS (timing stand-in), PiperTTS (offline, piper-tts)
+  sinks:   MemorySink (collects audio), SpeakerSink (sounddevice)
+
+Optional engines import their package on construction, so the stand-ins work
+without any audio dependency installed.
+"""
+import io
+import time
+import wave
+from typing import Iterable, Iterator, List, Optional
+
+SAMPLE_RATE = 16000
+
+
+# -------------- Sources --------------
+class FileReplaySource:
+    """Replays a WAV file in chunk_ms pieces, optionally at real-time pace."""
+
+    def __init__(self, path: str, chunk_ms: int = 20, realtime: bool = False):
+        with open(path, "rb") as f:
+            data = f.read()
+        with wave.open(io.BytesIO(data), "rb") as w:
+            if w.getsampwidth() != 2 or w.getnchannels() != 1:
+                raise ValueError("FileReplaySource needs 16-bit mono WAV")
+            self.sample_rate = w.getframerate()
+            self.pcm = w.readframes(w.getnframes())
+        self.chunk_bytes = self.sample_rate * 2 * chunk_ms // 1000
+        self.realtime = realtime
+
+    def chunks(self) -> Iterator[bytes]:
+        for start in range(0, len(self.pcm), self.chunk_bytes):
+            if self.realtime:
+                time.sleep(self.chunk_bytes / (2 * self.sample_rate))
+            yield self.pcm[start:start + self.chunk_bytes]
+
+
+class MicrophoneSource:
+    """Records until max_seconds or until silence_ms of quiet after speech."""
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE, chunk_ms: int = 20, max_seconds: float = 15.0,
+                 silence_ms: int = 800, threshold: int = 500):
+        import sounddevice  # noqa: F401  (fail early if missing)
+
+        self.sample_rate = sample_rate
+        self.frames = sample_rate * chunk_ms // 1000
+        self.max_chunks = int(max_seconds * 1000 / chunk_ms)
+        self.silence_chunks = silence_ms // chunk_ms
+        self.threshold = threshold
+
+    def chunks(self) -> Iterator[bytes]:
+        import array
+
+        import sounddevice as sd
+
+        quiet, heard = 0, False
+        with sd.RawInputStream(samplerate=self.sample_rate, channels=1, dtype="int16", blocksize=self.frames) as stream:
+            for _ in range(self.max_chunks):
+                data, _ = stream.read(self.frames)
+                data = bytes(data)
+                yield data
+                loud = max((abs(s) for s in array.array("h", data)), default=0) > self.threshold
+                heard = heard or loud
+                quiet = 0 if loud else quiet + 1
+                if heard and quiet >= self.silence_chunks:
+                    return
+
+
+# -------------- Speech to text --------------
+class ReplaySTT:
+    """Consumes the audio and returns a fixed transcript (pairs with FileReplaySource)."""
+
+    def __init__(self, transcript: str):
+        self.transcript = transcript
+
+    def transcribe(self, chunks: Iterable[bytes], sample_rate: int) -> str:
+        for _ in chunks:
+            pass
+        return self.transcript
+
+
+class VoskSTT:
+    """Offline streaming recognition: audio is fed to vosk chunk by chunk as it arrives."""
+
+    def __init__(self, model_path: str):
+        import vosk
+
+        vosk.SetLogLevel(-1)
+        self._vosk = vosk
+        self.model = vosk.Model(model_path)
+
+    def transcribe(self, chunks: Iterable[bytes], sample_rate: int) -> str:
+        import json
+
+        rec = self._vosk.KaldiRecognizer(self.model, sample_rate)
+        parts: List[str] = []
+        for chunk in chunks:
+            if rec.AcceptWaveform(chunk):
+                parts.append(json.loads(rec.Result()).get("text", ""))
+        parts.append(json.loads(rec.FinalResult()).get("text", ""))
+        return " ".join(p for p in parts if p)
+
+
+# -------------- Text to speech --------------
+class SilenceTTS:
+    """Timing stand-in: ms_per_char of silence per character, produced after a fixed delay."""
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE, ms_per_char: float = 60.0, delay: float = 0.0, chunk_ms: int = 50):
+        self.sample_rate = sample_rate
+        self.ms_per_char = ms_per_char
+        self.delay = delay
+        self.chunk_bytes = sample_rate * 2 * chunk_ms // 1000
+
+    def synthesize(self, text: str) -> Iterator[bytes]:
+        time.sleep(self.delay)
+        total = int(len(text) * self.ms_per_char * self.sample_rate / 1000) * 2
+        for start in range(0, total, self.chunk_bytes):
+            yield bytes(min(self.chunk_bytes, total - start))
+
+
+class PiperTTS:
+    """Offline neural TTS; audio comes out in pieces while a sentence is synthesized."""
+
+    def __init__(self, voice_path: str):
+        from piper import PiperVoice
+
+        self.voice = PiperVoice.load(voice_path)
+        self.sample_rate = self.voice.config.sample_rate
+
+    def synthesize(self, text: str) -> Iterator[bytes]:
+        yield from self.voice.synthesize_stream_raw(text)
+
+
+# -------------- Sinks --------------
+class MemorySink:
+    """Keeps played audio in memory (tests, or to save a reply as WAV afterwards)."""
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE, realtime: bool = False):
+        self.sample_rate = sample_rate
+        self.realtime = realtime
+        self.audio = bytearray()
+
+    def play(self, chunk: bytes):
+        if self.realtime:
+            time.sleep(len(chunk) / (2 * self.sample_rate))
+        self.audio += chunk
+
+    def close(self):
+        pass
+
+    def to_wav(self) -> bytes:
+        out = io.BytesIO()
+        with wave.open(out, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(self.sample_rate)
+            w.writeframes(bytes(self.audio))
+        return out.getvalue()
+
+
+class SpeakerSink:
+    def __init__(self, sample_rate: int = SAMPLE_RATE):
+        import sounddevice as sd
+
+        self.sample_rate = sample_rate
+        self.stream = sd.RawOutputStream(samplerate=sample_rate, channels=1, dtype="int16")
+        self.stream.start()
+
+    def play(self, chunk: bytes):
+        self.stream.write(chunk)  # blocks at playback pace
+
+    def close(self):
+        self.stream.stop()
+        self.stream.close()
+
+
+def build_engines(voice_cfg: dict, replay: Optional[str] = None, transcript: Optional[str] = None):
+    """(source, stt, tts, sink) from the "voice" section of config.json."""
+    if replay:
+        source = FileReplaySource(replay, realtime=voice_cfg.get("replay_realtime", False))
+    else:
+        source = MicrophoneSource(max_seconds=voice_cfg.get("max_record_seconds", 15.0))
+
+    if transcript is not None or voice_cfg.get("stt", "vosk") == "replay":
+        stt = ReplaySTT(transcript or "")
+    else:
+        stt = VoskSTT(voice_cfg["vosk_model"])
+
+    if voice_cfg.get("tts", "piper") == "piper":
+        tts = PiperTTS(voice_cfg["piper_voice"])
+    else:
+        tts = SilenceTTS()
+    rate = getattr(tts, "sample_rate", SAMPLE_RATE)
+
+    sink = MemorySink(rate) if voice_cfg.get("sink", "speaker") == "memory" else SpeakerSink(rate)
+    return source, stt, tts, sink
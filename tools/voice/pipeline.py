@@ -0,0 +1,205 @@
+"""
+Streaming voice turn: capture -> STT -> SmartBrain.think_stream -> sentence TTS -> playback.
+
+Audio moves between stages through in-memory ring buffers (no temp.wav round
+trip), and each completed sentence of the reply is synthesized while the LLM is
+still generating the rest, so speech starts after the first sentence instead of
+after the whole reply.
+
+    python -m tools.voice.pipeline --replay tools/voice/temp.wav --transcript "what is RAG?"
+"""
+import argparse
+import queue
+import re
+import threading
+import time
+from typing import List
+
+from tools.voice.buffer import RingBuffer
+
+_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+class SentenceSplitter:
+    """Cuts streamed text into sentences as soon as each one is complete."""
+
+    def __init__(self, min_chars: int = 24):
+        self.min_chars = min_chars  # avoid speaking fragments like "Dr." or "1." on their own
+        self._pending = ""
+
+    def feed(self, text: str) -> List[str]:
+        self._pending += text
+        out = []
+        start = 0
+        for m in _BOUNDARY.finditer(self._pending):
+            sentence = self._pending[start:m.start()].strip()
+            if len(sentence) >= self.min_chars:
+                out.append(sentence)
+                start = m.end()
+        self._pending = self._pending[start:]
+        return out
+
+    def flush(self) -> List[str]:
+        rest, self._pending = self._pending.strip(), ""
+        return [rest] if rest else []
+
+
+class VoicePipeline:
+    """
+    One instance per conversation; engines come from tools/voice/engines.py.
+    run_turn() returns the transcript, reply and per-stage latency (seconds after
+    the end of captured speech).
+    """
+
+    def __init__(self, brain, stt, tts, sink, user_id: str = "voice", buffer_bytes: int = 1 << 18, chunk_bytes: int = 3200):
+        self.brain = brain
+        self.stt = stt
+        self.tts = tts
+        self.sink = sink
+        self.user_id = user_id
+        self.buffer_bytes = buffer_bytes
+        self.chunk_bytes = chunk_bytes
+
+    def run_turn(self, source) -> dict:
+        marks = {"start": time.perf_counter()}
+        mic = RingBuffer(self.buffer_bytes)
+        speaker = RingBuffer(self.buffer_bytes)
+        sentences: queue.Queue = queue.Queue()  # sentences of the reply, None = end
+        errors = []
+
+        def capture():
+            try:
+                for chunk in source.chunks():
+                    mic.write(chunk)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                marks["speech_end"] = time.perf_counter()
+                mic.close()
+
+        def synthesize():
+            try:
+                while True:
+                    sentence = sentences.get()
+                    if sentence is None:
+                        break
+                    for audio in self.tts.synthesize(sentence):
+                        marks.setdefault("first_audio", time.perf_counter())
+                        speaker.write(audio)
+            except Exception as e:
+                if not speaker.closed:  # closed by a failed playback, which is already reported
+                    errors.append(e)
+            finally:
+                speaker.close()
+
+        def playback():
+            try:
+                for chunk in speaker.chunks(self.chunk_bytes):
+                    marks.setdefault("first_playback", time.perf_counter())
+                    self.sink.play(chunk)
+            except Exception as e:
+                errors.append(e)
+                # unblocks synthesize() if it is waiting for room in the buffer
+                speaker.close()
+            finally:
+                marks["playback_done"] = time.perf_counter()
+
+        capture_thread = threading.Thread(target=capture, daemon=True)
+        capture_thread.start()
+        transcript = self.stt.transcribe(mic.chunks(self.chunk_bytes), getattr(source, "sample_rate", 16000)).strip()
+        capture_thread.join()
+        marks["stt_done"] = time.perf_counter()
+        if not transcript:
+            return {"transcript": "", "reply": "", "latency": self._latency(marks), "errors": errors}
+
+        tts_thread = threading.Thread(target=synthesize, daemon=True)
+        play_thread = threading.Thread(target=playback, daemon=True)
+        tts_thread.start()
+        play_thread.start()
+
+        splitter = SentenceSplitter()
+        parts = []
+        try:
+            for piece in self.brain.think_stream(transcript, user_id=self.user_id):
+                marks.setdefault("first_token", time.perf_counter())
+                parts.append(piece)
+                for sentence in splitter.feed(piece):
+                    marks.setdefault("first_sentence", time.perf_counter())
+                    sentences.put(sentence)
+            for sentence in splitter.flush():
+                marks.setdefault("first_sentence", time.perf_counter())
+                sentences.put(sentence)
+        finally:
+            marks["reply_done"] = time.perf_counter()
+            sentences.put(None)
+        tts_thread.join()
+        play_thread.join()
+
+        return {"transcript": transcript, "reply": "".join(parts), "latency": self._latency(marks), "errors": errors}
+
+    @staticmethod
+    def _latency(marks: dict) -> dict:
+        zero = marks.get("speech_end", marks["start"])
+        stages = ["stt_done", "first_token", "first_sentence", "first_audio", "first_playback", "reply_done", "playback_done"]
+        out = {"capture": round(zero - marks["start"], 3)}
+        out.update({name: round(marks[name] - zero, 3) for name in stages if name in marks})
+        return out
+
+
+def format_latency(latency: dict) -> str:
+    return "  ".join(f"{name} {value:.2f}s" for name, value in latency.items())
+
+
+def run_voice_loop(brain, config: dict):
+    """Microphone conversation loop (assistant.py uses it when settings.voice_enabled is set)."""
+    from tools.voice.engines import build_engines
+
+    voice_cfg = config.get("voice", {})
+    source, stt, tts, sink = build_engines(voice_cfg)
+    pipeline = VoicePipeline(brain, stt, tts, sink)
+    print("🎙️ Voice mode: speak after the prompt, Ctrl+C to quit")
+    try:
+        while True:
+            print("🎙️ Listening...")
+            turn = pipeline.run_turn(source)
+            if not turn["transcript"]:
+                continue
+            print(f"You: {turn['transcript']}")
+            print(f"AI: {turn['reply']}")
+            if voice_cfg.get("report_latency", True):
+                print(f"⏱️ {format_latency(turn['latency'])}")
+    except KeyboardInterrupt:
+        print("\n👋 Exiting voice mode...")
+    finally:
+        sink.close()
+
+
+def main():
+    from langchain_ollama import OllamaLLM
+
+    from core.brain import SmartBrain
+    from core.config import load_config
+    from core.memory import Memory
+    from tools.voice.engines import build_engines
+
+    parser = argparse.ArgumentParser(description="Run one voice turn and report per-stage latency")
+    parser.add_argument("--replay", help="16-bit mono WAV to use instead of the microphone")
+    parser.add_argument("--transcript", help="skip STT and use this text (with --replay)")
+    args = parser.parse_args()
+
+    config = load_config()
+    memory = Memory(compression=config.get("memory", {}).get("compression", "gzip"))
+    brain = SmartBrain(config=config, memory=memory, llm=OllamaLLM(model=config.get("api", {}).get("model", "llama3")))
+    source, stt, tts, sink = build_engines(config.get("voice", {}), replay=args.replay, transcript=args.transcript)
+    try:
+        turn = VoicePipeline(brain, stt, tts, sink).run_turn(source)
+        print(f"You: {turn['transcript']}")
+        print(f"AI: {turn['reply']}")
+        print(f"⏱️ {format_latency(turn['latency'])}")
+    finally:
+        sink.close()
+        brain.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,261 @@
+import argparse
+import fnmatch
+import json
 import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 
 IGNORE_FOLDERS = {"renenv", "__pycache__", ".git", ".idea", ".vscode"}
+IGNORE_FILES = (".gitignore", ".treeignore")
+CACHE_FILE = ".tree_cache.json"
+CACHE_VERSION = 1
+
+# (name, is_dir, size) as listed by scandir; size is 0 for directories
+Entry = Tuple[str, bool, int]
+
+
+class IgnoreRules:
+    """
+    gitignore-style patterns, matched against paths relative to the scan root:
+      - "name" / "*.log"  -> any file or folder with that name, at any depth
+      - "build/"          -> folders only
+      - "/notes" or "a/b" -> anchored to the root
+      - "**/tmp", "a/**"  -> any number of folders
+      - "!keep.log"       -> re-include (last matching pattern wins)
+    """
+
+    def __init__(self, patterns: Optional[List[str]] = None):
+        self.rules = []
+        for pattern in patterns or []:
+            self.add(pattern)
+
+    def add(self, pattern: str):
+        pattern = pattern.strip()
+        if not pattern or pattern.startswith("#"):
+            return
+        negate = pattern.startswith("!")
+        pattern = pattern[1:] if negate else pattern
+        dir_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        anchored = "/" in pattern
+        pattern = pattern.lstrip("/")
+        if pattern.startswith("**/"):
+            anchored, pattern = False, pattern[3:]
+        self.rules.append((pattern, negate, dir_only, anchored))
+
+    def load(self, path: str):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    self.add(line)
+        except OSError:
+            pass
+
+    def ignored(self, rel_path: str, is_dir: bool) -> bool:
+        name = rel_path.rsplit("/", 1)[-1]
+        result = False
+        for pattern, negate, dir_only, anchored in self.rules:
+            if dir_only and not is_dir:
+                continue
+            target = rel_path if anchored else name
+            if fnmatch.fnmatchcase(target, pattern) or (anchored and pattern.endswith("/**") and rel_path.startswith(pattern[:-2])):
+                result = not negate
+        return result
+
+
+def default_rules(root: str, extra: Optional[List[str]] = None) -> IgnoreRules:
+    """IGNORE_FOLDERS, the root's .gitignore/.treeignore, then extra patterns."""
+    rules = IgnoreRules([f"{name}/" for name in sorted(IGNORE_FOLDERS)] + [CACHE_FILE])
+    for name in IGNORE_FILES:
+        rules.load(os.path.join(root, name))
+    for pattern in extra or []:
+        rules.add(pattern)
+    return rules
+
+
+class TreeScanner:
+    """
+    Walks a directory tree with os.scandir (no extra stat per entry), listing
+    each level's directories in parallel on a thread pool.
+
+    With a snapshot cache, a directory whose mtime is unchanged since the last
+    run is not listed again. A directory's mtime changes when entries are added,
+    removed or renamed in it, not when a file is edited in place, so cached file
+    sizes can lag behind edits (use --no-cache to refresh them).
+    """
+
+    def __init__(self, root: str, rules: Optional[IgnoreRules] = None, workers: int = 8, sizes: bool = False, cache_path: Optional[str] = None):
+        self.root = os.path.abspath(root)
+        self.rules = rules or default_rules(self.root)
+        self.workers = workers
+        self.sizes = sizes
+        self.cache_path = cache_path
+        self.cache: Dict[str, dict] = self._load_cache() if cache_path else {}
+        self.listing: Dict[str, List[Entry]] = {}
+        self.stats = {"dirs": 0, "listed": 0, "cached": 0}
+
+    # -------------- Cache --------------
+    def _load_cache(self) -> Dict[str, dict]:
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if data.get("version") != CACHE_VERSION or data.get("root") != self.root or data.get("sizes") != self.sizes:
+            return {}
+        return data.get("dirs", {})
+
+    def save_cache(self):
+        if not self.cache_path:
+            return
+        data = {"version": CACHE_VERSION, "root": self.root, "sizes": self.sizes, "dirs": self.cache}
+        tmp = self.cache_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp, self.cache_path)
+
+    # -------------- Scanning --------------
+    def _list(self, rel: str) -> Tuple[str, List[Entry], bool]:
+        path = os.path.join(self.root, rel) if rel else self.root
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return rel, [], False
+        cached = self.cache.get(rel)
+        if cached and cached["mtime"] == mtime:
+            return rel, [tuple(e) for e in cached["entries"]], True
+        entries = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                        size = entry.stat(follow_symlinks=False).st_size if self.sizes and not is_dir else 0
+                    except OSError:
+                        continue
+                    entries.append((entry.name, is_dir, size))
+        except (PermissionError, FileNotFoundError, NotADirectoryError):
+            return rel, [], False
+        entries.sort()
+        self.cache[rel] = {"mtime": mtime, "entries": entries}
+        return rel, entries, False
+
+    def scan(self) -> Dict[str, List[Entry]]:
+        """Every non-ignored directory (relative path, "" = root) -> its non-ignored entries."""
+        self.listing = {}
+        seen = set()
+        frontier = [""]
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while frontier:
+                next_frontier = []
+                for rel, entries, from_cache in pool.map(self._list, frontier):
+                    seen.add(rel)
+                    self.stats["dirs"] += 1
+                    self.stats["cached" if from_cache else "listed"] += 1
+                    kept = []
+                    for name, is_dir, size in entries:
+                        child = f"{rel}/{name}" if rel else name
+                        if self.rules.ignored(child, is_dir):
+                            continue
+                        kept.append((name, is_dir, size))
+                        if is_dir:
+                            next_frontier.append(child)
+                    self.listing[rel] = kept
+                frontier = next_frontier
+        # forget directories that no longer exist (or are now ignored)
+        self.cache = {rel: self.cache[rel] for rel in seen if rel in self.cache}
+        return self.listing
+
+    def totals(self) -> Dict[str, Tuple[int, int]]:
+        """Directory -> (file count, total bytes), including everything below it."""
+        totals: Dict[str, Tuple[int, int]] = {}
+        for rel in sorted(self.listing, key=lambda r: r.count("/") if r else -1, reverse=True):
+            files = size = 0
+            for name, is_dir, entry_size in self.listing[rel]:
+                if is_dir:
+                    sub_files, sub_size = totals.get(f"{rel}/{name}" if rel else name, (0, 0))
+                    files, size = files + sub_files, size + sub_size
+                else:
+                    files, size = files + 1, size + entry_size
+            totals[rel] = (files, size)
+        return totals
+
+
+def human_size(size: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def render_tree(scanner: TreeScanner, title: Optional[str] = None) -> List[str]:
+    """The tree as lines (├── / └── connectors), annotated with totals when scanner.sizes."""
+    totals = scanner.totals() if scanner.sizes else {}
+
+    def label(name: str, rel: str, is_dir: bool, size: int) -> str:
+        if not scanner.sizes:
+            return name
+        if is_dir:
+            files, total = totals.get(rel, (0, 0))
+            return f"{name}/ ({files} file{'' if files == 1 else 's'}, {human_size(total)})"
+        return f"{name} ({human_size(size)})"
+
+    root_name = title or os.path.basename(scanner.root) + "/"
+    lines = [label(root_name.rstrip("/"), "", True, 0) if scanner.sizes else root_name]
+    _render_subtree(scanner, "", "", label, lines)
+    return lines
+
+
+def _render_subtree(scanner: TreeScanner, rel: str, prefix: str, label, lines: List[str]):
+    entries = scanner.listing.get(rel, [])
+    for idx, (name, is_dir, size) in enumerate(entries):
+        last = idx == len(entries) - 1
+        child = f"{rel}/{name}" if rel else name
+        lines.append(prefix + ("└── " if last else "├── ") + label(name, child, is_dir, size))
+        if is_dir:
+            _render_subtree(scanner, child, prefix + ("    " if last else "│   "), label, lines)
+
 
 def print_tree(start_path, prefix="", file=None):
-    try:
-        files = sorted(os.listdir(start_path))
-    except PermissionError:
-        return
-    for idx, f in enumerate(files):
-        path = os.path.join(start_path, f)
-        if os.path.isdir(path) and f in IGNORE_FOLDERS:
-            continue  # skip ignored folders
-        connector = "└── " if idx == len(files) - 1 else "├── "
-        line = prefix + connector + f
-        print(line)
-        if file:
-            file.write(line + "\n")
-        if os.path.isdir(path):
-            extension = "    " if idx == len(files) - 1 else "│   "
-            print_tree(path, prefix + extension, file)
+    """Print the tree below start_path (and write it to file), without the title line."""
+    scanner = TreeScanner(start_path)
+    scanner.scan()
+    lines = [prefix + line for line in render_tree(scanner)[1:]]
+    text = "\n".join(lines) + "\n" if lines else ""
+    sys.stdout.write(text)
+    if file:
+        file.write(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write the folder structure to a text file")
+    parser.add_argument("root", nargs="?", default=os.getcwd())
+    parser.add_argument("-o", "--output", default="folder_structure.txt")
+    parser.add_argument("--ignore", action="append", default=[], metavar="PATTERN", help="gitignore-style pattern (repeatable)")
+    parser.add_argument("--sizes", action="store_true", help="show file sizes and per-folder file counts/totals")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--no-cache", action="store_true", help="re-list every folder and don't update the snapshot")
+    parser.add_argument("--quiet", action="store_true", help="don't print the tree")
+    args = parser.parse_args()
+
+    root = os.path.abspath(args.root)
+    scanner = TreeScanner(
+        root,
+        rules=default_rules(root, args.ignore),
+        workers=args.workers,
+        sizes=args.sizes,
+        cache_path=None if args.no_cache else os.path.join(root, CACHE_FILE),
+    )
+    scanner.scan()
+    text = "\n".join(render_tree(scanner)) + "\n"
+    with open(args.output, "w", encoding="utf-8", buffering=1 << 20) as f:
+        f.write(text)
+    if not args.quiet:
+        sys.stdout.write(text)
+    scanner.save_cache()
+    print(f"\n✅ Folder structure saved to {args.output} ({scanner.stats['dirs']} folders, {scanner.stats['cached']} from snapshot)")
+
 
 if __name__ == "__main__":
-    root = os.getcwd()
-    output_file = "folder_structure.txt"
-    with open(output_file, "w", encoding="utf-8") as f:
-        title = os.path.basename(root) + "/"
-        print(title)
-        f.write(title + "\n")
-        print_tree(root, file=f)
-    print(f"\n✅ Folder structure saved to {output_file}")
+    main()